@@ -0,0 +1,476 @@
+import argparse
+import gc
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import time
+import tracemalloc
+
+import degrees
+import landmarks
+import nameindex
+import snapshot
+import util
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmarks for the degrees search code."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    engines = commands.add_parser(
+        "engines", help="compare node expansions and time per search engine"
+    )
+    engines.add_argument("directories", nargs="*", default=["small", "large"])
+    engines.add_argument("--pairs", type=int, default=100,
+                         help="number of random source/target pairs")
+    engines.add_argument("--seed", type=int, default=0)
+
+    frontiers = commands.add_parser(
+        "frontiers", help="measure per-operation cost of each frontier"
+    )
+    frontiers.add_argument("sizes", nargs="*", type=int,
+                           default=[10_000, 100_000, 1_000_000])
+    frontiers.add_argument("--ops", type=int, default=1000,
+                           help="operations timed per measurement")
+
+    memory = commands.add_parser(
+        "memory", help="compare memory held by the dict and compact stores"
+    )
+    memory.add_argument("directories", nargs="*", default=["small", "large"])
+
+    startup = commands.add_parser(
+        "startup", help="compare load time from CSV and from a snapshot"
+    )
+    startup.add_argument("directories", nargs="*", default=["small", "large"])
+
+    landmarks = commands.add_parser(
+        "landmarks", help="compare query latency with and without landmarks"
+    )
+    landmarks.add_argument("directories", nargs="*", default=["small", "large"])
+    landmarks.add_argument("-k", type=int, default=16,
+                           help="number of landmarks")
+    landmarks.add_argument("--pairs", type=int, default=100)
+    landmarks.add_argument("--seed", type=int, default=0)
+
+    neighbors = commands.add_parser(
+        "neighbors", help="compare neighbor expansion with and without "
+                          "the co-star cache"
+    )
+    neighbors.add_argument("directories", nargs="*", default=["small", "large"])
+    neighbors.add_argument("--pairs", type=int, default=100)
+    neighbors.add_argument("--seed", type=int, default=0)
+    neighbors.add_argument("--cache", type=int,
+                           default=degrees.NEIGHBOR_CACHE_SIZE,
+                           help="co-star cache size to measure")
+
+    names = commands.add_parser(
+        "names", help="measure exact, prefix and fuzzy name lookups"
+    )
+    names.add_argument("directories", nargs="*", default=["small", "large"])
+    names.add_argument("--synthetic", type=int, metavar="N",
+                       help="also index N generated names")
+    names.add_argument("--queries", type=int, default=100)
+    names.add_argument("--seed", type=int, default=0)
+
+    ingest = commands.add_parser(
+        "ingest", help="compare peak RSS and load time of ingestion options"
+    )
+    ingest.add_argument("directories", nargs="*", default=["small", "large"])
+    ingest.add_argument("--years", type=degrees.parse_years,
+                        metavar="FIRST-LAST", default=(2000, None),
+                        help="year range for the filtered runs")
+    ingest.add_argument("--min-cast", type=int, default=3,
+                        help="minimum cast size for the filtered runs")
+
+    args = parser.parse_args()
+    if args.command == "engines":
+        benchmark_engines(args.directories, args.pairs, args.seed)
+    elif args.command == "frontiers":
+        benchmark_frontiers(args.sizes, args.ops)
+    elif args.command == "memory":
+        benchmark_memory(args.directories)
+    elif args.command == "startup":
+        benchmark_startup(args.directories)
+    elif args.command == "landmarks":
+        benchmark_landmarks(args.directories, args.k, args.pairs, args.seed)
+    elif args.command == "neighbors":
+        benchmark_neighbors(args.directories, args.pairs, args.seed, args.cache)
+    elif args.command == "ingest":
+        benchmark_ingest(args.directories, args.years, args.min_cast)
+    elif args.command == "names":
+        benchmark_names(args.directories, args.synthetic, args.queries,
+                        args.seed)
+
+
+def unload_data():
+    """
+    Drop whatever is loaded in the degrees module.
+    """
+    degrees.people.clear()
+    degrees.movies.clear()
+    degrees.graph = None
+    gc.collect()
+
+
+def reload_data(directory, **options):
+    """
+    Replace whatever is loaded in the degrees module with `directory`,
+    returning the time taken to load it.
+    """
+    unload_data()
+    start = time.perf_counter()
+    degrees.load_data(directory, **options)
+    return time.perf_counter() - start
+
+
+def random_pairs(n, seed):
+    """
+    Return `n` random (source, target) pairs of person_ids.
+    """
+    rng = random.Random(seed)
+    person_ids = sorted(degrees.people)
+    return [
+        (rng.choice(person_ids), rng.choice(person_ids))
+        for _ in range(n)
+    ]
+
+
+def benchmark_engines(directories, n, seed):
+    """
+    Run every engine over the same random pairs in each directory,
+    reporting node expansions and wall time per engine.
+    """
+    for directory in directories:
+        if not os.path.isdir(directory):
+            print(f"{directory}: not found, skipping")
+            continue
+        elapsed = reload_data(directory)
+        pairs = random_pairs(n, seed)
+        print(f"{directory}: {len(degrees.people)} people, "
+              f"{len(degrees.movies)} movies, loaded in {elapsed:.2f}s")
+
+        lengths = {}
+        for engine in sorted(degrees.ENGINES):
+            if engine == "landmarks":
+                # Needs an index; see the landmarks command
+                continue
+            expanded = 0
+            results = []
+            start = time.perf_counter()
+            for source, target in pairs:
+                stats = {}
+                path = degrees.shortest_path(source, target, engine, stats)
+                expanded += stats["expanded"]
+                results.append(None if path is None else len(path))
+            elapsed = time.perf_counter() - start
+            lengths[engine] = results
+            print(f"  {engine:>13}: {expanded:>10} expansions "
+                  f"({expanded / n:.1f}/query), {elapsed:.3f}s "
+                  f"({1000 * elapsed / n:.2f}ms/query)")
+
+        if len(set(map(tuple, lengths.values()))) > 1:
+            print("  WARNING: engines disagree on path lengths")
+
+
+def benchmark_frontiers(sizes, ops):
+    """
+    Fill each frontier class to every size in `sizes`, then time `ops`
+    contains_state lookups and `ops` removals, reporting the mean cost of
+    each operation in microseconds.
+    """
+    classes = [
+        util.StackFrontier,
+        util.QueueFrontier,
+        util.DequeStackFrontier,
+        util.DequeQueueFrontier,
+    ]
+    print(f"{'frontier':>18} {'size':>9} {'add':>9} "
+          f"{'contains':>9} {'remove':>9}  (us/op)")
+    for size in sizes:
+        nodes = [util.Node(state=i, parent=None, action=None)
+                 for i in range(size)]
+        # Probe states spread across the frontier, half of them absent
+        probes = [(i * size) // ops for i in range(ops // 2)]
+        probes += [size + i for i in range(ops - len(probes))]
+
+        for cls in classes:
+            frontier = cls()
+            start = time.perf_counter()
+            for node in nodes:
+                frontier.add(node)
+            add = (time.perf_counter() - start) / size
+
+            start = time.perf_counter()
+            for state in probes:
+                frontier.contains_state(state)
+            contains = (time.perf_counter() - start) / len(probes)
+
+            removals = min(ops, size)
+            start = time.perf_counter()
+            for _ in range(removals):
+                frontier.remove()
+            remove = (time.perf_counter() - start) / removals
+
+            print(f"{cls.__name__:>18} {size:>9} {add * 1e6:>9.3f} "
+                  f"{contains * 1e6:>9.3f} {remove * 1e6:>9.3f}")
+
+
+def benchmark_memory(directories):
+    """
+    Load each directory with the dict store and with the compact store,
+    reporting the memory each keeps allocated once loading is done and
+    the peak reached while loading.
+    """
+    for directory in directories:
+        if not os.path.isdir(directory):
+            print(f"{directory}: not found, skipping")
+            continue
+        print(f"{directory}:")
+        for label, compact in (("dict", False), ("compact", True)):
+            unload_data()
+            tracemalloc.start()
+            elapsed = reload_data(directory, compact=compact)
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"  {label:>8}: {current / 2**20:>9.2f} MiB held, "
+                  f"{peak / 2**20:>9.2f} MiB peak, loaded in {elapsed:.2f}s")
+            if compact:
+                print(f"  {'':>8}  {degrees.graph.nbytes() / 2**20:>9.2f} "
+                      f"MiB in graph buffers")
+
+
+def benchmark_startup(directories):
+    """
+    Time loading each directory from CSV, building its snapshot, and then
+    mapping the snapshot, which is what every later run pays.
+    """
+    for directory in directories:
+        if not os.path.isdir(directory):
+            print(f"{directory}: not found, skipping")
+            continue
+        path = os.path.join(directory, snapshot.FILENAME)
+        if os.path.exists(path):
+            os.remove(path)
+        print(f"{directory}:")
+        for label, options in (("dict", {}),
+                               ("compact", {"compact": True}),
+                               ("snapshot build", {"snapshot": True}),
+                               ("snapshot map", {"snapshot": True})):
+            elapsed = reload_data(directory, **options)
+            print(f"  {label:>14}: {elapsed:.3f}s")
+
+
+def benchmark_landmarks(directories, k, n, seed):
+    """
+    Time building and loading a landmark index, then compare the latency
+    of landmark bounds and landmark-guided search against plain searches
+    on the compact graph.
+    """
+    for directory in directories:
+        if not os.path.isdir(directory):
+            print(f"{directory}: not found, skipping")
+            continue
+        path = os.path.join(directory, landmarks.FILENAME)
+        if os.path.exists(path):
+            os.remove(path)
+        print(f"{directory}:")
+        elapsed = reload_data(directory, snapshot=True, landmarks=k)
+        print(f"  build {k} landmarks: {elapsed:.3f}s")
+        elapsed = reload_data(directory, snapshot=True, landmarks=k)
+        print(f"  load {k} landmarks: {elapsed:.3f}s")
+
+        graph = degrees.graph
+        rng = random.Random(seed)
+        pairs = [
+            (graph.person_ids[rng.randrange(len(graph))],
+             graph.person_ids[rng.randrange(len(graph))])
+            for _ in range(n)
+        ]
+
+        start = time.perf_counter()
+        for source, target in pairs:
+            degrees.separation_bounds(source, target)
+        elapsed = time.perf_counter() - start
+        print(f"  {'bounds only':>22}: {1000 * elapsed / n:.3f}ms/query")
+
+        index = degrees.landmark_index
+        for engine in sorted(degrees.ENGINES):
+            for label, active in ((engine, None), (f"{engine} +bounds", index)):
+                if engine == "landmarks":
+                    if active is None:
+                        continue
+                    label = engine
+                # Without the index loaded shortest_path cannot rule out
+                # unconnected pairs early
+                degrees.landmark_index = active
+                expanded = 0
+                start = time.perf_counter()
+                for source, target in pairs:
+                    stats = {}
+                    degrees.shortest_path(source, target, engine, stats)
+                    expanded += stats["expanded"]
+                elapsed = time.perf_counter() - start
+                print(f"  {label:>22}: {1000 * elapsed / n:.3f}ms/query, "
+                      f"{expanded / n:.1f} expansions/query")
+        degrees.landmark_index = index
+
+
+def benchmark_neighbors(directories, n, seed, cache):
+    """
+    Run breadth-first searches over the same random pairs expanding people
+    with neighbors_for_person, with uncached co-stars, and with co-stars
+    cached across queries, reporting time, pairs generated per expansion
+    and the cache hit rate.
+    """
+    for directory in directories:
+        if not os.path.isdir(directory):
+            print(f"{directory}: not found, skipping")
+            continue
+        reload_data(directory)
+        pairs = random_pairs(n, seed)
+        print(f"{directory}:")
+
+        for label, size in (("neighbors_for_person", None),
+                            ("costars uncached", 0),
+                            (f"costars cache={cache}", cache)):
+            degrees.set_neighbor_cache(size)
+            if size is None:
+                expand = degrees.neighbors_for_person
+            else:
+                expand = degrees.costars
+            generated = 0
+
+            def counting(state):
+                nonlocal generated
+                result = expand(state)
+                generated += len(result)
+                return result
+
+            expanded = 0
+            start = time.perf_counter()
+            for source, target in pairs:
+                stats = {}
+                degrees.breadth_first_search(source, target, counting, stats)
+                expanded += stats["expanded"]
+            elapsed = time.perf_counter() - start
+
+            line = (f"  {label:>22}: {1000 * elapsed / n:.3f}ms/query, "
+                    f"{generated / max(expanded, 1):.1f} pairs/expansion")
+            if size:
+                info = degrees.costars.cache_info()
+                lookups = info.hits + info.misses
+                line += f", {info.hits / max(lookups, 1):.1%} cache hits"
+            print(line)
+        degrees.set_neighbor_cache(degrees.NEIGHBOR_CACHE_SIZE)
+
+
+def benchmark_names(directories, synthetic, n, seed):
+    """
+    Time building a NameIndex and answering exact, prefix and fuzzy
+    queries for names drawn from it with a typo added.
+    """
+    rng = random.Random(seed)
+    indexes = []
+    for directory in directories:
+        if not os.path.isdir(directory):
+            print(f"{directory}: not found, skipping")
+            continue
+        reload_data(directory, snapshot=True)
+        indexes.append((directory, degrees.name_index))
+    if synthetic:
+        syllables = ["an", "be", "cor", "da", "el", "fi", "gar", "ho", "is",
+                     "jo", "ka", "li", "mar", "no", "ol", "pe", "ra", "son",
+                     "ta", "vi", "wen", "ya", "zu"]
+
+        def word():
+            return "".join(rng.choice(syllables)
+                           for _ in range(rng.randint(2, 4))).title()
+        start = time.perf_counter()
+        index = nameindex.NameIndex.from_pairs(
+            (f"{word()} {word()}", str(i)) for i in range(synthetic)
+        )
+        elapsed = time.perf_counter() - start
+        print(f"synthetic: built {synthetic} names in {elapsed:.2f}s")
+        indexes.append((f"synthetic {synthetic}", index))
+
+    for label, index in indexes:
+        if len(index.names) == 0:
+            continue
+        start = time.perf_counter()
+        index.build_grams()
+        print(f"{label}: {len(index.names)} names, n-grams built in "
+              f"{time.perf_counter() - start:.2f}s")
+
+        queries = [index.names[rng.randrange(len(index.names))]
+                   for _ in range(n)]
+        typos = []
+        for name in queries:
+            i = rng.randrange(len(name))
+            typos.append(name[:i] + name[i + 1:])
+
+        for operation, run in (
+                ("exact", lambda name, typo: index.exact(name)),
+                ("prefix", lambda name, typo: index.complete(name[:4])),
+                ("fuzzy k=1", lambda name, typo: index.search(typo, 1)),
+                ("fuzzy k=2", lambda name, typo: index.search(typo, 2))):
+            start = time.perf_counter()
+            for name, typo in zip(queries, typos):
+                run(name, typo)
+            elapsed = time.perf_counter() - start
+            print(f"  {operation:>10}: {1000 * elapsed / n:.3f}ms/query")
+
+
+def benchmark_ingest(directories, years, min_cast):
+    """
+    Load each directory with several ingestion options, each in a fresh
+    process so its peak resident set size is measured on its own.
+    """
+    runs = [
+        ("dict", {}),
+        ("dict project", {"project": True}),
+        ("compact", {"compact": True}),
+        ("compact project", {"compact": True, "project": True}),
+        ("compact years", {"compact": True, "project": True, "years": years}),
+        ("compact min-cast", {"compact": True, "project": True,
+                              "min_cast": min_cast}),
+    ]
+    context = multiprocessing.get_context("spawn")
+    for directory in directories:
+        if not os.path.isdir(directory):
+            print(f"{directory}: not found, skipping")
+            continue
+        print(f"{directory}:")
+        with context.Pool(1, maxtasksperchild=1) as pool:
+            baseline = pool.apply(peak_rss)
+        print(f"  {'interpreter':>16}: {baseline / 2**20:>9.1f} MiB peak RSS")
+        for label, options in runs:
+            with context.Pool(1, maxtasksperchild=1) as pool:
+                elapsed, peak = pool.apply(measure_load, (directory, options))
+            print(f"  {label:>16}: {peak / 2**20:>9.1f} MiB peak RSS, "
+                  f"loaded in {elapsed:.2f}s")
+
+
+def measure_load(directory, options):
+    """
+    Load `directory` with `options`, returning the time taken and the
+    peak resident set size of this process in bytes.
+    """
+    elapsed = reload_data(directory, **options)
+    return elapsed, peak_rss()
+
+
+def peak_rss():
+    """
+    Return the peak resident set size of this process in bytes.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+if __name__ == "__main__":
+    main()
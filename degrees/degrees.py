@@ -1,10 +1,17 @@
-import csv
+import argparse
+import functools
+import heapq
+import itertools
+import json
+import math
 import sys
 
-from util import Node, StackFrontier, QueueFrontier
-
-# Maps names to a set of corresponding person_ids
-names = {}
+from graph import load_graph
+from ingest import Filters, read_movies, read_people, read_stars
+from landmarks import load_landmarks
+from nameindex import NameIndex, graph_name_index
+from snapshot import load_cached_graph
+from util import Node, DequeQueueFrontier
 
 # Maps person_ids to a dictionary of: name, birth, movies (a set of movie_ids)
 people = {}
@@ -12,56 +19,118 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# CompactGraph holding the data instead of the dicts above, if loaded
+# with compact=True, snapshot=True or landmarks
+graph = None
+
+# LandmarkIndex over the CompactGraph, if loaded with landmarks
+landmark_index = None
+
+# NameIndex over whichever data is loaded, for exact, prefix and
+# fuzzy name lookups
+name_index = None
+
+# Default number of people whose co-stars are kept in the search cache
+NEIGHBOR_CACHE_SIZE = 100_000
+
 
-def load_data(directory):
+def load_data(directory, compact=False, snapshot=False, landmarks=0,
+              years=None, min_cast=0, project=False):
     """
     Load data from CSV files into memory.
+
+    If `compact` is true, the data is loaded into an integer-indexed
+    CompactGraph (see graph.py) rather than the people/movies dicts.
+    If `snapshot` is true, the CompactGraph is memory-mapped from a binary
+    snapshot of the CSV files, which is (re)built whenever it is missing
+    or out of date (see snapshot.py).
+    If `landmarks` is positive, a LandmarkIndex of that many landmarks is
+    loaded (or built and stored) alongside the CompactGraph (see
+    landmarks.py).
+
+    `years` (an inclusive (first, last) range, either end None for no
+    limit) and `min_cast` keep only matching movies, and `project` drops
+    the birth, title and year columns that search does not need. stars.csv
+    is read in chunks rather than all at once (see ingest.py).
     """
+    global graph, landmark_index, name_index
+    graph = None
+    landmark_index = None
+    name_index = None
+    costars.cache_clear()
+    filters = Filters(years=years, min_cast=min_cast, project=project)
+    if snapshot:
+        graph = load_cached_graph(directory, filters)
+    elif compact or landmarks:
+        graph = load_graph(directory, filters)
+    if landmarks:
+        landmark_index = load_landmarks(directory, graph, landmarks, filters)
+    if graph is not None:
+        name_index = graph_name_index(graph)
+        return
+
     # Load people
-    with open(f"{directory}/people.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            people[row["id"]] = {
-                "name": row["name"],
-                "birth": row["birth"],
-                "movies": set()
-            }
-            if row["name"].lower() not in names:
-                names[row["name"].lower()] = {row["id"]}
-            else:
-                names[row["name"].lower()].add(row["id"])
+    for person_id, name, birth in read_people(directory, filters):
+        people[person_id] = {
+            "name": name,
+            "birth": birth,
+            "movies": set()
+        }
 
     # Load movies
-    with open(f"{directory}/movies.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            movies[row["id"]] = {
-                "title": row["title"],
-                "year": row["year"],
-                "stars": set()
-            }
-
-    # Load stars
-    with open(f"{directory}/stars.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            try:
-                people[row["person_id"]]["movies"].add(row["movie_id"])
-                movies[row["movie_id"]]["stars"].add(row["person_id"])
-            except KeyError:
-                pass
+    for movie_id, title, year in read_movies(directory, filters):
+        movies[movie_id] = {
+            "title": title,
+            "year": year,
+            "stars": set()
+        }
+
+    # Load stars, dropping rows that refer to unknown or filtered out
+    # people or movies
+    for chunk in read_stars(directory):
+        for person_id, movie_id in chunk:
+            if person_id in people and movie_id in movies:
+                people[person_id]["movies"].add(movie_id)
+                movies[movie_id]["stars"].add(person_id)
+
+    name_index = NameIndex.from_pairs(
+        (person["name"], person_id) for person_id, person in people.items()
+    )
 
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    parser = argparse.ArgumentParser(
+        description="Find the degrees of separation between two people."
+    )
+    add_data_arguments(parser)
+    parser.add_argument("--batch", metavar="FILE",
+                        help="answer every tab-separated pair of names in "
+                             "FILE ('-' for stdin) as JSON lines")
+    parser.add_argument("--stats", action="store_true",
+                        help="report search and co-star cache counters")
+    args = parser.parse_args()
+    check_data_arguments(parser, args)
+    set_neighbor_cache(args.neighbor_cache)
 
-    # Load data from files into memory
-    print("Loading data...")
-    load_data(directory)
-    print("Data loaded.")
+    # Load data from files into memory, keeping stdout clean for JSON
+    log = sys.stderr if args.batch else sys.stdout
+    print("Loading data...", file=log)
+    load_data(args.directory, compact=args.compact, snapshot=args.snapshot,
+              landmarks=args.landmarks, years=args.years,
+              min_cast=args.min_cast, project=args.project)
+    print("Data loaded.", file=log)
 
+    if args.batch:
+        if args.batch == "-":
+            run_batch(sys.stdin, sys.stdout, engine=args.engine)
+        else:
+            with open(args.batch, encoding="utf-8") as f:
+                run_batch(f, sys.stdout, engine=args.engine)
+        if args.stats:
+            print(f"Co-star cache: {costars.cache_info()}", file=sys.stderr)
+        return
+
+    enable_completion()
     source = person_id_for_name(input("Name: "))
     if source is None:
         sys.exit("Person not found.")
@@ -69,7 +138,22 @@ def main():
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    if landmark_index is not None:
+        lower, upper = separation_bounds(source, target)
+        if lower == math.inf:
+            print("Landmarks: not connected.")
+        else:
+            print(f"Landmarks: between {lower} and {upper} degrees.")
+
+    stats = {}
+    path = shortest_path(source, target, engine=args.engine, stats=stats)
+    if args.stats:
+        info = costars.cache_info()
+        lookups = info.hits + info.misses
+        print(f"Expanded {stats['expanded']} people; co-star cache "
+              f"{info.hits}/{lookups} hits "
+              f"({info.hits / max(lookups, 1):.1%}), "
+              f"{info.currsize} people cached.")
 
     if path is None:
         print("Not connected.")
@@ -78,82 +162,426 @@ def main():
         print(f"{degrees} degrees of separation.")
         path = [(None, source)] + path
         for i in range(degrees):
-            person1 = people[path[i][1]]["name"]
-            person2 = people[path[i + 1][1]]["name"]
-            movie = movies[path[i + 1][0]]["title"]
+            person1 = person_info(path[i][1])["name"]
+            person2 = person_info(path[i + 1][1])["name"]
+            # Titles are empty when loaded with project=True
+            movie = movie_info(path[i + 1][0])["title"] or path[i + 1][0]
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
-def shortest_path(source, target):
+def parse_years(text):
+    """
+    Parse a "FIRST-LAST" year range where either end may be left empty.
+    """
+    first, dash, last = text.partition("-")
+    if not dash:
+        raise argparse.ArgumentTypeError("expected FIRST-LAST")
+    try:
+        return (int(first) if first else None, int(last) if last else None)
+    except ValueError:
+        raise argparse.ArgumentTypeError("years must be integers")
+
+
+def enable_completion():
+    """
+    Complete names from the loaded data when Tab is pressed at the
+    prompts, if the readline module is available.
+    """
+    try:
+        import readline
+    except ImportError:
+        return
+
+    def complete(text, state):
+        completions = name_index.complete(text)
+        return completions[state] if state < len(completions) else None
+
+    # Names contain spaces, so complete the whole line
+    readline.set_completer_delims("")
+    readline.set_completer(complete)
+    readline.parse_and_bind("tab: complete")
+
+
+def add_data_arguments(parser):
+    """
+    Add the arguments that choose what data to load and how to search it.
+    """
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="bfs",
+                        help="search strategy used by shortest_path")
+    parser.add_argument("--compact", action="store_true",
+                        help="hold the data in an integer-indexed graph")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="memory-map the data from a cached binary "
+                             "snapshot (implies --compact)")
+    parser.add_argument("--landmarks", type=int, default=0, metavar="K",
+                        help="use a stored distance index of K landmark "
+                             "people (implies --compact)")
+    parser.add_argument("--years", type=parse_years, metavar="FIRST-LAST",
+                        help="only load movies from these years, e.g. "
+                             "1990-1999 or 2000-")
+    parser.add_argument("--min-cast", type=int, default=0, metavar="N",
+                        help="only load movies listing at least N stars")
+    parser.add_argument("--project", action="store_true",
+                        help="skip the birth, title and year columns")
+    parser.add_argument("--neighbor-cache", type=int,
+                        default=NEIGHBOR_CACHE_SIZE, metavar="N",
+                        help="number of people whose co-stars are cached "
+                             "during search (0 disables the cache)")
+
+
+def check_data_arguments(parser, args):
+    """
+    Exit with a usage error if the arguments added by add_data_arguments
+    cannot be used together.
+    """
+    if args.landmarks < 0:
+        parser.error("--landmarks K must not be negative")
+    if args.engine == "landmarks" and not args.landmarks:
+        parser.error("--engine landmarks needs an index: pass --landmarks K")
+
+
+def run_batch(lines, output, engine="bfs"):
+    """
+    Answer each "source<TAB>target" line of names in `lines`, writing one
+    JSON object per line to `output` as soon as it is answered.
+    """
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if not line.strip():
+            continue
+        source, _, target = line.partition("\t")
+        result = query(source.strip(), target.strip(), engine=engine)
+        output.write(json.dumps(result) + "\n")
+        output.flush()
+
+
+def query(source_name, target_name, engine="bfs"):
+    """
+    Returns a JSON-serialisable dictionary answering how `source_name`
+    and `target_name` are connected. Names that match nobody or more than
+    one person are reported under "error" rather than prompted for.
+    """
+    result = {"source": source_name, "target": target_name}
+    person_ids = []
+    for name in (source_name, target_name):
+        matches = person_ids_for_name(name)
+        if len(matches) != 1:
+            result["error"] = "not found" if not matches else "ambiguous"
+            result["name"] = name
+            result["candidates"] = sorted(matches)
+            if not matches:
+                result["suggestions"] = [
+                    match for _, match in name_index.search(name)
+                ]
+            return result
+        person_ids.append(matches[0])
+
+    source, target = person_ids
+    path = shortest_path(source, target, engine=engine)
+    if path is None:
+        result["degrees"] = None
+        result["path"] = None
+        return result
+
+    result["degrees"] = len(path)
+    result["path"] = []
+    for movie_id, person_id in path:
+        result["path"].append({
+            "movie_id": movie_id,
+            "title": movie_info(movie_id)["title"],
+            "person_id": person_id,
+            "name": person_info(person_id)["name"],
+        })
+    return result
+
+
+def shortest_path(source, target, engine="bfs", stats=None):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
 
+    `engine` names the search strategy in ENGINES. If `stats` is a dict,
+    the number of people expanded is stored under "expanded".
+
     If no possible path, returns None.
     """
+    if graph is None:
+        return ENGINES[engine](source, target, costars, stats)
+
+    # Search the compact graph directly on integer indices
+    source, target = graph.person_index(source), graph.person_index(target)
+    if landmark_index is not None:
+        # Landmarks can prove two people unconnected without searching
+        if landmark_index.bounds(source, target)[0] == math.inf:
+            if stats is not None:
+                stats["expanded"] = 0
+            return None
+    path = ENGINES[engine](source, target, costars, stats)
+    if path is None:
+        return None
+    return [
+        (graph.movie_ids[movie], graph.person_ids[person])
+        for movie, person in path
+    ]
+
+
+def breadth_first_search(source, target, neighbors, stats=None):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs that connect
+    the source to the target, searching outwards from the source only.
+
+    If no possible path, returns None.
+    """
+    expanded = 0
 
-    # TODO
     #Starting Node
     initial_state = Node(state=source, parent=None, action=None)
     #BFS or DFS 
-    frontier = QueueFrontier()
+    frontier = DequeQueueFrontier()
     #Add start node to the frontier
     frontier.add(node=initial_state)
 
     #Set of explored person_ids
     explored = set()
 
-    while True:
+    try:
+        while True:
 
-        if frontier.empty():
-            return None
-        node_removed = frontier.remove()
-        if node_removed.state == target: 
-            actions = []
-            while node_removed.parent is not None:
-                actions.append(node_removed.action)
-                node_removed = node_removed.parent
-            actions.reverse()
-            return actions
-        explored.add(node_removed.state)
-        pairs = neighbors_for_person(person_id=node_removed.state)
-        for movie_id, person_id in pairs:
-            if person_id not in explored and not frontier.contains_state(state=person_id):
-                child = Node(state=person_id, parent=node_removed, action=(movie_id, person_id))
-                if child.state == target:
-                    actions = []
-                    while child.parent is not None:
-                        actions.append(child.action)
-                        child = child.parent
-                    actions.reverse()
-                    return actions
-                frontier.add(node=child)
+            if frontier.empty():
+                return None
+            node_removed = frontier.remove()
+            if node_removed.state == target: 
+                return actions_to(node_removed)
+            explored.add(node_removed.state)
+            expanded += 1
+            pairs = neighbors(node_removed.state)
+            for movie_id, person_id in pairs:
+                if person_id not in explored and not frontier.contains_state(state=person_id):
+                    child = Node(state=person_id, parent=node_removed, action=(movie_id, person_id))
+                    if child.state == target:
+                        return actions_to(child)
+                    frontier.add(node=child)
+    finally:
+        if stats is not None:
+            stats["expanded"] = expanded
 
 
-def person_id_for_name(name):
+def bidirectional_search(source, target, neighbors, stats=None):
     """
-    Returns the IMDB id for a person's name,
-    resolving ambiguities as needed.
+    Returns the shortest list of (movie_id, person_id) pairs that connect
+    the source to the target, growing one breadth-first layer at a time
+    from whichever end currently has the smaller frontier until the two
+    searches meet in the middle.
+
+    If no possible path, returns None.
     """
-    person_ids = list(names.get(name.lower(), set()))
-    if len(person_ids) == 0:
+    if source == target:
+        if stats is not None:
+            stats["expanded"] = 0
+        return []
+
+    expanded = 0
+
+    #Maps each person_id reached from one end to its Node
+    forward = {source: Node(state=source, parent=None, action=None)}
+    backward = {target: Node(state=target, parent=None, action=None)}
+    forward_layer = [forward[source]]
+    backward_layer = [backward[target]]
+
+    try:
+        while forward_layer and backward_layer:
+            grow_forward = len(forward_layer) <= len(backward_layer)
+            if grow_forward:
+                layer, reached, other = forward_layer, forward, backward
+            else:
+                layer, reached, other = backward_layer, backward, forward
+
+            next_layer = []
+            for node in layer:
+                expanded += 1
+                for movie_id, person_id in neighbors(node.state):
+                    if person_id in reached:
+                        continue
+                    child = Node(state=person_id, parent=node, action=(movie_id, person_id))
+                    if person_id in other:
+                        # Both searches have now reached person_id, and
+                        # because whole layers are grown at a time no
+                        # shorter connection can still be undiscovered
+                        if grow_forward:
+                            return join_paths(child, other[person_id])
+                        return join_paths(other[person_id], child)
+                    reached[person_id] = child
+                    next_layer.append(child)
+
+            if grow_forward:
+                forward_layer = next_layer
+            else:
+                backward_layer = next_layer
+
         return None
-    elif len(person_ids) > 1:
-        print(f"Which '{name}'?")
-        for person_id in person_ids:
-            person = people[person_id]
-            name = person["name"]
-            birth = person["birth"]
-            print(f"ID: {person_id}, Name: {name}, Birth: {birth}")
-        try:
-            person_id = input("Intended Person ID: ")
-            if person_id in person_ids:
-                return person_id
-        except ValueError:
-            pass
+    finally:
+        if stats is not None:
+            stats["expanded"] = expanded
+
+
+def separation_bounds(source, target):
+    """
+    Returns (lower, upper) bounds on the degrees of separation between two
+    person_ids from the loaded LandmarkIndex, without searching. Both are
+    math.inf if the two are known not to be connected.
+    """
+    return landmark_index.bounds(graph.person_index(source),
+                                 graph.person_index(target))
+
+
+def landmark_search(source, target, neighbors, stats=None):
+    """
+    Returns the shortest list of (movie, person) index pairs that connect
+    the source to the target, using an A* search guided by the distance
+    bounds of the loaded LandmarkIndex.
+
+    If no possible path, returns None.
+    """
+    if landmark_index is None:
+        raise ValueError("landmark engine requires data loaded with landmarks")
+    return astar_search(source, target, neighbors,
+                        landmark_index.heuristic(target), stats)
+
+
+def astar_search(source, target, neighbors, heuristic, stats=None):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs that connect
+    the source to the target, always expanding the person with the lowest
+    path length so far plus `heuristic` estimate of the remaining length.
+    The heuristic must never overestimate, and returns math.inf for people
+    known not to be connected to the target.
+
+    If no possible path, returns None.
+    """
+    expanded = 0
+
+    # Ties on estimated length go to the deeper person, then to
+    # insertion order so Nodes are never compared
+    counter = itertools.count()
+    frontier = [(heuristic(source), 0, next(counter),
+                 Node(state=source, parent=None, action=None))]
+    #Shortest known path length to each person_id
+    reached = {source: 0}
+    explored = set()
+
+    try:
+        while frontier:
+            _, depth, _, node = heapq.heappop(frontier)
+            depth = -depth
+            if node.state == target:
+                return actions_to(node)
+            if node.state in explored:
+                continue
+            explored.add(node.state)
+            expanded += 1
+            for movie_id, person_id in neighbors(node.state):
+                if person_id in explored or reached.get(person_id, math.inf) <= depth + 1:
+                    continue
+                estimate = heuristic(person_id)
+                if estimate == math.inf:
+                    continue
+                reached[person_id] = depth + 1
+                child = Node(state=person_id, parent=node, action=(movie_id, person_id))
+                heapq.heappush(frontier, (depth + 1 + estimate, -(depth + 1),
+                                          next(counter), child))
         return None
-    else:
+    finally:
+        if stats is not None:
+            stats["expanded"] = expanded
+
+
+def actions_to(node):
+    """
+    Returns the list of actions taken to reach `node` from the root
+    of its search tree.
+    """
+    actions = []
+    while node.parent is not None:
+        actions.append(node.action)
+        node = node.parent
+    actions.reverse()
+    return actions
+
+
+def join_paths(forward_node, backward_node):
+    """
+    Joins a node from the search rooted at the source with a node for the
+    same person from the search rooted at the target, returning the
+    (movie_id, person_id) pairs from source to target.
+    """
+    actions = actions_to(forward_node)
+    # Walking the backward tree towards its root retraces each movie
+    # in the opposite direction, landing on the parent's person_id
+    node = backward_node
+    while node.parent is not None:
+        actions.append((node.action[0], node.parent.state))
+        node = node.parent
+    return actions
+
+
+def person_id_for_name(name):
+    """
+    Returns the IMDB id for a person's name,
+    resolving ambiguities and misspellings as needed.
+    """
+    person_ids = person_ids_for_name(name)
+    if len(person_ids) == 1:
         return person_ids[0]
+    elif len(person_ids) == 0:
+        # Offer people with similar names through the same prompt
+        person_ids = [
+            person_id
+            for _, match in name_index.search(name)
+            for person_id in person_ids_for_name(match)
+        ]
+        if len(person_ids) == 0:
+            return None
+        print(f"No one named '{name}'. Did you mean:")
+    else:
+        print(f"Which '{name}'?")
+    for person_id in person_ids:
+        person = person_info(person_id)
+        name = person["name"]
+        birth = person["birth"]
+        print(f"ID: {person_id}, Name: {name}, Birth: {birth}")
+    try:
+        person_id = input("Intended Person ID: ")
+        if person_id in person_ids:
+            return person_id
+    except ValueError:
+        pass
+    return None
+
+
+def person_ids_for_name(name):
+    """
+    Returns a list of every IMDB id with the given name.
+    """
+    return name_index.exact(name)
+
+
+def person_info(person_id):
+    """
+    Returns a dictionary with at least the name and birth of a person.
+    """
+    if graph is not None:
+        return graph.person(graph.person_index(person_id))
+    return people[person_id]
+
+
+def movie_info(movie_id):
+    """
+    Returns a dictionary with at least the title and year of a movie.
+    """
+    if graph is not None:
+        return graph.movie(graph.movie_index(movie_id))
+    return movies[movie_id]
 
 
 def neighbors_for_person(person_id):
@@ -161,6 +589,11 @@ def neighbors_for_person(person_id):
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
+    if graph is not None:
+        return set(
+            (graph.movie_ids[movie], graph.person_ids[person])
+            for movie, person in graph.neighbors(graph.person_index(person_id))
+        )
     movie_ids = people[person_id]["movies"]
     neighbors = set()
     for movie_id in movie_ids:
@@ -169,5 +602,51 @@ def neighbors_for_person(person_id):
     return neighbors
 
 
+def costars_for_person(person_id):
+    """
+    Returns a tuple of (movie_id, person_id) pairs with one representative
+    movie for each other person who starred with a given person.
+    """
+    costars = {person_id: None}
+    for movie_id in people[person_id]["movies"]:
+        for star_id in movies[movie_id]["stars"]:
+            costars.setdefault(star_id, movie_id)
+    del costars[person_id]
+    return tuple((movie_id, star_id) for star_id, movie_id in costars.items())
+
+
+def uncached_costars(state):
+    """
+    Returns the co-stars of a search state: a person_id, or a person
+    index if the CompactGraph is loaded.
+    """
+    if graph is not None:
+        return graph.costars(state)
+    return costars_for_person(state)
+
+
+def set_neighbor_cache(maxsize):
+    """
+    Keep the co-stars of up to `maxsize` recently expanded people for
+    reuse by later searches (None for no limit, 0 to disable caching).
+    Hit and miss counters are available from costars.cache_info().
+    """
+    global costars
+    costars = functools.lru_cache(maxsize=maxsize)(uncached_costars)
+
+
+# Co-stars used to expand people during search, bounded by
+# set_neighbor_cache and cleared whenever new data is loaded
+costars = functools.lru_cache(maxsize=NEIGHBOR_CACHE_SIZE)(uncached_costars)
+
+
+# Search strategies selectable through shortest_path and --engine
+ENGINES = {
+    "bfs": breadth_first_search,
+    "bidirectional": bidirectional_search,
+    "landmarks": landmark_search,
+}
+
+
 if __name__ == "__main__":
     main()
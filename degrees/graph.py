@@ -0,0 +1,286 @@
+import bisect
+from array import array
+
+from ingest import Filters, read_movies, read_people, read_stars
+
+
+class StringTable():
+    """
+    A sequence of strings packed into one UTF-8 buffer, where string i
+    occupies data[offsets[i]:offsets[i + 1]].
+    """
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, strings):
+        offsets = array("q", [0])
+        chunks = []
+        position = 0
+        for string in strings:
+            encoded = string.encode("utf-8")
+            chunks.append(encoded)
+            position += len(encoded)
+            offsets.append(position)
+        return cls(b"".join(chunks), offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("string table index out of range")
+        return str(self.data[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+    def nbytes(self):
+        return len(self.data) + len(self.offsets) * self.offsets.itemsize
+
+
+class CompactGraph():
+    """
+    The bipartite person-movie graph with every person and movie interned
+    to a dense integer index, stored in compressed sparse row form:
+    person p starred in person_movies[person_offsets[p]:person_offsets[p + 1]]
+    and movie m starred movie_stars[movie_offsets[m]:movie_offsets[m + 1]].
+
+    Person and movie IDs are kept sorted so that an index can be found from
+    an IMDB ID by binary search, and name_order lists person indices sorted
+    by lowercased name for the same purpose.
+    """
+    def __init__(self, person_ids, person_names, person_births,
+                 movie_ids, movie_titles, movie_years,
+                 person_offsets, person_movies, movie_offsets, movie_stars,
+                 name_order):
+        self.person_ids = person_ids
+        self.person_names = person_names
+        self.person_births = person_births
+        self.movie_ids = movie_ids
+        self.movie_titles = movie_titles
+        self.movie_years = movie_years
+        self.person_offsets = person_offsets
+        self.person_movies = person_movies
+        self.movie_offsets = movie_offsets
+        self.movie_stars = movie_stars
+        self.name_order = name_order
+
+    def __len__(self):
+        return len(self.person_ids)
+
+    def person_index(self, person_id):
+        """
+        Returns the index for an IMDB person_id, or None if unknown.
+        """
+        return find(self.person_ids, person_id)
+
+    def movie_index(self, movie_id):
+        """
+        Returns the index for an IMDB movie_id, or None if unknown.
+        """
+        return find(self.movie_ids, movie_id)
+
+    def person(self, p):
+        """
+        Returns the name and birth of person index `p`.
+        """
+        return {"name": self.person_names[p], "birth": self.person_births[p]}
+
+    def movie(self, m):
+        """
+        Returns the title and year of movie index `m`.
+        """
+        return {"title": self.movie_titles[m], "year": self.movie_years[m]}
+
+    def movies_for_person(self, p):
+        return self.person_movies[self.person_offsets[p]:self.person_offsets[p + 1]]
+
+    def stars_for_movie(self, m):
+        return self.movie_stars[self.movie_offsets[m]:self.movie_offsets[m + 1]]
+
+    def neighbors(self, p):
+        """
+        Returns (movie, person) index pairs for people
+        who starred with person index `p`.
+        """
+        person_movies = self.person_movies
+        movie_offsets = self.movie_offsets
+        movie_stars = self.movie_stars
+        neighbors = set()
+        for i in range(self.person_offsets[p], self.person_offsets[p + 1]):
+            m = person_movies[i]
+            for j in range(movie_offsets[m], movie_offsets[m + 1]):
+                neighbors.add((m, movie_stars[j]))
+        return neighbors
+
+    def costars(self, p):
+        """
+        Returns a tuple of (movie, person) index pairs with one
+        representative movie for each other person who starred with
+        person index `p`.
+        """
+        person_movies = self.person_movies
+        movie_offsets = self.movie_offsets
+        movie_stars = self.movie_stars
+        costars = {p: None}
+        for i in range(self.person_offsets[p], self.person_offsets[p + 1]):
+            m = person_movies[i]
+            for j in range(movie_offsets[m], movie_offsets[m + 1]):
+                costars.setdefault(movie_stars[j], m)
+        del costars[p]
+        return tuple((m, q) for q, m in costars.items())
+
+    def distances_from(self, p):
+        """
+        Returns an array of the degrees of separation from person index `p`
+        to every person, with -1 for people not connected to `p`.
+        """
+        person_offsets = self.person_offsets
+        person_movies = self.person_movies
+        movie_offsets = self.movie_offsets
+        movie_stars = self.movie_stars
+
+        distances = array("i", [-1]) * len(self)
+        distances[p] = 0
+        # Every star of a movie is reached together, so each movie
+        # only needs to be looked at once
+        seen_movies = bytearray(len(movie_offsets) - 1)
+        layer = [p]
+        distance = 0
+        while layer:
+            distance += 1
+            next_layer = []
+            for q in layer:
+                for i in range(person_offsets[q], person_offsets[q + 1]):
+                    m = person_movies[i]
+                    if seen_movies[m]:
+                        continue
+                    seen_movies[m] = 1
+                    for j in range(movie_offsets[m], movie_offsets[m + 1]):
+                        r = movie_stars[j]
+                        if distances[r] < 0:
+                            distances[r] = distance
+                            next_layer.append(r)
+            layer = next_layer
+        return distances
+
+    def nbytes(self):
+        """
+        Returns the number of bytes held by the graph's buffers.
+        """
+        total = 0
+        for table in (self.person_ids, self.person_names, self.person_births,
+                      self.movie_ids, self.movie_titles, self.movie_years):
+            total += table.nbytes()
+        for column in (self.person_offsets, self.person_movies,
+                       self.movie_offsets, self.movie_stars, self.name_order):
+            total += len(column) * column.itemsize
+        return total
+
+
+def find(table, key):
+    """
+    Returns the position of `key` in the sorted sequence `table`, or None.
+    """
+    i = bisect.bisect_left(table, key)
+    if i < len(table) and table[i] == key:
+        return i
+    return None
+
+
+def load_graph(directory, filters=None):
+    """
+    Load data from CSV files into a CompactGraph, streaming stars.csv in
+    chunks and keeping only what `filters` (an ingest.Filters) asks for.
+    """
+    filters = filters or Filters()
+
+    # Load people, interned in sorted ID order
+    rows = sorted(read_people(directory, filters))
+    person_ids = StringTable.from_strings(row[0] for row in rows)
+    person_names = StringTable.from_strings(row[1] for row in rows)
+    person_births = StringTable.from_strings(row[2] for row in rows)
+    person_index = {row[0]: p for p, row in enumerate(rows)}
+    name_order = array("i", sorted(
+        range(len(rows)), key=lambda p: (rows[p][1].lower(), p)
+    ))
+
+    # Load movies, interned in sorted ID order
+    rows = sorted(read_movies(directory, filters))
+    movie_ids = StringTable.from_strings(row[0] for row in rows)
+    movie_titles = StringTable.from_strings(row[1] for row in rows)
+    movie_years = StringTable.from_strings(row[2] for row in rows)
+    movie_index = {row[0]: m for m, row in enumerate(rows)}
+    del rows
+
+    # Load stars into parallel arrays of person and movie indices,
+    # dropping rows that refer to unknown or filtered out people or movies
+    star_people = array("i")
+    star_movies = array("i")
+    for chunk in read_stars(directory):
+        for person_id, movie_id in chunk:
+            p = person_index.get(person_id)
+            m = movie_index.get(movie_id)
+            if p is not None and m is not None:
+                star_people.append(p)
+                star_movies.append(m)
+    n_people, n_movies = len(person_index), len(movie_index)
+    del person_index, movie_index
+
+    person_offsets, person_movies, movie_offsets, movie_stars = build_csr(
+        star_people, star_movies, n_people, n_movies
+    )
+    return CompactGraph(
+        person_ids, person_names, person_births,
+        movie_ids, movie_titles, movie_years,
+        person_offsets, person_movies, movie_offsets, movie_stars,
+        name_order
+    )
+
+
+def build_csr(star_people, star_movies, n_people, n_movies):
+    """
+    Build both CSR directions of the person-movie graph from parallel
+    arrays of (person, movie) index pairs, dropping duplicate pairs.
+    """
+    # Counting sort the pairs by person
+    person_offsets = array("q", bytes(8 * (n_people + 1)))
+    for p in star_people:
+        person_offsets[p + 1] += 1
+    for p in range(n_people):
+        person_offsets[p + 1] += person_offsets[p]
+    person_movies = array("i", bytes(4 * len(star_people)))
+    cursor = array("q", person_offsets[:-1])
+    for p, m in zip(star_people, star_movies):
+        person_movies[cursor[p]] = m
+        cursor[p] += 1
+    del cursor
+
+    # Sort each person's movies and drop duplicates, compacting in place
+    write = 0
+    start = 0
+    for p in range(n_people):
+        end = person_offsets[p + 1]
+        movies = sorted(set(person_movies[start:end]))
+        person_movies[write:write + len(movies)] = array("i", movies)
+        person_offsets[p] = write
+        write += len(movies)
+        start = end
+    person_offsets[n_people] = write
+    del person_movies[write:]
+
+    # Counting sort the same pairs by movie to get the reverse direction
+    movie_offsets = array("q", bytes(8 * (n_movies + 1)))
+    for m in person_movies:
+        movie_offsets[m + 1] += 1
+    for m in range(n_movies):
+        movie_offsets[m + 1] += movie_offsets[m]
+    movie_stars = array("i", bytes(4 * len(person_movies)))
+    cursor = array("q", movie_offsets[:-1])
+    for p in range(n_people):
+        for i in range(person_offsets[p], person_offsets[p + 1]):
+            m = person_movies[i]
+            movie_stars[cursor[m]] = p
+            cursor[m] += 1
+    return person_offsets, person_movies, movie_offsets, movie_stars
@@ -0,0 +1,109 @@
+import csv
+import itertools
+
+# Number of stars.csv rows handed out at a time
+CHUNK_SIZE = 1 << 16
+
+
+class Filters():
+    """
+    What to keep while reading the CSV files.
+
+    years: (first, last) inclusive range of movie years to keep, either
+           end None for no limit, or None to keep movies of any year
+    min_cast: keep only movies listing at least this many stars
+    project: drop the columns search does not need (birth, title, year)
+    """
+    def __init__(self, years=None, min_cast=0, project=False):
+        self.years = years
+        self.min_cast = min_cast
+        self.project = project
+
+    def key(self):
+        """
+        Returns the filters as a JSON-serialisable value, so data stored
+        with one set of filters is not mistaken for another.
+        """
+        return {
+            "years": None if self.years is None else list(self.years),
+            "min_cast": self.min_cast,
+            "project": self.project,
+        }
+
+    def keep_year(self, year):
+        if self.years is None:
+            return True
+        try:
+            year = int(year)
+        except ValueError:
+            return False
+        first, last = self.years
+        return ((first is None or year >= first) and
+                (last is None or year <= last))
+
+
+def read_rows(filename, columns):
+    """
+    Yield a tuple of the named `columns` for each row of a CSV file,
+    without building a dictionary per row.
+    """
+    with open(filename, encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        positions = [header.index(column) for column in columns]
+        for row in reader:
+            yield tuple(row[position] for position in positions)
+
+
+def read_people(directory, filters):
+    """
+    Yield (id, name, birth) for each person, with birth left empty
+    when projected away.
+    """
+    if filters.project:
+        for person_id, name in read_rows(f"{directory}/people.csv",
+                                         ["id", "name"]):
+            yield person_id, name, ""
+    else:
+        yield from read_rows(f"{directory}/people.csv", ["id", "name", "birth"])
+
+
+def read_movies(directory, filters):
+    """
+    Yield (id, title, year) for each movie passing the year and cast size
+    filters, with title and year left empty when projected away.
+    """
+    cast_sizes = None
+    if filters.min_cast > 0:
+        cast_sizes = count_cast(directory)
+    columns = ["id", "year"] if filters.project else ["id", "title", "year"]
+    for row in read_rows(f"{directory}/movies.csv", columns):
+        movie_id, year = row[0], row[-1]
+        if not filters.keep_year(year):
+            continue
+        if cast_sizes is not None and cast_sizes.get(movie_id, 0) < filters.min_cast:
+            continue
+        if filters.project:
+            yield movie_id, "", ""
+        else:
+            yield row
+
+
+def count_cast(directory):
+    """
+    Return the number of stars.csv rows listing each movie_id.
+    """
+    counts = {}
+    for chunk in read_stars(directory):
+        for _, movie_id in chunk:
+            counts[movie_id] = counts.get(movie_id, 0) + 1
+    return counts
+
+
+def read_stars(directory, chunk_size=CHUNK_SIZE):
+    """
+    Yield lists of up to `chunk_size` (person_id, movie_id) rows.
+    """
+    rows = read_rows(f"{directory}/stars.csv", ["person_id", "movie_id"])
+    while chunk := list(itertools.islice(rows, chunk_size)):
+        yield chunk
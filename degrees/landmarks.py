@@ -0,0 +1,186 @@
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+import snapshot
+from ingest import Filters
+
+# Bump whenever the layout of the landmarks file changes
+VERSION = 2
+
+MAGIC = b"DEGLMRK\0"
+
+# Name of the landmarks file written next to the CSV files
+FILENAME = "degrees.landmarks"
+
+# Stored distance for people a landmark is not connected to
+UNREACHABLE = 0xFFFF
+
+
+class LandmarkIndex():
+    """
+    Degrees of separation from a few landmark people to everyone else.
+
+    By the triangle inequality, for any landmark L the distance between
+    s and t is at least |d(L, s) - d(L, t)| and at most d(L, s) + d(L, t),
+    and if L is connected to exactly one of s and t then s and t are not
+    connected at all.
+    """
+    def __init__(self, landmarks, distances):
+        self.landmarks = landmarks
+        self.distances = distances
+
+    def bounds(self, s, t):
+        """
+        Returns (lower, upper) bounds on the degrees of separation between
+        person indices `s` and `t`. Both are math.inf if the two are known
+        not to be connected, and upper is math.inf if no landmark is
+        connected to either.
+        """
+        lower, upper = 0, math.inf
+        for distances in self.distances:
+            ds, dt = distances[s], distances[t]
+            if ds == UNREACHABLE and dt == UNREACHABLE:
+                continue
+            if ds == UNREACHABLE or dt == UNREACHABLE:
+                return math.inf, math.inf
+            lower = max(lower, abs(ds - dt))
+            upper = min(upper, ds + dt)
+        return lower, upper
+
+    def heuristic(self, t):
+        """
+        Returns a function giving a lower bound on the distance from a
+        person index to `t`, or math.inf if it cannot reach `t`.
+        """
+        targets = [(distances, distances[t]) for distances in self.distances]
+
+        def estimate(n):
+            best = 0
+            for distances, dt in targets:
+                dn = distances[n]
+                if dn == UNREACHABLE and dt == UNREACHABLE:
+                    continue
+                if dn == UNREACHABLE or dt == UNREACHABLE:
+                    return math.inf
+                best = max(best, abs(dn - dt))
+            return best
+        return estimate
+
+
+def load_landmarks(directory, graph, k, filters=None):
+    """
+    Return the LandmarkIndex of `k` landmarks stored for `directory` if it
+    is still current, otherwise build one from `graph`, which was loaded
+    with `filters`, and store it.
+    """
+    filters = filters or Filters()
+    path = os.path.join(directory, FILENAME)
+    index = read_landmarks(path, directory, graph, k, filters)
+    if index is not None:
+        return index
+
+    sources = snapshot.fingerprint(directory)
+    index = build_landmarks(graph, k)
+    try:
+        write_landmarks(index, path, sources, filters)
+    except OSError:
+        pass
+    return index
+
+
+def build_landmarks(graph, k):
+    """
+    Pick the `k` people with the most co-star appearances as landmarks
+    and compute the distance from each of them to everyone.
+    """
+    degree = array("q", bytes(8 * len(graph)))
+    for p in range(len(graph)):
+        for m in graph.movies_for_person(p):
+            degree[p] += graph.movie_offsets[m + 1] - graph.movie_offsets[m]
+    landmarks = sorted(range(len(graph)), key=lambda p: (-degree[p], p))[:k]
+
+    distances = []
+    for landmark in landmarks:
+        row = array("H", [UNREACHABLE]) * len(graph)
+        for p, distance in enumerate(graph.distances_from(landmark)):
+            if distance >= 0:
+                row[p] = min(distance, UNREACHABLE - 1)
+        distances.append(row)
+    return LandmarkIndex(array("i", landmarks), distances)
+
+
+def write_landmarks(index, path, sources, filters):
+    """
+    Write `index` to `path` as a header followed by its distance rows.
+    """
+    header = json.dumps({
+        "version": VERSION,
+        "byteorder": sys.byteorder,
+        "sources": sources,
+        "filters": filters.key(),
+        "landmarks": list(index.landmarks),
+        "people": len(index.distances[0]) if index.distances else 0,
+    }).encode("utf-8")
+    prefix = MAGIC + struct.pack("<IQ", VERSION, len(header)) + header
+    start = snapshot.padded(len(prefix))
+
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "wb") as f:
+            f.write(prefix + bytes(start - len(prefix)))
+            for row in index.distances:
+                f.write(bytes(row))
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def read_landmarks(path, directory, graph, k, filters):
+    """
+    Return the LandmarkIndex stored at `path`, memory-mapped, or None if
+    it is missing, out of date, or has a different number of landmarks.
+    """
+    try:
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    fixed = len(MAGIC) + struct.calcsize("<IQ")
+    try:
+        if mapped[:len(MAGIC)] != MAGIC:
+            return None
+        version, length = struct.unpack("<IQ", mapped[len(MAGIC):fixed])
+        if version != VERSION:
+            return None
+        header = json.loads(mapped[fixed:fixed + length])
+        recorded = json.dumps(header["sources"])
+        if (header["byteorder"] != sys.byteorder or
+                len(header["landmarks"]) != min(k, len(graph)) or
+                header["people"] != len(graph) or
+                header["filters"] != filters.key() or
+                not snapshot.is_current(header["sources"], directory)):
+            return None
+
+        start = snapshot.padded(fixed + length)
+        if json.dumps(header["sources"]) != recorded:
+            snapshot.rewrite_header(path, header, fixed, start)
+        view = memoryview(mapped)
+        size = 2 * len(graph)
+        if start + len(header["landmarks"]) * size > len(mapped):
+            return None
+        distances = [
+            view[start + i * size:start + (i + 1) * size].cast("H")
+            for i in range(len(header["landmarks"]))
+        ]
+        landmarks = array("i", header["landmarks"])
+    except (struct.error, ValueError, KeyError, TypeError):
+        # A truncated or corrupt landmarks file is as good as a stale one
+        return None
+    return LandmarkIndex(landmarks, distances)
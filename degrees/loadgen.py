@@ -0,0 +1,90 @@
+import argparse
+import csv
+import json
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Send concurrent queries to server.py and report throughput."
+    )
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--pairs", metavar="FILE",
+                        help="tab-separated name pairs to query "
+                             "(default: random names from --directory)")
+    parser.add_argument("--directory", default="large",
+                        help="data directory to draw random names from")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.pairs:
+        pairs = read_pairs(args.pairs)
+    else:
+        pairs = random_pairs(args.directory, args.requests, args.seed)
+    pairs = [pairs[i % len(pairs)] for i in range(args.requests)]
+
+    def send(pair):
+        url = f"{args.url}/path?" + urlencode(
+            {"source": pair[0], "target": pair[1]}
+        )
+        start = time.perf_counter()
+        with urlopen(url) as response:
+            result = json.load(response)
+        return time.perf_counter() - start, "error" in result
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(send, pairs))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for latency, _ in results)
+    errors = sum(error for _, error in results)
+    print(f"{len(results)} requests in {elapsed:.2f}s "
+          f"with concurrency {args.concurrency}")
+    print(f"Throughput: {len(results) / elapsed:.1f} requests/s")
+    print(f"Latency: mean {1000 * statistics.mean(latencies):.2f}ms, "
+          f"p50 {1000 * percentile(latencies, 50):.2f}ms, "
+          f"p95 {1000 * percentile(latencies, 95):.2f}ms, "
+          f"p99 {1000 * percentile(latencies, 99):.2f}ms")
+    print(f"Unresolved names: {errors}")
+
+
+def read_pairs(filename):
+    """
+    Return the (source, target) name pairs in a tab-separated file.
+    """
+    pairs = []
+    with open(filename, encoding="utf-8") as f:
+        for line in f:
+            source, _, target = line.rstrip("\r\n").partition("\t")
+            if source.strip() and target.strip():
+                pairs.append((source.strip(), target.strip()))
+    return pairs
+
+
+def random_pairs(directory, n, seed):
+    """
+    Return `n` random (source, target) name pairs from a data directory.
+    """
+    with open(f"{directory}/people.csv", encoding="utf-8") as f:
+        names = [row["name"] for row in csv.DictReader(f)]
+    rng = random.Random(seed)
+    return [(rng.choice(names), rng.choice(names)) for _ in range(n)]
+
+
+def percentile(values, p):
+    """
+    Return the `p`th percentile of sorted `values`.
+    """
+    return values[min(len(values) - 1, len(values) * p // 100)]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import bisect
+from array import array
+
+# Length of the character n-grams used to find fuzzy match candidates
+GRAM = 3
+
+
+class NameIndex():
+    """
+    Person names sorted case-insensitively for exact and prefix lookups,
+    plus an n-gram index of the distinct names for edit-distance search.
+
+    names[i] is the name of entry i and ids[i] its person_id, with entries
+    ordered by lowercased name. Both only need to support indexing and
+    len(), so they can be views over a CompactGraph.
+    """
+    def __init__(self, names, ids):
+        self.names = names
+        self.ids = ids
+        self.entries = range(len(names))
+        # Built on the first fuzzy search, see build_grams
+        self.distinct = None
+        self.postings = None
+
+    @classmethod
+    def from_pairs(cls, pairs):
+        """
+        Build an index from (name, person_id) pairs in any order.
+        """
+        pairs = sorted(pairs, key=lambda pair: (pair[0].lower(), pair[1]))
+        return cls([name for name, _ in pairs], [id for _, id in pairs])
+
+    def key(self, i):
+        return self.names[i].lower()
+
+    def exact(self, name):
+        """
+        Returns the person_ids of everyone named `name`, ignoring case.
+        """
+        name = name.lower()
+        start = bisect.bisect_left(self.entries, name, key=self.key)
+        end = bisect.bisect_right(self.entries, name, lo=start, key=self.key)
+        return [self.ids[i] for i in range(start, end)]
+
+    def complete(self, prefix, limit=10):
+        """
+        Returns up to `limit` distinct names starting with `prefix`,
+        ignoring case, in alphabetical order.
+        """
+        prefix = prefix.lower()
+        start = bisect.bisect_left(self.entries, prefix, key=self.key)
+        completions = []
+        previous = None
+        for i in range(start, len(self.entries)):
+            key = self.key(i)
+            if not key.startswith(prefix) or len(completions) == limit:
+                break
+            if key != previous:
+                completions.append(self.names[i])
+                previous = key
+        return completions
+
+    def search(self, name, max_distance=2, limit=10):
+        """
+        Returns up to `limit` (distance, name) pairs for the distinct names
+        within `max_distance` edits of `name`, ignoring case, closest first.
+        """
+        if self.postings is None:
+            self.build_grams()
+        query = name.lower()
+        query_grams = set(ngrams(query))
+        grams = sorted(query_grams,
+                       key=lambda gram: len(self.postings.get(gram, ())))
+
+        # A name within k edits shares all but at most k * GRAM of the
+        # query's n-grams, so it must contain one of the rarest
+        # k * GRAM + 1 of them
+        needed = max_distance * GRAM + 1
+        if needed <= len(grams):
+            candidates = set()
+            for gram in grams[:needed]:
+                candidates.update(self.postings.get(gram, ()))
+        else:
+            candidates = range(len(self.distinct))
+        shared = len(grams) - max_distance * GRAM
+
+        matches = []
+        for position in candidates:
+            i = self.distinct[position]
+            key = self.key(i)
+            if abs(len(key) - len(query)) > max_distance:
+                continue
+            # Cheaper than computing the edit distance of a near miss
+            if shared > 0 and len(query_grams.intersection(ngrams(key))) < shared:
+                continue
+            distance = edit_distance(query, key, max_distance)
+            if distance is not None:
+                matches.append((distance, key, self.names[i]))
+        matches.sort()
+        return [(distance, name) for distance, _, name in matches[:limit]]
+
+    def build_grams(self):
+        """
+        Index every distinct lowercased name by its n-grams.
+        """
+        distinct = array("i")
+        postings = {}
+        previous = None
+        for i in self.entries:
+            key = self.key(i)
+            if key == previous:
+                continue
+            previous = key
+            for gram in set(ngrams(key)):
+                postings.setdefault(gram, array("i")).append(len(distinct))
+            distinct.append(i)
+        self.distinct = distinct
+        self.postings = postings
+
+
+class Permutation():
+    """
+    A read-only view of `table` reordered by `order`.
+    """
+    def __init__(self, table, order):
+        self.table = table
+        self.order = order
+
+    def __len__(self):
+        return len(self.order)
+
+    def __getitem__(self, i):
+        return self.table[self.order[i]]
+
+
+def graph_name_index(graph):
+    """
+    Build a NameIndex over a CompactGraph without copying its names.
+    """
+    return NameIndex(Permutation(graph.person_names, graph.name_order),
+                     Permutation(graph.person_ids, graph.name_order))
+
+
+def ngrams(text):
+    """
+    Returns the n-grams of `text`, padded so its ends form n-grams too.
+    """
+    padded = " " * (GRAM - 1) + text + " " * (GRAM - 1)
+    return [padded[i:i + GRAM] for i in range(len(padded) - GRAM + 1)]
+
+
+def edit_distance(a, b, limit):
+    """
+    Returns the Levenshtein distance between `a` and `b`, or None if it
+    is greater than `limit`.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return None
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ca != cb)
+            ))
+        if min(current) > limit:
+            return None
+        previous = current
+    return previous[-1] if previous[-1] <= limit else None
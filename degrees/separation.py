@@ -0,0 +1,120 @@
+import argparse
+import csv
+import multiprocessing
+import os
+import random
+import time
+from collections import Counter
+
+import degrees
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Degrees of separation statistics across the whole graph."
+    )
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="memory-map the data from a cached binary snapshot")
+    parser.add_argument("--sample", type=int,
+                        help="run from this many random people instead of "
+                             "everyone, to bound the runtime")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--eccentricities", metavar="FILE",
+                        help="write each source's eccentricity to a CSV file")
+    args = parser.parse_args()
+
+    print("Loading data...")
+    degrees.load_data(args.directory, compact=True, snapshot=args.snapshot)
+    print("Data loaded.")
+    graph = degrees.graph
+
+    sources = range(len(graph))
+    if args.sample is not None and args.sample < len(graph):
+        sources = random.Random(args.seed).sample(sources, args.sample)
+
+    start = time.perf_counter()
+    results = separation_statistics(sources, args.workers)
+    elapsed = time.perf_counter() - start
+    print(f"Searched from {len(results['eccentricity'])} people "
+          f"in {elapsed:.2f}s with {args.workers} workers")
+    report(results, graph)
+
+    if args.eccentricities:
+        with open(args.eccentricities, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["person_id", "name", "eccentricity", "reachable"])
+            for p in sorted(results["eccentricity"]):
+                writer.writerow([
+                    graph.person_ids[p], graph.person_names[p],
+                    results["eccentricity"][p], results["reachable"][p]
+                ])
+
+
+def separation_statistics(sources, workers):
+    """
+    Run a breadth-first search from every person index in `sources` on
+    the loaded CompactGraph, spread over `workers` processes.
+
+    Returns a dictionary of:
+        histogram: count of connected (source, person) pairs at each distance
+        eccentricity: distance from each source to the farthest person
+                      it is connected to
+        reachable: number of people each source is connected to
+    """
+    results = {"histogram": Counter(), "eccentricity": {}, "reachable": {}}
+
+    # Workers are forked from this process so they read the graph
+    # that is already loaded rather than each loading a copy
+    context = multiprocessing.get_context("fork")
+    chunksize = max(1, min(64, len(sources) // (4 * workers)))
+    with context.Pool(workers) as pool:
+        for p, histogram in pool.imap_unordered(
+                single_source, sources, chunksize):
+            results["histogram"].update(histogram)
+            results["eccentricity"][p] = max(histogram, default=0)
+            results["reachable"][p] = sum(histogram.values())
+    return results
+
+
+def single_source(p):
+    """
+    Return `p` with a Counter of how many people lie at each distance
+    from it, not counting `p` itself or people it is not connected to.
+    """
+    histogram = Counter(degrees.graph.distances_from(p))
+    del histogram[-1]
+    del histogram[0]
+    return p, histogram
+
+
+def report(results, graph):
+    """
+    Print the distance histogram, mean separation and diameter estimate.
+    """
+    histogram = results["histogram"]
+    pairs = sum(histogram.values())
+    if pairs == 0:
+        print("No connected pairs.")
+        return
+
+    print("Degrees of separation:")
+    for distance in sorted(histogram):
+        share = histogram[distance] / pairs
+        print(f"  {distance:>3}: {histogram[distance]:>12} ({share:.2%})")
+    mean = sum(d * count for d, count in histogram.items()) / pairs
+    print(f"Average degrees of separation: {mean:.3f}")
+
+    # With sampled sources this is only a lower bound on the diameter
+    eccentricity = results["eccentricity"]
+    diameter = max(eccentricity.values())
+    sampled = len(eccentricity) < len(graph)
+    print(f"{'Estimated diameter' if sampled else 'Diameter'}: {diameter}")
+    farthest = max(eccentricity, key=lambda p: (eccentricity[p], -p))
+    print(f"Most eccentric: {graph.person_names[farthest]} "
+          f"({graph.person_ids[farthest]}), {diameter} degrees")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import argparse
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import degrees
+
+# Pool of worker processes answering queries, created once data is loaded
+pool = None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Answer degrees queries over HTTP, keeping the data loaded."
+    )
+    degrees.add_data_arguments(parser)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="number of processes answering queries")
+    args = parser.parse_args()
+    degrees.check_data_arguments(parser, args)
+    degrees.set_neighbor_cache(args.neighbor_cache)
+
+    print("Loading data...")
+    degrees.load_data(args.directory, compact=args.compact,
+                      snapshot=args.snapshot, landmarks=args.landmarks,
+                      years=args.years, min_cast=args.min_cast,
+                      project=args.project)
+    print("Data loaded.")
+
+    # Workers are forked after loading so they share the data with us
+    # instead of each loading their own copy
+    global pool
+    pool = ProcessPoolExecutor(
+        max_workers=args.workers,
+        mp_context=multiprocessing.get_context("fork"),
+    )
+    # Fork every worker now, from this single thread, rather than on the
+    # first submit from a request handler thread; a fork pool starts all
+    # of its workers together
+    pool.submit(int).result()
+    QueryHandler.engine = args.engine
+
+    server = ThreadingHTTPServer((args.host, args.port), QueryHandler)
+    print(f"Serving on http://{args.host}:{server.server_port}/path"
+          f"?source=NAME&target=NAME with {args.workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pool.shutdown()
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """
+    Answers GET /path?source=NAME&target=NAME[&engine=ENGINE] with the
+    JSON produced by degrees.query.
+    """
+    engine = "bfs"
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != "/path":
+            return self.send_json(404, {"error": "unknown path"})
+
+        params = parse_qs(url.query)
+        source = params.get("source", [None])[0]
+        target = params.get("target", [None])[0]
+        engine = params.get("engine", [self.engine])[0]
+        if source is None or target is None:
+            return self.send_json(400, {"error": "source and target required"})
+        if engine not in degrees.ENGINES:
+            return self.send_json(400, {"error": "unknown engine"})
+        if engine == "landmarks" and degrees.landmark_index is None:
+            return self.send_json(400, {"error": "landmarks engine needs a "
+                                                 "server started with "
+                                                 "--landmarks K"})
+
+        try:
+            result = pool.submit(degrees.query, source, target,
+                                 engine).result()
+        except Exception as e:
+            return self.send_json(500, {"error": str(e) or type(e).__name__})
+        self.send_json(200, result)
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # Per-request logging would dominate the cost of small queries
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from graph import CompactGraph, StringTable, load_graph
+from ingest import Filters
+
+# Bump whenever the layout of the snapshot file changes
+VERSION = 2
+
+MAGIC = b"DEGSNAP\0"
+
+# Name of the snapshot file written next to the CSV files
+FILENAME = "degrees.snapshot"
+
+SOURCES = ["people.csv", "movies.csv", "stars.csv"]
+
+TABLES = ["person_ids", "person_names", "person_births",
+          "movie_ids", "movie_titles", "movie_years"]
+
+COLUMNS = ["person_offsets", "person_movies",
+           "movie_offsets", "movie_stars", "name_order"]
+
+
+def load_cached_graph(directory, filters=None):
+    """
+    Return a CompactGraph for `directory`, memory-mapped from its snapshot
+    if one exists and still matches the CSV files and `filters`. Otherwise
+    the graph is loaded from CSV and a fresh snapshot is written for next
+    time.
+    """
+    filters = filters or Filters()
+    path = os.path.join(directory, FILENAME)
+    graph = read_snapshot(path, directory, filters)
+    if graph is not None:
+        return graph
+
+    sources = fingerprint(directory)
+    graph = load_graph(directory, filters)
+    try:
+        write_snapshot(graph, path, sources, filters)
+    except OSError:
+        # An unwritable data directory only costs us the cache
+        pass
+    return graph
+
+
+def fingerprint(directory):
+    """
+    Return the size, modification time and hash of each CSV file.
+    """
+    return {
+        name: {**file_stat(os.path.join(directory, name)),
+               "blake2b": file_hash(os.path.join(directory, name))}
+        for name in SOURCES
+    }
+
+
+def file_stat(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def file_hash(path):
+    digest = hashlib.blake2b()
+    with open(path, "rb") as f:
+        while chunk := f.read(1 << 20):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_current(sources, directory):
+    """
+    Return True if every CSV file still matches its recorded fingerprint.
+    A file whose size changed is stale; one whose modification time changed
+    is only stale if its contents hash differently, and otherwise has its
+    new modification time recorded in `sources`.
+    """
+    for name in SOURCES:
+        path = os.path.join(directory, name)
+        try:
+            stat = file_stat(path)
+        except OSError:
+            return False
+        recorded = sources.get(name)
+        if recorded is None or recorded["size"] != stat["size"]:
+            return False
+        if recorded["mtime_ns"] != stat["mtime_ns"]:
+            if recorded["blake2b"] != file_hash(path):
+                return False
+            recorded["mtime_ns"] = stat["mtime_ns"]
+    return True
+
+
+def rewrite_header(path, header, fixed, start):
+    """
+    Rewrite the JSON header of the file at `path` in place, so the next
+    start need not hash CSV files that were only touched. `fixed` is where
+    the header begins and `start` where the data after it begins; a header
+    that no longer fits, or a file that cannot be written, is left alone.
+    """
+    data = json.dumps(header).encode("utf-8")
+    if fixed + len(data) > start:
+        return
+    try:
+        with open(path, "r+b") as f:
+            f.seek(fixed - struct.calcsize("<Q"))
+            f.write(struct.pack("<Q", len(data)) + data)
+    except OSError:
+        pass
+
+
+def write_snapshot(graph, path, sources, filters):
+    """
+    Write `graph` to `path` as a header followed by its raw buffers,
+    each aligned to 8 bytes so they can be memory-mapped in place.
+    """
+    buffers = []
+    for name in TABLES:
+        table = getattr(graph, name)
+        buffers.append((f"{name}.data", "B", bytes(table.data)))
+        buffers.append((f"{name}.offsets", "q", bytes(table.offsets)))
+    for name in COLUMNS:
+        column = getattr(graph, name)
+        buffers.append((name, column.typecode, bytes(column)))
+
+    sections = {}
+    position = 0
+    for name, typecode, data in buffers:
+        sections[name] = [position, len(data), typecode]
+        position += padded(len(data))
+
+    header = json.dumps({
+        "version": VERSION,
+        "byteorder": sys.byteorder,
+        "itemsizes": {code: array(code).itemsize for code in "Biq"},
+        "sources": sources,
+        "filters": filters.key(),
+        "sections": sections,
+    }).encode("utf-8")
+    prefix = MAGIC + struct.pack("<IQ", VERSION, len(header)) + header
+    start = padded(len(prefix))
+
+    # Write to a temporary file first so readers never see half a snapshot
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "wb") as f:
+            f.write(prefix + bytes(start - len(prefix)))
+            for name, typecode, data in buffers:
+                f.write(data + bytes(padded(len(data)) - len(data)))
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def read_snapshot(path, directory, filters):
+    """
+    Return the CompactGraph stored at `path`, backed by a read-only memory
+    map, or None if there is no usable snapshot for `directory` loaded
+    with `filters`.
+    """
+    try:
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    fixed = len(MAGIC) + struct.calcsize("<IQ")
+    try:
+        if mapped[:len(MAGIC)] != MAGIC:
+            return None
+        version, length = struct.unpack("<IQ", mapped[len(MAGIC):fixed])
+        if version != VERSION:
+            return None
+        header = json.loads(mapped[fixed:fixed + length])
+        if (header["byteorder"] != sys.byteorder or
+                any(array(code).itemsize != size
+                    for code, size in header["itemsizes"].items())):
+            return None
+        recorded = json.dumps(header["sources"])
+        if (header["filters"] != filters.key() or
+                not is_current(header["sources"], directory)):
+            return None
+
+        start = padded(fixed + length)
+        if json.dumps(header["sources"]) != recorded:
+            rewrite_header(path, header, fixed, start)
+        view = memoryview(mapped)
+        sections = {}
+        for name, (offset, size, typecode) in header["sections"].items():
+            if start + offset + size > len(mapped):
+                return None
+            sections[name] = view[start + offset:start + offset + size].cast(
+                typecode)
+
+        fields = {
+            name: StringTable(sections[f"{name}.data"],
+                              sections[f"{name}.offsets"])
+            for name in TABLES
+        }
+        fields.update({name: sections[name] for name in COLUMNS})
+    except (struct.error, ValueError, KeyError, TypeError):
+        # A truncated or corrupt snapshot is as good as a stale one
+        return None
+    return CompactGraph(**fields)
+
+
+def padded(size):
+    return (size + 7) // 8 * 8
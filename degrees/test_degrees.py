@@ -0,0 +1,41 @@
+import os
+import unittest
+
+import degrees
+
+SMALL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "small")
+
+
+class FilteredQueryTest(unittest.TestCase):
+    """
+    Queries over data loaded with --years agree between the dict and
+    compact engines, and never reach movies that were filtered out.
+    """
+    def setUp(self):
+        degrees.people.clear()
+        degrees.movies.clear()
+
+    def tearDown(self):
+        degrees.people.clear()
+        degrees.movies.clear()
+
+    def test_dict_engine_skips_filtered_movies(self):
+        degrees.load_data(SMALL, years=(1990, None))
+        for person in degrees.people.values():
+            self.assertLessEqual(person["movies"], degrees.movies.keys())
+        result = degrees.query("Tom Cruise", "Robin Wright")
+        self.assertEqual(result["degrees"], 3)
+        for step in result["path"]:
+            self.assertGreaterEqual(
+                int(degrees.movies[step["movie_id"]]["year"]), 1990)
+
+    def test_dict_and_compact_engines_agree(self):
+        degrees.load_data(SMALL, years=(1990, None))
+        expected = degrees.query("Tom Cruise", "Robin Wright")["degrees"]
+        degrees.load_data(SMALL, compact=True, years=(1990, None))
+        result = degrees.query("Tom Cruise", "Robin Wright")
+        self.assertEqual(result["degrees"], expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,223 @@
+import argparse
+import csv
+import multiprocessing
+import os
+import sys
+import time
+
+from heredity import PROBS, enumerate_probabilities, load_data
+from inference import eliminate
+from model import DEFAULT_MODEL, load_model
+from sampling import topological_order
+from vectorized import vectorized_probabilities
+
+ENGINES = {
+    "enumerate": enumerate_probabilities,
+    "vectorized": vectorized_probabilities,
+    "eliminate": eliminate,
+}
+
+# Families parsed or solved by a worker per task
+CHUNK_SIZE = 16
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compute gene and trait probabilities for every family "
+                    "in a directory of CSV files."
+    )
+    parser.add_argument("directory")
+    parser.add_argument("output", help="CSV file to write every family's "
+                                       "probabilities to")
+    parser.add_argument("--engine", choices=sorted(ENGINES),
+                        default="eliminate")
+    parser.add_argument("--workers", type=int,
+                        help="processes, one per CPU by default")
+    parser.add_argument("--model", default=DEFAULT_MODEL,
+                        help="JSON file of gene, trait and mutation "
+                             "probabilities")
+    args = parser.parse_args()
+    try:
+        probs = load_model(args.model)
+    except (OSError, ValueError) as e:
+        sys.exit(f"Cannot load model: {e}")
+
+    start = time.perf_counter()
+    results, solved, errors = run(args.directory, args.engine, args.workers,
+                                  probs)
+    write_results(results, args.output)
+    elapsed = time.perf_counter() - start
+
+    for filename, error in errors.items():
+        print(f"{filename}: {error}", file=sys.stderr)
+    print(f"{len(results)} families ({solved} distinct) in {elapsed:.2f}s, "
+          f"{len(results) / elapsed:.1f} families/s")
+
+
+def run(directory, engine="eliminate", workers=None, probs=PROBS):
+    """
+    Solve every family in the CSV files directly inside `directory`, in a
+    pool of `workers` processes (one per CPU if None), solving families
+    with the same structure and evidence only once.
+
+    Return (results, solved, errors): a dictionary from file name to the
+    probabilities heredity.main computes, sorted by file name; the number
+    of distinct families solved; and a dictionary from file name to why
+    that family could not be solved.
+    """
+    filenames = sorted(name for name in os.listdir(directory)
+                       if name.endswith(".csv"))
+    paths = [os.path.join(directory, name) for name in filenames]
+    if workers == 1:
+        mapper = map
+        pool = None
+    else:
+        pool = multiprocessing.Pool(workers)
+        mapper = lambda function, items: pool.imap(function, items,
+                                                   chunksize=CHUNK_SIZE)
+    try:
+        families = list(mapper(read_family, paths))
+        # Solve each distinct family once, under its canonical names
+        keys = {}
+        for key, _, _ in families:
+            if key is not None:
+                keys.setdefault(key, len(keys))
+        tasks = [(key, engine, probs) for key in keys]
+        solutions = list(mapper(solve, tasks))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    results = {}
+    errors = {}
+    for filename, (key, names, listed) in zip(filenames, families):
+        if key is None:
+            errors[filename] = names
+            continue
+        solution = solutions[keys[key]]
+        if isinstance(solution, str):
+            errors[filename] = solution
+            continue
+        solved = dict(zip(names, solution))
+        results[filename] = {name: solved[name] for name in listed}
+    return results, len(keys), errors
+
+
+def read_family(path):
+    """
+    Load a family and return (key, names, listed): its canonical form, the
+    names of its people in canonical order and in the order listed, or
+    (None, why it could not be read, None).
+    """
+    try:
+        people = load_data(path)
+        key, names = canonical_form(people)
+        # Families where someone is their own ancestor cannot be solved
+        topological_order([pair for pair, _ in key])
+    except (OSError, KeyError, ValueError, csv.Error) as e:
+        return None, f"cannot read family: {e!r}", None
+    return key, names, list(people)
+
+
+def canonical_form(people):
+    """
+    Return (key, names) for a family: a key made of each person's
+    (mother, father, trait), with parents given by their position in
+    canonical order, and the names of the people in that order.
+
+    Families that are the same up to the names and order of their people
+    usually get the same key, and families with the same key always have
+    the same structure and evidence, so they can share one solution.
+    """
+    names = list(people)
+    index = {name: i for i, name in enumerate(names)}
+    parents = [
+        (index[people[name]["mother"]], index[people[name]["father"]])
+        if people[name]["mother"] is not None else None
+        for name in names
+    ]
+    children = [[] for _ in names]
+    for child, pair in enumerate(parents):
+        if pair is not None:
+            children[pair[0]].append((child, 0, pair[1]))
+            children[pair[1]].append((child, 1, pair[0]))
+
+    # Refine classes of people by their evidence and their relatives'
+    # classes until no class splits any further
+    colors = renumber([(people[name]["trait"] is None,
+                        people[name]["trait"] is True,
+                        parents[i] is None) for i, name in enumerate(names)])
+    while True:
+        signatures = [
+            (colors[i],
+             None if pair is None else (colors[pair[0]], colors[pair[1]]),
+             tuple(sorted((colors[child], role, colors[other])
+                          for child, role, other in children[i])))
+            for i, pair in enumerate(parents)
+        ]
+        refined = renumber(signatures)
+        if len(set(refined)) == len(set(colors)):
+            break
+        colors = refined
+
+    # People still alike are kept in the order they were given
+    order = sorted(range(len(names)), key=lambda i: colors[i])
+    position = {person: i for i, person in enumerate(order)}
+    key = tuple(
+        (None if parents[person] is None else
+         (position[parents[person][0]], position[parents[person][1]]),
+         people[names[person]]["trait"])
+        for person in order
+    )
+    return key, [names[person] for person in order]
+
+
+def renumber(signatures):
+    """
+    Replace each signature with its rank among the distinct signatures.
+    """
+    ranks = {signature: rank for rank, signature in enumerate(
+        sorted(set(signatures), key=repr)
+    )}
+    return [ranks[signature] for signature in signatures]
+
+
+def solve(task):
+    """
+    Return the distributions of the people of a canonical family, in
+    canonical order, or why they could not be computed.
+    """
+    key, engine, probs = task
+    people = {}
+    for person, (pair, trait) in enumerate(key):
+        people[str(person)] = {
+            "name": str(person),
+            "mother": None if pair is None else str(pair[0]),
+            "father": None if pair is None else str(pair[1]),
+            "trait": trait,
+        }
+    try:
+        probabilities = ENGINES[engine](people, probs)
+    except (ValueError, MemoryError) as e:
+        return str(e) or type(e).__name__
+    return [probabilities[name] for name in people]
+
+
+def write_results(results, filename):
+    """
+    Write every family's probabilities to one CSV file, a row per person.
+    """
+    with open(filename, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["family", "name", "gene2", "gene1", "gene0",
+                         "trait"])
+        for family, probabilities in results.items():
+            for name, distribution in probabilities.items():
+                writer.writerow([family, name] + [
+                    f"{distribution['gene'][gene]:.4f}" for gene in (2, 1, 0)
+                ] + [f"{distribution['trait'][True]:.4f}"])
+
+
+if __name__ == "__main__":
+    main()
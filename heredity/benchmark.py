@@ -0,0 +1,471 @@
+import argparse
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+import batch
+import heredity
+import inference
+import sampling
+import synthetic
+import vectorized
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmarks for the heredity inference engines."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    exact = commands.add_parser(
+        "eliminate", help="time exact inference on synthetic pedigrees"
+    )
+    exact.add_argument("sizes", nargs="*", type=int,
+                       default=[5, 10, 100, 300, 1000])
+    exact.add_argument("--observed", type=float, default=0.5,
+                       help="share of people whose trait is known")
+    exact.add_argument("--inbreeding", type=float, default=0.02,
+                       help="chance a spouse is already in the family")
+    exact.add_argument("--enumerate-max", type=int, default=5,
+                       help="largest family to also enumerate")
+    exact.add_argument("--seed", type=int, default=0)
+
+    vectorize = commands.add_parser(
+        "vectorized", help="time batched enumeration against enumeration"
+    )
+    vectorize.add_argument("sizes", nargs="*", type=int, default=[3, 5, 7, 9])
+    vectorize.add_argument("--observed", type=float, default=0.5,
+                           help="share of people whose trait is known")
+    vectorize.add_argument("--enumerate-max", type=int, default=7,
+                           help="largest family to also enumerate")
+    vectorize.add_argument("--batch-size", type=int,
+                           default=vectorized.BATCH_SIZE)
+    vectorize.add_argument("--seed", type=int, default=0)
+
+    lazy = commands.add_parser(
+        "enumerate", help="count and time lazy enumeration against powersets"
+    )
+    lazy.add_argument("families", nargs="*",
+                      default=["data/family0.csv", "data/family1.csv",
+                               "data/family2.csv"],
+                      help="CSV files, or sizes of synthetic pedigrees")
+    lazy.add_argument("--observed", type=float, default=0.5,
+                      help="share of people whose trait is known")
+    lazy.add_argument("--mutation", type=float,
+                      help="mutation probability to use instead of PROBS")
+    lazy.add_argument("--powerset-max", type=int, default=7,
+                      help="largest family to also enumerate over powersets")
+    lazy.add_argument("--seed", type=int, default=0)
+
+    approximate = commands.add_parser(
+        "sampling", help="time sampling and check it against exact inference"
+    )
+    approximate.add_argument("sizes", nargs="*", type=int,
+                             default=[10, 100, 1000])
+    approximate.add_argument("--observed", type=float, default=0.5,
+                             help="share of people whose trait is known")
+    approximate.add_argument("--inbreeding", type=float, default=0.02,
+                             help="chance a spouse is already in the family")
+    approximate.add_argument("--samples", type=int, default=20000)
+    approximate.add_argument("--seconds", type=float,
+                             help="time to spend sampling each family")
+    approximate.add_argument("--workers", type=int,
+                             help="processes sampling, one per CPU by default")
+    approximate.add_argument("--seed", type=int, default=0)
+
+    batched = commands.add_parser(
+        "batch", help="time batch processing against a process per family"
+    )
+    batched.add_argument("--families", type=int, default=2000)
+    batched.add_argument("--distinct", type=int, default=200,
+                         help="distinct families, each written renamed "
+                              "and reordered several times")
+    batched.add_argument("--largest", type=int, default=10,
+                         help="most people in a family")
+    batched.add_argument("--engine", choices=sorted(batch.ENGINES),
+                         default="eliminate")
+    batched.add_argument("--workers", type=int,
+                         help="processes, one per CPU by default")
+    batched.add_argument("--processes", type=int, default=20,
+                         help="families to time running heredity.py on")
+    batched.add_argument("--seed", type=int, default=0)
+
+    logspace = commands.add_parser(
+        "logspace", help="compare log and plain joint probabilities"
+    )
+    logspace.add_argument("sizes", nargs="*", type=int,
+                          default=[10, 100, 1000, 10000])
+    logspace.add_argument("--assignments", type=int, default=100,
+                          help="random assignments scored per family")
+    logspace.add_argument("--seed", type=int, default=0)
+
+    incremental = commands.add_parser(
+        "incremental", help="time evidence updates against recompiling"
+    )
+    incremental.add_argument("sizes", nargs="*", type=int,
+                             default=[100, 1000, 3000])
+    incremental.add_argument("--observed", type=float, default=0.5,
+                             help="share of people whose trait is known")
+    incremental.add_argument("--inbreeding", type=float, default=0.02,
+                             help="chance a spouse is already in the family")
+    incremental.add_argument("--changes", type=int, default=20,
+                             help="evidence changes to time")
+    incremental.add_argument("--seed", type=int, default=0)
+
+    args = parser.parse_args()
+    if args.command == "incremental":
+        benchmark_incremental(args.sizes, args.observed, args.inbreeding,
+                              args.changes, args.seed)
+    elif args.command == "logspace":
+        benchmark_logspace(args.sizes, args.assignments, args.seed)
+    elif args.command == "batch":
+        benchmark_batch(args.families, args.distinct, args.largest,
+                        args.engine, args.workers, args.processes, args.seed)
+    elif args.command == "sampling":
+        benchmark_sampling(args.sizes, args.observed, args.inbreeding,
+                           args.samples, args.seconds, args.workers,
+                           args.seed)
+    elif args.command == "enumerate":
+        benchmark_enumerate(args.families, args.observed, args.mutation,
+                            args.powerset_max, args.seed)
+    elif args.command == "eliminate":
+        benchmark_eliminate(args.sizes, args.observed, args.inbreeding,
+                            args.enumerate_max, args.seed)
+    elif args.command == "vectorized":
+        benchmark_vectorized(args.sizes, args.observed, args.enumerate_max,
+                             args.batch_size, args.seed)
+
+
+def benchmark_eliminate(sizes, observed, inbreeding, enumerate_max, seed):
+    """
+    Time the junction tree engine on pedigrees of each size, checking it
+    against enumeration on families small enough for it.
+    """
+    for n in sizes:
+        people = synthetic.pedigree(n, observed, inbreeding, seed=seed)
+        start = time.perf_counter()
+        try:
+            tree = inference.JunctionTree(people, heredity.PROBS)
+        except ValueError as e:
+            print(f"{n} people: {e}")
+            continue
+        propagated = time.perf_counter() - start
+        probabilities = tree.probabilities()
+        elapsed = time.perf_counter() - start
+        widest = max(len(clique) for clique in tree.cliques)
+        print(f"{n} people: eliminate {1000 * elapsed:.1f}ms "
+              f"({1000 * propagated:.1f}ms to compile and propagate), "
+              f"largest clique {widest} people")
+
+        if n <= enumerate_max:
+            start = time.perf_counter()
+            expected = heredity.enumerate_probabilities(people)
+            elapsed = time.perf_counter() - start
+            print(f"  enumerate {1000 * elapsed:.1f}ms, "
+                  f"largest difference {difference(probabilities, expected):.1e}")
+
+
+def benchmark_vectorized(sizes, observed, enumerate_max, batch_size, seed):
+    """
+    Time batched enumeration on pedigrees of each size, comparing it with
+    enumeration one assignment at a time on families small enough, and
+    checking a sample of joint probabilities against joint_probability.
+    """
+    for n in sizes:
+        people = synthetic.pedigree(n, observed, seed=seed)
+        start = time.perf_counter()
+        probabilities = vectorized.vectorized_probabilities(
+            people, heredity.PROBS, batch_size
+        )
+        elapsed = time.perf_counter() - start
+        genes, traits = next(vectorized.assignments(people, 1000))
+        error = joint_difference(people, genes, traits)
+        print(f"{n} people: vectorized {1000 * elapsed:.1f}ms, sampled "
+              f"joint probabilities within {error:.1e} of joint_probability")
+
+        if n <= enumerate_max:
+            start = time.perf_counter()
+            expected = heredity.enumerate_probabilities(people)
+            elapsed = time.perf_counter() - start
+            print(f"  enumerate {1000 * elapsed:.1f}ms, "
+                  f"largest difference {difference(probabilities, expected):.1e}")
+
+
+def benchmark_incremental(sizes, observed, inbreeding, changes, seed):
+    """
+    Time changing the evidence of a compiled junction tree, asking for
+    one person's distribution or everyone's, against compiling a new one,
+    and check both give the same distributions.
+    """
+    rng = random.Random(seed)
+    for n in sizes:
+        people = synthetic.pedigree(n, observed, inbreeding, seed=seed)
+        try:
+            tree = inference.JunctionTree(people, heredity.PROBS)
+        except ValueError as e:
+            print(f"{n} people: {e}")
+            continue
+        names = list(people)
+        one = everyone = recompile = 0
+        for _ in range(changes):
+            name, query = rng.choice(names), rng.choice(names)
+            trait = rng.choice((True, False, None))
+            people[name]["trait"] = trait
+
+            start = time.perf_counter()
+            tree.update(traits={name: trait}, names=[query])
+            one += time.perf_counter() - start
+            start = time.perf_counter()
+            probabilities = tree.probabilities()
+            everyone += time.perf_counter() - start
+
+            start = time.perf_counter()
+            expected = inference.eliminate(people, heredity.PROBS)
+            recompile += time.perf_counter() - start
+
+        print(f"{n} people: update and query one person "
+              f"{1000 * one / changes:.2f}ms, then everyone "
+              f"{1000 * (one + everyone) / changes:.1f}ms, recompile "
+              f"{1000 * recompile / changes:.1f}ms, largest difference "
+              f"{difference(probabilities, expected):.1e}")
+
+
+def benchmark_logspace(sizes, assignments, seed):
+    """
+    Score random assignments of families of each size with
+    joint_probability and in log space as the vectorized engine does,
+    counting how often the first underflows to 0 and how far the two
+    differ where it does not.
+    """
+    rng = np.random.default_rng(seed)
+    for n in sizes:
+        people = synthetic.pedigree(n, seed=seed)
+        genes = rng.integers(3, size=(assignments, n))
+        traits = rng.random((assignments, n)) < 0.5
+        log_joint = vectorized.batch_log_joint_probability(
+            people, genes, traits, heredity.PROBS
+        )
+        names = np.array(list(people), dtype=object)
+        underflows = 0
+        largest_difference = 0
+        for row, has_trait, log_p in zip(genes, traits, log_joint):
+            p = heredity.joint_probability(people, set(names[row == 1]),
+                                           set(names[row == 2]),
+                                           set(names[has_trait]))
+            if p == 0:
+                underflows += 1
+            else:
+                largest_difference = max(largest_difference,
+                                         abs(math.log(p) - log_p))
+        print(f"{n} people: joint_probability 0 for {underflows}/"
+              f"{assignments} assignments, largest log difference "
+              f"otherwise {largest_difference:.1e}")
+
+
+def benchmark_batch(families, distinct, largest, engine, workers, processes,
+                    seed):
+    """
+    Write `families` synthetic family CSVs made from `distinct` families
+    and compare the throughput of batch.run on them with running
+    heredity.py once per family, checking both give the same results.
+    """
+    rng = random.Random(seed)
+    pedigrees = [synthetic.pedigree(rng.randint(1, largest), seed=i)
+                 for i in range(distinct)]
+    with tempfile.TemporaryDirectory() as directory:
+        for i in range(families):
+            people = pedigrees[i % distinct]
+            filename = os.path.join(directory, f"family{i}.csv")
+            synthetic.write_csv(renamed(people, rng), filename)
+
+        start = time.perf_counter()
+        results, solved, errors = batch.run(directory, engine, workers)
+        elapsed = time.perf_counter() - start
+        print(f"batch: {len(results)} families ({solved} distinct) in "
+              f"{elapsed:.2f}s, {len(results) / elapsed:.1f} families/s")
+        for filename, error in errors.items():
+            print(f"  {filename}: {error}")
+
+        largest_difference = 0
+        start = time.perf_counter()
+        for filename in sorted(results)[:processes]:
+            path = os.path.join(directory, filename)
+            subprocess.run([sys.executable, "heredity.py", path,
+                            "--engine", engine],
+                           check=True, capture_output=True)
+            expected = batch.ENGINES[engine](heredity.load_data(path),
+                                             heredity.PROBS)
+            largest_difference = max(largest_difference,
+                                     difference(results[filename], expected))
+        elapsed = time.perf_counter() - start
+        print(f"heredity.py: {processes} families in {elapsed:.2f}s, "
+              f"{processes / elapsed:.1f} families/s, "
+              f"largest difference {largest_difference:.1e}")
+
+
+def renamed(people, rng):
+    """
+    Return a family with everyone given a new random name and listed in
+    a random order.
+    """
+    names = {name: f"{name}-{rng.randrange(10 ** 6)}" for name in people}
+    listed = list(people.values())
+    rng.shuffle(listed)
+    return {
+        names[person["name"]]: {
+            "name": names[person["name"]],
+            "mother": names.get(person["mother"]),
+            "father": names.get(person["father"]),
+            "trait": person["trait"],
+        }
+        for person in listed
+    }
+
+
+def benchmark_sampling(sizes, observed, inbreeding, samples, seconds, workers,
+                       seed):
+    """
+    Time likelihood weighting and Gibbs sampling on pedigrees of each
+    size, reporting the effective sample size and, where the junction
+    tree engine can give exact answers, the largest error and the share
+    of exact probabilities inside the 95% confidence intervals.
+    """
+    for n in sizes:
+        people = synthetic.pedigree(n, observed, inbreeding, seed=seed)
+        start = time.perf_counter()
+        try:
+            expected = inference.eliminate(people, heredity.PROBS)
+        except ValueError as e:
+            expected = None
+            print(f"{n} people: {e}")
+        else:
+            elapsed = time.perf_counter() - start
+            print(f"{n} people: eliminate {1000 * elapsed:.1f}ms")
+
+        for method in ("weighting", "gibbs"):
+            start = time.perf_counter()
+            approximation = sampling.approximate(
+                people, heredity.PROBS, method, samples, seconds, workers,
+                seed=seed
+            )
+            elapsed = time.perf_counter() - start
+            line = (f"  {method} {1000 * elapsed:.1f}ms, "
+                    f"{approximation.samples} samples, "
+                    f"{approximation.effective_samples:.0f} effective")
+            if expected is not None:
+                error = difference(approximation.probabilities, expected)
+                line += (f", largest difference {error:.1e}, "
+                         f"{100 * coverage(approximation, expected):.1f}% "
+                         f"covered")
+            print(line)
+
+
+def coverage(approximation, expected):
+    """
+    Return the share of the probabilities in `expected` that lie inside
+    the confidence intervals of an Approximation.
+    """
+    inside = [
+        low - 1e-12 <= p <= high + 1e-12
+        for person in expected
+        for field in expected[person]
+        for value, p in expected[person][field].items()
+        for low, high in [approximation.intervals[person][field][value]]
+    ]
+    return sum(inside) / len(inside)
+
+
+def benchmark_enumerate(families, observed, mutation, powerset_max, seed):
+    """
+    Count the assignments lazy enumeration visits and prunes on each
+    family, against the assignments enumeration over powersets considers,
+    and compare the time and peak memory of the two.
+    """
+    probs = heredity.PROBS
+    if mutation is not None:
+        probs = {**probs, "mutation": mutation}
+
+    for family in families:
+        if family.isdigit():
+            people = synthetic.pedigree(int(family), observed, seed=seed)
+            family = f"{family} people"
+        else:
+            people = heredity.load_data(family)
+        n = len(people)
+        unknown = sum(person["trait"] is None for person in people.values())
+        considered = 3 ** n * 2 ** unknown
+
+        stats = {}
+        for _ in heredity.assignments(people, probs, stats):
+            pass
+        probabilities, elapsed, peak = measure(
+            heredity.enumerate_probabilities, people, probs
+        )
+        print(f"{family}: lazy {stats['visited']}/{considered} assignments "
+              f"visited, {stats['pruned']} branches pruned, "
+              f"{1000 * elapsed:.1f}ms, peak {peak / 1024:.1f} KiB")
+
+        if n <= powerset_max and probs is heredity.PROBS:
+            expected, elapsed, peak = measure(
+                heredity.powerset_probabilities, people
+            )
+            print(f"  powerset {2 ** n} trait sets, {considered} assignments, "
+                  f"{1000 * elapsed:.1f}ms, peak {peak / 1024:.1f} KiB, "
+                  f"largest difference {difference(probabilities, expected):.1e}")
+
+
+def measure(function, *args):
+    """
+    Return what `function` returns, how long it took in seconds and the
+    most memory it had allocated at once in bytes, calling it twice so
+    tracing memory does not slow down the timed call.
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    function(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def joint_difference(people, genes, traits):
+    """
+    Return the largest relative difference between the joint probability
+    batch_log_joint_probability gives each assignment and the one
+    joint_probability does.
+    """
+    log_joint = vectorized.batch_log_joint_probability(people, genes, traits,
+                                                       heredity.PROBS)
+    names = np.array(list(people), dtype=object)
+    return max(
+        abs(math.exp(log_p) / heredity.joint_probability(
+            people, set(names[row == 1]), set(names[row == 2]),
+            set(names[has_trait])
+        ) - 1)
+        for row, has_trait, log_p in zip(genes, traits, log_joint)
+    )
+
+
+def difference(probabilities, expected):
+    """
+    Return the largest difference between two sets of distributions.
+    """
+    return max(
+        abs(probabilities[person][field][value] - p)
+        for person in expected
+        for field in expected[person]
+        for value, p in expected[person][field].items()
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,49 +1,226 @@
+import argparse
 import csv
 import itertools
+import math
 import sys
 
-PROBS = {
-
-    # Unconditional probabilities for having gene
-    "gene": {
-        2: 0.01,
-        1: 0.03,
-        0: 0.96
-    },
-
-    "trait": {
-
-        # Probability of trait given two copies of gene
-        2: {
-            True: 0.65,
-            False: 0.35
-        },
-
-        # Probability of trait given one copy of gene
-        1: {
-            True: 0.56,
-            False: 0.44
-        },
-
-        # Probability of trait given no gene
-        0: {
-            True: 0.01,
-            False: 0.99
-        }
-    },
+from inference import eliminate
+from model import DEFAULT_MODEL, load_model
+from sampling import approximate, topological_order
+from vectorized import log_person_tables, vectorized_probabilities
+
+# Probabilities of the gene, the trait and mutation; see models/
+PROBS = load_model(DEFAULT_MODEL)
 
-    # Mutation probability
-    "mutation": 0.01
-}
+# How far above the running shift a log probability may go before the
+# sums of enumerate_probabilities are rescaled, well short of overflow
+RESCALE = 100
 
 
 def main():
+    parser = argparse.ArgumentParser(
+        description="Compute gene and trait probabilities for a family."
+    )
+    parser.add_argument("data", help="CSV file with name, mother, father "
+                                     "and trait columns")
+    parser.add_argument("--engine",
+                        choices=["enumerate", "powerset", "vectorized",
+                                 "eliminate", "weighting", "gibbs"],
+                        default="enumerate",
+                        help="enumerate every assignment, lazily, over "
+                             "powersets or in NumPy batches, run exact "
+                             "variable elimination over a junction tree, or "
+                             "sample by likelihood weighting or Gibbs "
+                             "sampling")
+    parser.add_argument("--samples", type=int,
+                        help="samples to draw when sampling")
+    parser.add_argument("--seconds", type=float,
+                        help="time to spend sampling")
+    parser.add_argument("--workers", type=int,
+                        help="processes sampling, one per CPU by default")
+    parser.add_argument("--confidence", type=float, default=0.95,
+                        help="level of the confidence intervals when "
+                             "sampling")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--model", default=DEFAULT_MODEL,
+                        help="JSON file of gene, trait and mutation "
+                             "probabilities")
+    args = parser.parse_args()
+    people = load_data(args.data)
+    try:
+        probs = load_model(args.model)
+    except (OSError, ValueError) as e:
+        sys.exit(f"Cannot load model: {e}")
 
-    # Check for proper usage
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python heredity.py data.csv")
-    people = load_data(sys.argv[1])
+    intervals = None
+    try:
+        # Every engine needs parents to come before their children
+        topological_order(parent_indices(people))
+        if args.engine in ("weighting", "gibbs"):
+            approximation = approximate(people, probs, args.engine,
+                                        args.samples, args.seconds,
+                                        args.workers, args.confidence,
+                                        args.seed)
+            probabilities = approximation.probabilities
+            intervals = approximation.intervals
+        elif args.engine == "eliminate":
+            probabilities = eliminate(people, probs)
+        elif args.engine == "vectorized":
+            probabilities = vectorized_probabilities(people, probs)
+        elif args.engine == "powerset":
+            probabilities = powerset_probabilities(people, probs)
+        else:
+            probabilities = enumerate_probabilities(people, probs)
+    except ValueError as e:
+        sys.exit(f"Cannot compute probabilities: {e}")
 
+    # Print results
+    for person in people:
+        print(f"{person}:")
+        for field in probabilities[person]:
+            print(f"  {field.capitalize()}:")
+            for value in probabilities[person][field]:
+                p = probabilities[person][field][value]
+                if intervals is None:
+                    print(f"    {value}: {p:.4f}")
+                else:
+                    low, high = intervals[person][field][value]
+                    print(f"    {value}: {p:.4f} ({low:.4f}-{high:.4f})")
+    if intervals is not None:
+        print(f"{approximation.samples} samples, "
+              f"{approximation.effective_samples:.0f} effective")
+
+
+def enumerate_probabilities(people, probs=PROBS, stats=None):
+    """
+    Return the gene and trait distribution of every person by summing
+    the joint probability of every assignment of genes and traits.
+
+    Only assignments agreeing with the known traits and with a nonzero
+    joint probability are visited; see `assignments`.
+    """
+    # Keep track of gene and trait probabilities for each person
+    probabilities = {
+        person: {
+            "gene": {
+                2: 0,
+                1: 0,
+                0: 0
+            },
+            "trait": {
+                True: 0,
+                False: 0
+            }
+        }
+        for person in people
+    }
+
+    # Sum the joint probability of each set of people first: there are far
+    # fewer distinct sets than assignments. Probabilities are summed as
+    # multiples of e ** shift so that they neither underflow nor overflow
+    totals = {"one": {}, "two": {}, "trait": {}}
+    total = 0
+    shift = None
+    for one_gene, two_genes, have_trait, log_p in assignments(people, probs,
+                                                              stats):
+        if shift is None or log_p > shift + RESCALE:
+            if shift is not None:
+                scale = math.exp(shift - log_p)
+                for sums in totals.values():
+                    for mask in sums:
+                        sums[mask] *= scale
+                total *= scale
+            shift = log_p
+        p = math.exp(log_p - shift)
+        totals["one"][one_gene] = totals["one"].get(one_gene, 0) + p
+        totals["two"][two_genes] = totals["two"].get(two_genes, 0) + p
+        totals["trait"][have_trait] = totals["trait"].get(have_trait, 0) + p
+        total += p
+
+    for i, person in enumerate(people):
+        bit = 1 << i
+        one, two, trait = (
+            sum(p for mask, p in totals[field].items() if mask & bit)
+            for field in ("one", "two", "trait")
+        )
+        no_trait = sum(p for mask, p in totals["trait"].items()
+                       if not mask & bit)
+        # Rounding must not leave a probability just below zero
+        probabilities[person]["gene"].update({2: two, 1: one,
+                                              0: max(total - one - two, 0)})
+        probabilities[person]["trait"].update({True: trait,
+                                               False: no_trait})
+
+    # Ensure probabilities sum to 1
+    normalize(probabilities)
+    return probabilities
+
+
+def assignments(people, probs=PROBS, stats=None):
+    """
+    Lazily yield (one_gene, two_genes, have_trait, log_p) for every
+    assignment of genes and traits that agrees with the known traits and
+    has a joint probability other than zero, whose natural logarithm is
+    log_p. The sets of people are bitmasks, with bit i standing for the
+    i-th person in `people`.
+
+    People are assigned one at a time, parents before their children, so
+    a partial assignment whose probability is already zero is dropped
+    along with every way of completing it. If `stats` is a dictionary,
+    the assignments "visited" and branches "pruned" are counted in it.
+    """
+    names = list(people)
+    parents = parent_indices(people)
+    known = [people[name]["trait"] for name in names]
+    tables = [table.tolist() for table in log_person_tables(people, probs)]
+
+    order = topological_order(parents)
+
+    if stats is not None:
+        stats.setdefault("visited", 0)
+        stats.setdefault("pruned", 0)
+    stack = [(0, 0, 0, 0, 0.0)]
+    while stack:
+        depth, one_gene, two_genes, have_trait, log_p = stack.pop()
+        if depth == len(order):
+            if stats is not None:
+                stats["visited"] += 1
+            yield one_gene, two_genes, have_trait, log_p
+            continue
+
+        person = order[depth]
+        bit = 1 << person
+        traits = (False, True) if known[person] is None else (known[person],)
+        for gene in (0, 1, 2):
+            if parents[person] is None:
+                row = tables[person][gene]
+            else:
+                mother, father = (
+                    (two_genes >> parent & 1) * 2 + (one_gene >> parent & 1)
+                    for parent in parents[person]
+                )
+                row = tables[person][mother][father][gene]
+            for trait in traits:
+                q = log_p + row[trait]
+                if q == -math.inf:
+                    if stats is not None:
+                        stats["pruned"] += 1
+                    continue
+                stack.append((
+                    depth + 1,
+                    one_gene | bit if gene == 1 else one_gene,
+                    two_genes | bit if gene == 2 else two_genes,
+                    have_trait | bit if trait else have_trait,
+                    q,
+                ))
+
+
+def powerset_probabilities(people, probs=PROBS):
+    """
+    Return the gene and trait distribution of every person by summing
+    the joint probability of every assignment of genes and traits,
+    building every set of people along the way.
+    """
     # Keep track of gene and trait probabilities for each person
     probabilities = {
         person: {
@@ -78,20 +255,26 @@ def main():
             for two_genes in powerset(names - one_gene):
 
                 # Update probabilities with new joint probability
-                p = joint_probability(people, one_gene, two_genes, have_trait)
+                p = joint_probability(people, one_gene, two_genes, have_trait,
+                                      probs)
                 update(probabilities, one_gene, two_genes, have_trait, p)
 
     # Ensure probabilities sum to 1
     normalize(probabilities)
+    return probabilities
 
-    # Print results
-    for person in people:
-        print(f"{person}:")
-        for field in probabilities[person]:
-            print(f"  {field.capitalize()}:")
-            for value in probabilities[person][field]:
-                p = probabilities[person][field][value]
-                print(f"    {value}: {p:.4f}")
+
+def parent_indices(people):
+    """
+    Return each person's (mother, father) as positions in `people`, or
+    None if their parents are not listed.
+    """
+    index = {name: i for i, name in enumerate(people)}
+    return [
+        (index[person["mother"]], index[person["father"]])
+        if person["mother"] is not None else None
+        for person in people.values()
+    ]
 
 
 def load_data(filename):
@@ -128,7 +311,8 @@ def powerset(s):
     ]
 
 
-def joint_probability(people, one_gene, two_genes, have_trait):
+def joint_probability(people, one_gene, two_genes, have_trait,
+                      probs=PROBS):
     """
     Compute and return a joint probability.
 
@@ -159,85 +343,86 @@ def joint_probability(people, one_gene, two_genes, have_trait):
             if person in one_gene:
                 if(mom_gene > 0 and dad_gene == 0) or (mom_gene == 0 and dad_gene > 0):
                     if mom_gene == 1 or dad_gene == 1:
-                        prob = 0.5 * (1 - PROBS['mutation']) + (0.5 * PROBS['mutation'])
+                        prob = 0.5 * (1 - probs['mutation']) + (0.5 * probs['mutation'])
                     else:
-                        prob = (1 - PROBS['mutation']) * (1 - PROBS['mutation']) + (PROBS['mutation'] * PROBS['mutation'])
+                        prob = (1 - probs['mutation']) * (1 - probs['mutation']) + (probs['mutation'] * probs['mutation'])
                 elif mom_gene > 0 and dad_gene > 0:
                     if mom_gene == 1 and dad_gene == 1:
                         prob = (0.5 * 0.5) + (0.5 * 0.5)
                     elif mom_gene == 1 or dad_gene == 1:
-                        prob = (0.5 * PROBS['mutation']) + (0.5 * (1 - PROBS['mutation']))
+                        prob = (0.5 * probs['mutation']) + (0.5 * (1 - probs['mutation']))
                     else:
-                        prob = ((1 - PROBS['mutation']) * PROBS['mutation']) + ((1 - PROBS['mutation']) * PROBS['mutation'])
+                        prob = ((1 - probs['mutation']) * probs['mutation']) + ((1 - probs['mutation']) * probs['mutation'])
                 else:
-                    prob = ((1 - PROBS['mutation']) * PROBS['mutation']) + ((1 - PROBS['mutation']) * PROBS['mutation'])
+                    prob = ((1 - probs['mutation']) * probs['mutation']) + ((1 - probs['mutation']) * probs['mutation'])
 
                 if person in have_trait:
-                    prob *= PROBS['trait'][1][True]
+                    prob *= probs['trait'][1][True]
                 else:
-                    prob *= PROBS['trait'][1][False]
+                    prob *= probs['trait'][1][False]
             elif person in two_genes:
                 if mom_gene > 0 and dad_gene > 0:
                     if mom_gene == 1 and dad_gene == 1:
                         prob = 0.5 * 0.5
                     elif mom_gene == 1 or dad_gene == 1:
-                        prob = 0.5 * (1 - PROBS['mutation'])
+                        prob = 0.5 * (1 - probs['mutation'])
                     else:
-                        prob = (1 - PROBS['mutation']) * (1 - PROBS['mutation'])
+                        prob = (1 - probs['mutation']) * (1 - probs['mutation'])
                 elif mom_gene > 0 and dad_gene == 0 or mom_gene == 0 and dad_gene > 0:
                     if mom_gene == 1 or dad_gene == 1:
-                        prob = 0.5 * (PROBS['mutation'])
+                        prob = 0.5 * (probs['mutation'])
                     else:
-                        prob = (PROBS['mutation']) * (1 - PROBS['mutation'])
+                        prob = (probs['mutation']) * (1 - probs['mutation'])
                 else:
-                    prob = (PROBS['mutation']) * (PROBS['mutation'])
+                    prob = (probs['mutation']) * (probs['mutation'])
                 if person in have_trait:
-                    prob *= PROBS['trait'][2][True]
+                    prob *= probs['trait'][2][True]
                 else:
-                    prob *= PROBS['trait'][2][False]
+                    prob *= probs['trait'][2][False]
             else:
                 if mom_gene > 0 and dad_gene > 0:
                     if mom_gene == 1 and dad_gene == 1:
                         prob = 0.5 * 0.5
                     elif mom_gene == 1 or dad_gene == 1:
-                        prob = 0.5 * (PROBS['mutation'])
+                        prob = 0.5 * (probs['mutation'])
                     else:
-                        prob = (PROBS['mutation']) * (PROBS['mutation'])
+                        prob = (probs['mutation']) * (probs['mutation'])
                 elif mom_gene > 0 and dad_gene == 0 or mom_gene == 0 and dad_gene > 0:
                     if mom_gene == 1 or dad_gene == 1:
-                        prob = 0.5 * (1 - PROBS['mutation'])
+                        prob = 0.5 * (1 - probs['mutation'])
                     else:
-                        prob = (PROBS['mutation']) * (1 - PROBS['mutation'])
+                        prob = (probs['mutation']) * (1 - probs['mutation'])
                 else:
-                    prob = (1 - PROBS['mutation']) * (1 - PROBS['mutation'])
+                    prob = (1 - probs['mutation']) * (1 - probs['mutation'])
                 if person in have_trait:
-                    prob *= PROBS['trait'][0][True]
+                    prob *= probs['trait'][0][True]
                 else:
-                    prob *= PROBS['trait'][0][False]
+                    prob *= probs['trait'][0][False]
             
         else:
             if person in one_gene:
-                prob = PROBS['gene'][1]
+                prob = probs['gene'][1]
                 if person in have_trait:
-                    prob *= PROBS['trait'][1][True]
+                    prob *= probs['trait'][1][True]
                 else:
-                    prob *= PROBS['trait'][1][False]
+                    prob *= probs['trait'][1][False]
             elif person in two_genes:
-                prob = PROBS['gene'][2]
+                prob = probs['gene'][2]
                 if person in have_trait:
-                    prob *= PROBS['trait'][2][True]
+                    prob *= probs['trait'][2][True]
                 else:
-                    prob *= PROBS['trait'][2][False]
+                    prob *= probs['trait'][2][False]
             else:
-                prob = PROBS['gene'][0]
+                prob = probs['gene'][0]
                 if person in have_trait:
-                    prob *= PROBS['trait'][0][True]
+                    prob *= probs['trait'][0][True]
                 else:
-                    prob *= PROBS['trait'][0][False]
+                    prob *= probs['trait'][0][False]
         joint_probability *= prob
   
     return joint_probability
 
+
 def update(probabilities, one_gene, two_genes, have_trait, p):
     """
     Add to `probabilities` a new joint probability `p`.
@@ -264,7 +449,9 @@ def normalize(probabilities):
     is normalized (i.e., sums to 1, with relative proportions the same).
     """
     for person in probabilities.keys():
-        
+        if sum(probabilities[person]['gene'].values()) == 0:
+            raise ValueError("joint probabilities sum to 0")
+
         gene_factor = 1 / sum(probabilities[person]['gene'].values())
         trait_factor = 1 / sum(probabilities[person]['trait'].values())
 
@@ -0,0 +1,381 @@
+import heapq
+
+import numpy as np
+
+from model import log_tables
+
+# Gene counts, in the order of every table's gene axis
+GENES = (0, 1, 2)
+
+# Most people allowed in one clique, whose table has 3 ** size entries
+MAX_CLIQUE_SIZE = 14
+
+
+def inheritance_table(probs):
+    """
+    Return a 3 x 3 x 3 array whose [mother, father, child] entry is the
+    probability of a child having that many copies of the gene given how
+    many copies each parent has.
+    """
+    return np.exp(log_tables(probs)["inheritance"])
+
+
+def trait_likelihood(trait, probs):
+    """
+    Return the probability of the observed `trait` (True, False or None
+    for unknown) for each number of copies of the gene.
+    """
+    if trait is None:
+        return np.ones(3)
+    return np.array([probs["trait"][gene][trait] for gene in GENES])
+
+
+class JunctionTree():
+    """
+    A family as a Bayesian network over how many copies of the gene each
+    person has, compiled into a tree of cliques of people so every
+    person's distribution can be found in two passes over the tree.
+
+    Traits do not appear as variables: an observed trait only weighs a
+    person's gene count by its likelihood, and an unknown one follows
+    from the person's gene distribution.
+
+    Once compiled, evidence can be changed with update, which recomputes
+    only the potential of the clique holding each changed person and the
+    messages flowing away from it, and those only when a query needs them.
+    """
+    def __init__(self, people, probs):
+        self.names = list(people)
+        self.probs = probs
+        self.index = {name: i for i, name in enumerate(self.names)}
+        index = self.index
+        self.parents = [
+            (index[people[name]["mother"]], index[people[name]["father"]])
+            if people[name]["mother"] is not None else None
+            for name in self.names
+        ]
+        self.traits = [people[name]["trait"] for name in self.names]
+        # Gene counts known for certain, say from a test
+        self.genes = [None] * len(self.names)
+
+        inheritance = inheritance_table(probs)
+        prior = np.array([probs["gene"][gene] for gene in GENES])
+        self.factors = []
+        for person, parents in enumerate(self.parents):
+            if parents is None:
+                self.factors.append(((person,), prior))
+            else:
+                # Axes ordered as the variables: child, mother, father
+                table = inheritance.transpose(2, 0, 1)
+                self.factors.append(((person, *parents), table))
+
+        self.compile()
+        self.propagate()
+
+    def compile(self):
+        """
+        Choose an elimination order and build the tree of cliques it
+        induces, assigning each person's factor to a clique holding it.
+        """
+        n = len(self.names)
+        neighbors = [set() for _ in range(n)]
+        for scope, _ in self.factors:
+            for person in scope:
+                neighbors[person].update(scope)
+                neighbors[person].discard(person)
+
+        # Eliminate first the people whose elimination links the fewest
+        # pairs of their neighbors that were not already linked
+        remaining = [set(adjacent) for adjacent in neighbors]
+        scores = [fill(remaining, person) for person in range(n)]
+        heap = [(score, person) for person, score in enumerate(scores)]
+        heapq.heapify(heap)
+        order = []
+        position = [None] * n
+        cliques = []
+        while heap:
+            score, person = heapq.heappop(heap)
+            if position[person] is not None or score != scores[person]:
+                continue
+            position[person] = len(order)
+            order.append(person)
+            adjacent = remaining[person]
+            if len(adjacent) >= MAX_CLIQUE_SIZE:
+                raise ValueError("family is too interrelated for exact "
+                                 "inference")
+            cliques.append(tuple(sorted(adjacent | {person})))
+            for other in adjacent:
+                remaining[other].discard(person)
+                remaining[other].update(adjacent - {other})
+            # Only scores of people near the eliminated one can change
+            affected = set(adjacent)
+            for other in adjacent:
+                affected.update(remaining[other])
+            for other in affected:
+                scores[other] = fill(remaining, other)
+                heapq.heappush(heap, (scores[other], other))
+
+        # Each clique hangs off the clique of the first of its other
+        # people to be eliminated after it
+        self.cliques = cliques
+        self.parent = [None] * n
+        self.children = [[] for _ in range(n)]
+        self.separators = {}
+        for c, clique in enumerate(cliques):
+            later = [position[p] for p in clique if position[p] > c]
+            if later:
+                parent = min(later)
+                self.parent[c] = parent
+                self.children[parent].append(c)
+                shared = tuple(sorted(set(clique) & set(cliques[parent])))
+                self.separators[c, parent] = self.separators[parent, c] = shared
+
+        # A factor's people are all in the clique of the first of them
+        # to be eliminated
+        self.assigned = [[] for _ in range(n)]
+        self.home = [None] * n
+        for person, (scope, _) in enumerate(self.factors):
+            c = min(position[p] for p in scope)
+            self.assigned[c].append(person)
+            self.home[person] = c
+
+        self.order = []
+        for root in range(n):
+            if self.parent[root] is None:
+                stack = [root]
+                while stack:
+                    c = stack.pop()
+                    self.order.append(c)
+                    stack.extend(self.children[c])
+
+    def potential(self, c):
+        """
+        Return the product of the factors assigned to clique `c`, with
+        the evidence about each person folded in.
+        """
+        operands = []
+        for person in self.assigned[c]:
+            scope, table = self.factors[person]
+            operands += [table, list(scope)]
+            operands += [self.likelihood(person), [person]]
+        return contract(operands, self.cliques[c])
+
+    def likelihood(self, person):
+        """
+        Return the probability of the evidence about person number
+        `person` for each number of copies of the gene.
+        """
+        likelihood = trait_likelihood(self.traits[person], self.probs)
+        if self.genes[person] is not None:
+            likelihood = likelihood * (np.arange(3) == self.genes[person])
+        return likelihood
+
+    def message(self, c, d):
+        """
+        Return the message clique `c` sends to its neighbor `d`: the
+        potential of `c` and everything beyond it from `d`, summed over
+        the people `d` does not share.
+        """
+        operands = self.incoming(c, exclude=d)
+        table = contract(operands, self.separator(c, d))
+        total = table.sum()
+        if total == 0:
+            raise ValueError("evidence is impossible")
+        # Normalized so that long chains of messages do not underflow
+        return table / total
+
+    def incoming(self, c, exclude=None):
+        """
+        Return the potential of clique `c` and the messages sent to it by
+        its neighbors other than `exclude`, as operands for contract.
+        """
+        operands = [self.potentials[c], list(self.cliques[c])]
+        for other in self.neighbors(c):
+            if other != exclude:
+                operands += [self.messages[other, c],
+                             list(self.separator(other, c))]
+        return operands
+
+    def neighbors(self, c):
+        parent = self.parent[c]
+        return self.children[c] + ([] if parent is None else [parent])
+
+    def separator(self, c, d):
+        return self.separators[c, d]
+
+    def propagate(self):
+        """
+        Compute every clique potential and pass messages up the tree and
+        back down.
+        """
+        self.potentials = [self.potential(c)
+                           for c in range(len(self.cliques))]
+        # Messages out of date since evidence changed, and the product of
+        # each clique's potential and incoming messages once computed
+        self.stale = set()
+        self.beliefs = {}
+        self.messages = {}
+        for c in reversed(self.order):
+            parent = self.parent[c]
+            if parent is not None:
+                self.messages[c, parent] = self.message(c, parent)
+        for c in self.order:
+            for child in self.children[c]:
+                self.messages[c, child] = self.message(c, child)
+
+    def update(self, traits=None, genes=None, names=None):
+        """
+        Change the evidence and return the new gene and trait distribution
+        of the people in `names`, or of everyone.
+
+        `traits` maps names to True or False for an observed trait, or
+        None to forget it; `genes` maps names to a number of copies of
+        the gene known for certain, or None to forget it. An unknown name or
+        value raises ValueError before anything changes. If the evidence
+        becomes impossible, ValueError is raised and the change is kept,
+        so it can be undone by another update.
+        """
+        traits = traits or {}
+        genes = genes or {}
+        # Check all of the evidence before changing any of it
+        for name in (*traits, *genes):
+            if name not in self.index:
+                raise ValueError(f"{name} is not in the family")
+        for name, trait in traits.items():
+            if trait not in (True, False, None):
+                raise ValueError(f"trait of {name} is not True, False or "
+                                 f"None")
+        for name, gene in genes.items():
+            if gene not in (*GENES, None):
+                raise ValueError(f"genes of {name} are not 0, 1, 2 or None")
+
+        changed = set()
+        for name, trait in traits.items():
+            self.traits[self.index[name]] = trait
+            changed.add(self.index[name])
+        for name, gene in genes.items():
+            self.genes[self.index[name]] = gene
+            changed.add(self.index[name])
+
+        for c in {self.home[person] for person in changed}:
+            self.potentials[c] = self.potential(c)
+            self.invalidate(c)
+        return self.probabilities(names)
+
+    def invalidate(self, c):
+        """
+        Mark out of date every message flowing away from clique `c`, the
+        only ones its potential has a part in.
+        """
+        self.beliefs.clear()
+        pending = [(c, None)]
+        while pending:
+            c, previous = pending.pop()
+            for other in self.neighbors(c):
+                if other != previous:
+                    self.stale.add((c, other))
+                    pending.append((other, c))
+
+    def refresh(self, c, d):
+        """
+        Bring the message clique `c` sends to `d` up to date, along with
+        the out of date messages it depends on.
+        """
+        pending = [(c, d)]
+        outdated = []
+        while pending:
+            c, d = pending.pop()
+            if (c, d) in self.stale:
+                outdated.append((c, d))
+                pending.extend((other, c) for other in self.neighbors(c)
+                               if other != d)
+        # Messages a message depends on were found after it
+        for c, d in reversed(outdated):
+            self.messages[c, d] = self.message(c, d)
+            self.stale.discard((c, d))
+
+    def belief(self, c):
+        """
+        Return the product of the potential of clique `c` and all the
+        messages sent to it, proportional to the distribution of the gene
+        counts of its people given all the evidence.
+        """
+        if c not in self.beliefs:
+            for other in self.neighbors(c):
+                self.refresh(other, c)
+            self.beliefs[c] = contract(self.incoming(c), self.cliques[c])
+        return self.beliefs[c]
+
+    def gene_distribution(self, person):
+        """
+        Return the probability of each number of copies of the gene for
+        person number `person`, given all the evidence.
+        """
+        c = self.home[person]
+        distribution = contract([self.belief(c), list(self.cliques[c])],
+                                (person,))
+        total = distribution.sum()
+        if total == 0:
+            raise ValueError("evidence is impossible")
+        return distribution / total
+
+    def probabilities(self, names=None):
+        """
+        Return the gene and trait distribution of the people in `names`,
+        or of everyone, in the same form as heredity.main computes them.
+        """
+        probabilities = {}
+        for name in self.names if names is None else names:
+            person = self.index[name]
+            genes = self.gene_distribution(person)
+            trait = self.traits[person]
+            if trait is None:
+                has_trait = sum(genes[gene] * self.probs["trait"][gene][True]
+                                for gene in GENES)
+            else:
+                has_trait = float(trait)
+            probabilities[name] = {
+                "gene": {gene: float(genes[gene]) for gene in (2, 1, 0)},
+                "trait": {True: has_trait, False: 1 - has_trait},
+            }
+        return probabilities
+
+
+def fill(neighbors, person):
+    """
+    Return how many pairs of the neighbors of `person` are not linked,
+    breaking ties by the number of neighbors.
+    """
+    adjacent = neighbors[person]
+    missing = sum(len(adjacent - neighbors[other]) - 1 for other in adjacent)
+    return missing // 2, len(adjacent)
+
+
+def contract(operands, variables):
+    """
+    Multiply tables given as alternating table, variable-list operands
+    and sum out all but `variables`, using np.einsum. Every variable is a
+    person's gene count, with three values; they are renumbered for
+    einsum, which only accepts a few distinct ones.
+    """
+    numbers = {}
+    renamed = []
+    for i, operand in enumerate(operands):
+        if i % 2:
+            operand = [numbers.setdefault(v, len(numbers)) for v in operand]
+        renamed.append(operand)
+    # Variables no table mentions are spread evenly over their values
+    for v in variables:
+        if v not in numbers:
+            renamed += [np.ones(3), [numbers.setdefault(v, len(numbers))]]
+    output = [numbers[v] for v in variables]
+    return np.einsum(*renamed, output)
+
+
+def eliminate(people, probs):
+    """
+    Return the gene and trait distribution of every person in `people`,
+    as loaded by heredity.load_data, by exact inference over a junction
+    tree rather than by enumerating every assignment.
+    """
+    return JunctionTree(people, probs).probabilities()
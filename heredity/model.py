@@ -0,0 +1,105 @@
+import functools
+import json
+import math
+import os
+
+import numpy as np
+
+# Model used when no other is given
+DEFAULT_MODEL = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             "models", "default.json")
+
+# How far probabilities that should sum to 1 may be off
+SLACK = 1e-9
+
+
+def load_model(filename=DEFAULT_MODEL):
+    """
+    Load a probability model from a JSON file into the form of PROBS.
+
+    The file holds "gene", the unconditional probability of each number
+    of copies of the gene; "trait", the probability of having the trait
+    ("true") or not ("false") for each number of copies; and "mutation".
+    Raises ValueError if the file does not describe a valid model.
+    """
+    with open(filename) as f:
+        try:
+            data = json.load(f)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"{filename} is not JSON: {e}") from None
+
+    try:
+        probs = {
+            "gene": {gene: float(data["gene"][str(gene)])
+                     for gene in (2, 1, 0)},
+            "trait": {
+                gene: {True: float(data["trait"][str(gene)]["true"]),
+                       False: float(data["trait"][str(gene)]["false"])}
+                for gene in (2, 1, 0)
+            },
+            "mutation": float(data["mutation"]),
+        }
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"{filename} has a missing or bad value: {e}") \
+            from None
+
+    distributions = [probs["gene"]] + list(probs["trait"].values())
+    for distribution in distributions:
+        if any(not 0 <= p <= 1 for p in distribution.values()):
+            raise ValueError(f"{filename} has a probability outside [0, 1]")
+        if abs(math.fsum(distribution.values()) - 1) > SLACK:
+            raise ValueError(f"{filename} has probabilities that do not sum "
+                             f"to 1")
+    if not 0 <= probs["mutation"] <= 1:
+        raise ValueError(f"{filename} has a mutation probability outside "
+                         f"[0, 1]")
+    return probs
+
+
+def log_tables(probs):
+    """
+    Return the natural logarithms of the probabilities of a model, as
+    arrays: "gene", indexed by number of copies; "inheritance", by
+    [mother copies, father copies, child copies]; and "trait", by
+    [copies, has trait]. A probability of zero becomes -inf.
+
+    The tables are computed once for each distinct model.
+    """
+    return cached_log_tables(frozen(probs))
+
+
+def frozen(probs):
+    """
+    Return the probabilities of a model as nested tuples.
+    """
+    return (
+        tuple(probs["gene"][gene] for gene in (0, 1, 2)),
+        tuple((probs["trait"][gene][False], probs["trait"][gene][True])
+              for gene in (0, 1, 2)),
+        probs["mutation"],
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def cached_log_tables(probs):
+    gene, trait, mutation = probs
+    with np.errstate(divide="ignore"):
+        # Chance a parent with each number of copies passes one on, or
+        # does not, worked out so a tiny mutation probability stays exact
+        passes = np.array([np.log(mutation), np.log(0.5),
+                           np.log1p(-mutation)])
+        keeps = passes[::-1]
+        inheritance = np.empty((3, 3, 3))
+        for mother in range(3):
+            for father in range(3):
+                inheritance[mother, father] = [
+                    keeps[mother] + keeps[father],
+                    np.logaddexp(passes[mother] + keeps[father],
+                                 keeps[mother] + passes[father]),
+                    passes[mother] + passes[father],
+                ]
+        return {
+            "gene": np.log(np.array(gene)),
+            "inheritance": inheritance,
+            "trait": np.log(np.array(trait)),
+        }
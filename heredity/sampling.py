@@ -0,0 +1,447 @@
+import multiprocessing
+import statistics
+import time
+
+import numpy as np
+
+from inference import GENES, inheritance_table
+
+# Samples drawn together between checks of the time budget
+BATCH_SIZE = 1024
+
+# Samples drawn when neither a sample nor a time budget is given
+SAMPLES = 100000
+
+# Gibbs chains each worker runs side by side
+CHAINS = 256
+
+# Gibbs sweeps each chain makes before its samples are counted
+BURN_IN = 50
+
+
+class Network():
+    """
+    A family as a Bayesian network over how many copies of the gene each
+    person has, as arrays that whole batches of samples can be drawn from.
+    """
+    def __init__(self, people, probs):
+        self.names = list(people)
+        index = {name: i for i, name in enumerate(self.names)}
+        self.parents = [
+            (index[people[name]["mother"]], index[people[name]["father"]])
+            if people[name]["mother"] is not None else None
+            for name in self.names
+        ]
+        self.traits = [people[name]["trait"] for name in self.names]
+        self.order = topological_order(self.parents)
+
+        self.prior = np.array([probs["gene"][gene] for gene in GENES])
+        self.inheritance = inheritance_table(probs)
+        # Probability of having the trait for each number of copies
+        self.has_trait = np.array([probs["trait"][gene][True]
+                                   for gene in GENES])
+        # Probability of each person's evidence for each number of copies
+        self.likelihood = np.array([
+            np.ones(3) if trait is None else
+            np.array([probs["trait"][gene][trait] for gene in GENES])
+            for trait in self.traits
+        ]).reshape(-1, 3)
+
+        # Inheritance tables flattened so np.take can look up rows of
+        # them fast: the child's distribution by [mother * 3 + father], and
+        # a parent's by [is mother * 9 + other parent * 3 + child]
+        self.by_parents = self.inheritance.reshape(9, 3)
+        self.by_child = np.stack([
+            self.inheritance.transpose(0, 2, 1),
+            self.inheritance.transpose(1, 2, 0),
+        ]).reshape(18, 3)
+        self.groups = [self.group(people) for people in independent_sets(
+            self.parents
+        )]
+
+    def __len__(self):
+        return len(self.names)
+
+    def positive(self):
+        """
+        Return True if every gene count of everyone has a chance above
+        zero whatever the gene counts of everyone else.
+        """
+        return all((table > 0).all() for table in
+                   (self.prior, self.inheritance, self.likelihood))
+
+    def group(self, people):
+        """
+        Return the arrays conditionals needs to update `people` together.
+        """
+        people = np.array(people, dtype=np.intp)
+        parented = [i for i, person in enumerate(people)
+                    if self.parents[person] is not None]
+        # Every link from someone in the group to a child of theirs, as
+        # (position in the group, child, other parent, is mother)
+        position = {person: i for i, person in enumerate(people)}
+        links = sorted(
+            (position[parent], child, parents[is_mother], is_mother)
+            for child, parents in enumerate(self.parents)
+            if parents is not None
+            for is_mother, parent in ((1, parents[0]), (0, parents[1]))
+            if parent in position
+        )
+        links = np.array(links, dtype=np.intp).reshape(-1, 4)
+        positions = links[:, 0]
+        starts = np.flatnonzero(np.diff(positions, prepend=-1))
+        return {
+            "people": people,
+            "parented": np.array(parented, dtype=np.intp),
+            "mothers": np.array([self.parents[people[i]][0]
+                                 for i in parented], dtype=np.intp),
+            "fathers": np.array([self.parents[people[i]][1]
+                                 for i in parented], dtype=np.intp),
+            "parents": positions[starts],
+            "starts": starts,
+            "children": links[:, 1],
+            "others": links[:, 2],
+            "is_mother": links[:, 3],
+        }
+
+    def conditionals(self, genes, group):
+        """
+        Return, for each row of `genes`, the distribution of the gene
+        count of everyone in `group` given everyone else's and the
+        evidence.
+        """
+        weights = np.empty((len(genes), len(group["people"]), 3))
+        weights[:] = self.prior
+        weights[:, group["parented"]] = np.take(
+            self.by_parents,
+            genes[:, group["mothers"]] * 3 + genes[:, group["fathers"]],
+            axis=0
+        )
+        weights *= self.likelihood[group["people"]]
+        if len(group["children"]):
+            links = np.take(
+                self.by_child,
+                group["is_mother"] * 9 + genes[:, group["others"]] * 3
+                + genes[:, group["children"]],
+                axis=0
+            )
+            weights[:, group["parents"]] *= np.multiply.reduceat(
+                links, group["starts"], axis=1
+            )
+        return weights / weights.sum(axis=2, keepdims=True)
+
+    def expectations(self, distributions):
+        """
+        Return, from an array of gene count distributions with one row
+        per person, an array with one row per person of the chance of
+        each gene count followed by the chance of having the trait.
+        """
+        trait = distributions @ self.has_trait
+        for person, known in enumerate(self.traits):
+            if known is not None:
+                trait[..., person] = float(known)
+        return np.concatenate([distributions, trait[..., np.newaxis]],
+                              axis=-1)
+
+
+class Approximation():
+    """
+    The result of approximate inference on a family.
+
+    probabilities: the gene and trait distribution of every person, as
+                   heredity.main computes them
+    intervals: a (low, high) confidence interval for every probability
+    samples: number of samples drawn (sweeps of every chain, for Gibbs)
+    effective_samples: number of independent exact samples that would
+                       give estimates as precise as the least precise one
+    """
+    def __init__(self, probabilities, intervals, samples, effective_samples):
+        self.probabilities = probabilities
+        self.intervals = intervals
+        self.samples = samples
+        self.effective_samples = effective_samples
+
+
+def topological_order(parents):
+    """
+    Return the numbers of people ordered so everyone comes after their
+    parents, given each person's (mother, father) or None. Raises
+    ValueError if someone is their own ancestor.
+    """
+    order = []
+    placed = set()
+    for person in range(len(parents)):
+        pending = [person]
+        # People on the stack waiting for their ancestors to be placed
+        visiting = set()
+        while pending:
+            current = pending[-1]
+            waiting = [parent for parent in parents[current] or ()
+                       if parent not in placed]
+            if current in placed:
+                pending.pop()
+            elif waiting:
+                visiting.add(current)
+                if visiting.intersection(waiting):
+                    raise ValueError("someone is their own ancestor")
+                pending.extend(waiting)
+            else:
+                placed.add(current)
+                visiting.discard(current)
+                order.append(pending.pop())
+    return order
+
+
+def independent_sets(parents):
+    """
+    Split people into groups, none of whom is a parent, child or fellow
+    parent of a child of anyone else in their group, so that given
+    everyone outside it the gene counts of a group are independent.
+    """
+    neighbors = [set() for _ in parents]
+    for child, pair in enumerate(parents):
+        if pair is not None:
+            family = (child, *pair)
+            for person in family:
+                neighbors[person].update(family)
+    color = [None] * len(parents)
+    groups = []
+    for person in range(len(parents)):
+        taken = {color[other] for other in neighbors[person]}
+        color[person] = next(c for c in range(len(groups) + 1)
+                             if c not in taken)
+        if color[person] == len(groups):
+            groups.append([])
+        groups[color[person]].append(person)
+    return groups
+
+
+def forward_sample(network, size, rng):
+    """
+    Return `size` rows of gene counts drawn from the prior, parents first.
+    """
+    genes = np.empty((size, len(network)), dtype=np.intp)
+    for person in network.order:
+        if network.parents[person] is None:
+            weights = np.broadcast_to(network.prior, (size, 3))
+        else:
+            mother, father = network.parents[person]
+            weights = network.inheritance[genes[:, mother], genes[:, father]]
+        genes[:, person] = draw(weights, rng)
+    return genes
+
+
+def draw(weights, rng):
+    """
+    Return one index drawn from each row of normalized `weights`, along
+    their last axis.
+    """
+    cumulative = np.cumsum(weights, axis=-1)
+    chance = rng.random(weights.shape[:-1] + (1,))
+    return (chance > cumulative[..., :-1]).sum(axis=-1)
+
+
+def likelihood_weighting(task):
+    """
+    Draw gene counts from the prior and weigh each sample by how likely
+    it makes the observed traits, until `samples` are drawn or time runs
+    out at `deadline`.
+
+    Return (samples, shift, sums): the sums of the weights, their squares,
+    and the weighted expectations and their squares, each scaled down by
+    e ** shift (squared for the squares) so large families do not
+    underflow.
+    """
+    network, samples, deadline, seed = task
+    rng = np.random.default_rng(seed)
+    n = len(network)
+    shift = -np.inf
+    sums = {
+        "weight": 0.0,
+        "weight_squared": 0.0,
+        "weighted": np.zeros((n, 4)),
+        "squared_weighted": np.zeros((n, 4)),
+        "squared_weighted_squared": np.zeros((n, 4)),
+    }
+    drawn = 0
+    while drawn < samples and time.time() < deadline:
+        size = min(BATCH_SIZE, samples - drawn)
+        genes = forward_sample(network, size, rng)
+        log_weights = np.log(
+            network.likelihood[np.arange(n), genes]
+        ).sum(axis=1)
+        drawn += size
+        largest = log_weights.max()
+        if largest == -np.inf:
+            continue
+        if largest > shift:
+            # Rescale what has been summed so far to the new shift
+            for name in sums:
+                power = 2 if "squared" in name else 1
+                sums[name] = sums[name] * np.exp(power * (shift - largest))
+            shift = largest
+
+        weights = np.exp(log_weights - shift)
+        values = network.expectations(np.eye(3)[genes])
+        sums["weight"] += weights.sum()
+        sums["weight_squared"] += (weights ** 2).sum()
+        sums["weighted"] += np.einsum("s,snv->nv", weights, values)
+        sums["squared_weighted"] += np.einsum("s,snv->nv", weights ** 2,
+                                              values)
+        sums["squared_weighted_squared"] += np.einsum(
+            "s,snv->nv", weights ** 2, values ** 2
+        )
+    return drawn, shift, sums
+
+
+def gibbs_sampling(task):
+    """
+    Run CHAINS Gibbs chains over every person's gene count, each starting
+    from a draw from the prior and updating a group of independent people
+    at a time, until `samples` sweeps of all the chains are made after
+    burn-in or time runs out at `deadline`. Burn-in lasts BURN_IN sweeps,
+    or a quarter of the time left, whichever is shorter.
+
+    Each sweep counts every person's conditional distribution rather than
+    the gene count drawn from it. Return (samples, means): the number of
+    sweeps times CHAINS, and each chain's average expectations.
+    """
+    network, samples, deadline, seed = task
+    rng = np.random.default_rng(seed)
+    n = len(network)
+    genes = forward_sample(network, CHAINS, rng)
+    totals = np.zeros((CHAINS, n, 3))
+    start = time.time()
+    burn_in = start + (deadline - start) / 4
+    sweeps = 0
+    burned = 0
+    while sweeps * CHAINS < samples and time.time() < deadline:
+        counting = burned == BURN_IN or time.time() >= burn_in
+        for group in network.groups:
+            distributions = network.conditionals(genes, group)
+            genes[:, group["people"]] = draw(distributions, rng)
+            if counting:
+                totals[:, group["people"]] += distributions
+        if counting:
+            sweeps += 1
+        else:
+            burned += 1
+    if sweeps == 0:
+        return 0, np.zeros((0, n, 4))
+    return sweeps * CHAINS, network.expectations(totals / sweeps)
+
+
+def approximate(people, probs, method="weighting", samples=None,
+                seconds=None, workers=None, confidence=0.95, seed=0):
+    """
+    Estimate the gene and trait distribution of every person by
+    likelihood weighting or Gibbs sampling, in a pool of `workers`
+    processes (one per CPU if None), drawing `samples` in all or sampling
+    for `seconds`, whichever ends first. Return an Approximation.
+
+    Gibbs sampling can get stuck when some gene count is impossible, so
+    it raises ValueError unless every gene, inheritance and evidence
+    probability of the model is above zero.
+    """
+    if samples is None:
+        samples = SAMPLES if seconds is None else np.iinfo(np.int64).max
+    deadline = np.inf if seconds is None else time.time() + seconds
+    workers = workers or multiprocessing.cpu_count()
+    network = Network(people, probs)
+    if method == "gibbs" and not network.positive():
+        raise ValueError("Gibbs sampling needs a model where every gene "
+                         "count is possible; use likelihood weighting or "
+                         "an exact engine")
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    tasks = [(network, samples // workers + (i < samples % workers),
+              deadline, seeds[i]) for i in range(workers)]
+    function = {"weighting": likelihood_weighting,
+                "gibbs": gibbs_sampling}[method]
+    if workers == 1:
+        results = list(map(function, tasks))
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            results = pool.map(function, tasks, chunksize=1)
+
+    if method == "weighting":
+        drawn, estimates, errors, effective = combine_weighted(results)
+    else:
+        drawn, estimates, errors, effective = combine_chains(results)
+    estimates = np.clip(estimates, 0, 1)
+
+    z = statistics.NormalDist().inv_cdf((1 + confidence) / 2)
+    low = np.clip(estimates - z * errors, 0, 1)
+    high = np.clip(estimates + z * errors, 0, 1)
+    probabilities = {}
+    intervals = {}
+    for person, name in enumerate(network.names):
+        genes = estimates[person, :3]
+        trait = estimates[person, 3]
+        probabilities[name] = {
+            "gene": {gene: float(genes[gene]) for gene in (2, 1, 0)},
+            "trait": {True: float(trait), False: float(1 - trait)},
+        }
+        intervals[name] = {
+            "gene": {gene: (float(low[person, gene]),
+                            float(high[person, gene]))
+                     for gene in (2, 1, 0)},
+            "trait": {True: (float(low[person, 3]), float(high[person, 3])),
+                      False: (float(1 - high[person, 3]),
+                              float(1 - low[person, 3]))},
+        }
+    return Approximation(probabilities, intervals, drawn, effective)
+
+
+def combine_weighted(results):
+    """
+    Return (samples, estimates, standard errors, effective samples) from
+    the results of likelihood_weighting.
+    """
+    drawn = sum(samples for samples, _, _ in results)
+    shift = max(shift for _, shift, _ in results)
+    if shift == -np.inf:
+        raise ValueError("no sample agrees with the evidence")
+    sums = {}
+    for _, part_shift, part in results:
+        for name, value in part.items():
+            power = 2 if "squared" in name else 1
+            scale = np.exp(power * (part_shift - shift))
+            sums[name] = sums.get(name, 0) + value * scale
+
+    total = sums["weight"]
+    estimates = sums["weighted"] / total
+    # Delta method variance of a self-normalized importance sampler
+    variance = (sums["squared_weighted_squared"]
+                - 2 * estimates * sums["squared_weighted"]
+                + estimates ** 2 * sums["weight_squared"]) / total ** 2
+    errors = np.sqrt(np.maximum(variance, 0))
+    effective = total ** 2 / sums["weight_squared"]
+    return drawn, estimates, errors, float(effective)
+
+
+def combine_chains(results):
+    """
+    Return (samples, estimates, standard errors, effective samples) from
+    the results of gibbs_sampling, treating each chain's average as one
+    independent estimate.
+    """
+    drawn = sum(samples for samples, _ in results)
+    means = np.concatenate([means for _, means in results])
+    if len(means) == 0:
+        raise ValueError("no Gibbs sweeps were made after burn-in")
+    estimates = means.mean(axis=0)
+    if len(means) > 1:
+        errors = means.std(axis=0, ddof=1) / np.sqrt(len(means))
+    else:
+        errors = np.full(estimates.shape, np.inf)
+
+    # Compare each gene count estimate with the variance of the indicator
+    # of that count under exact sampling
+    genes = estimates[:, :3]
+    spread = genes * (1 - genes)
+    precise = errors[:, :3] > 0
+    if precise.any():
+        effective = (spread[precise] / errors[:, :3][precise] ** 2).min()
+    else:
+        effective = drawn
+    return drawn, estimates, errors, float(effective)
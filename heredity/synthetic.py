@@ -0,0 +1,80 @@
+import csv
+import random
+
+from heredity import PROBS
+
+
+def pedigree(n, observed=0.5, inbreeding=0.0, probs=PROBS, seed=0):
+    """
+    Return a family of `n` people in the form heredity.load_data gives.
+
+    Couples of a family member and someone marrying in have children in
+    turn; with probability `inbreeding` the spouse is instead another
+    family member, which makes loops. Genes and traits are drawn from
+    `probs`, and each trait is kept as evidence with probability
+    `observed`.
+    """
+    rng = random.Random(seed)
+    people = {}
+    genes = {}
+    single = []
+
+    def add(mother=None, father=None):
+        name = f"P{len(people)}"
+        if mother is None:
+            weights = [probs["gene"][gene] for gene in (0, 1, 2)]
+            gene = rng.choices([0, 1, 2], weights)[0]
+        else:
+            gene = sum(passes(genes[parent], probs, rng)
+                       for parent in (mother, father))
+        trait = rng.random() < probs["trait"][gene][True]
+        genes[name] = gene
+        people[name] = {
+            "name": name,
+            "mother": mother,
+            "father": father,
+            "trait": trait if rng.random() < observed else None,
+        }
+        single.append(name)
+        return name
+
+    add()
+    while len(people) < n:
+        member = single.pop(rng.randrange(len(single)))
+        if single and rng.random() < inbreeding:
+            spouse = single.pop(rng.randrange(len(single)))
+        elif len(people) + 2 <= n:
+            spouse = add()
+            single.remove(spouse)
+        else:
+            add()
+            continue
+        mother, father = member, spouse
+        if rng.random() < 0.5:
+            mother, father = spouse, member
+        for _ in range(rng.randint(1, 4)):
+            if len(people) < n:
+                add(mother, father)
+    return people
+
+
+def passes(gene, probs, rng):
+    """
+    Return 1 if a parent with `gene` copies passes one to a child.
+    """
+    chance = {0: probs["mutation"], 1: 0.5, 2: 1 - probs["mutation"]}[gene]
+    return int(rng.random() < chance)
+
+
+def write_csv(people, filename):
+    """
+    Write a family to a CSV file heredity.load_data can read.
+    """
+    with open(filename, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "mother", "father", "trait"])
+        for person in people.values():
+            trait = person["trait"]
+            writer.writerow([person["name"], person["mother"] or "",
+                             person["father"] or "",
+                             "" if trait is None else int(trait)])
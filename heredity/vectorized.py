@@ -0,0 +1,117 @@
+import numpy as np
+
+from model import log_tables
+
+# Assignments evaluated together
+BATCH_SIZE = 1 << 16
+
+
+def log_person_tables(people, probs):
+    """
+    Return, for each person in order, the natural logarithm of the
+    probability of their genes and trait: indexed by [mother genes,
+    father genes, genes, trait] for a child, or by [genes, trait] for
+    someone with no parents listed. The tables are built from the log
+    tables of the model, so they do not underflow however small its
+    probabilities are.
+    """
+    tables = log_tables(probs)
+    founder = tables["gene"][:, np.newaxis] + tables["trait"]
+    child = tables["inheritance"][:, :, :, np.newaxis] + tables["trait"]
+    return [founder if person["mother"] is None else child
+            for person in people.values()]
+
+
+def batch_log_joint_probability(people, genes, traits, probs, tables=None):
+    """
+    Return the natural logarithm of the joint probability of each of a
+    batch of assignments, as joint_probability would compute it for each
+    one.
+
+    `genes` and `traits` have one row per assignment and one column per
+    person, in the order of `people`: the number of copies of the gene,
+    and whether they have the trait.
+    """
+    if tables is None:
+        tables = log_person_tables(people, probs)
+    index = {name: i for i, name in enumerate(people)}
+    log_joint = np.zeros(len(genes))
+    # Look entries up by their position in the flattened table
+    for i, person in enumerate(people.values()):
+        position = genes[:, i] * 2 + traits[:, i]
+        if person["mother"] is not None:
+            mother = genes[:, index[person["mother"]]]
+            father = genes[:, index[person["father"]]]
+            position += (mother * 3 + father) * 6
+        log_joint += tables[i].ravel()[position]
+    return log_joint
+
+
+def assignments(people, batch_size=BATCH_SIZE):
+    """
+    Yield (genes, traits) batches covering every assignment of genes to
+    `people` and of traits to those whose trait is unknown.
+    """
+    n = len(people)
+    known = [person["trait"] for person in people.values()]
+    unknown = [i for i, trait in enumerate(known) if trait is None]
+    total = 3 ** n * 2 ** len(unknown)
+    observed = np.array([bool(trait) for trait in known])
+
+    for first in range(0, total, batch_size):
+        number = np.arange(first, min(first + batch_size, total),
+                           dtype=np.int64)
+        genes = np.empty((len(number), n), dtype=np.intp)
+        for i in range(n):
+            number, genes[:, i] = np.divmod(number, 3)
+        traits = np.tile(observed, (len(genes), 1))
+        for i in unknown:
+            number, traits[:, i] = np.divmod(number, 2)
+        yield genes, traits
+
+
+def vectorized_probabilities(people, probs, batch_size=BATCH_SIZE):
+    """
+    Return the gene and trait distribution of every person by summing
+    the joint probability of every assignment, as
+    heredity.enumerate_probabilities does, a batch at a time.
+    """
+    n = len(people)
+    tables = log_person_tables(people, probs)
+    gene_totals = np.zeros((n, 3))
+    trait_totals = np.zeros(n)
+    total = 0.0
+    # Joint probabilities are summed as multiples of e ** shift, raised
+    # whenever a batch holds a larger one, so that they do not underflow
+    shift = -np.inf
+    for genes, traits in assignments(people, batch_size):
+        log_joint = batch_log_joint_probability(people, genes, traits, probs,
+                                                tables)
+        largest = log_joint.max()
+        if largest == -np.inf:
+            continue
+        if largest > shift:
+            scale = np.exp(shift - largest)
+            gene_totals *= scale
+            trait_totals *= scale
+            total *= scale
+            shift = largest
+        joint = np.exp(log_joint - shift)
+        for i in range(n):
+            gene_totals[i] += np.bincount(genes[:, i], weights=joint,
+                                          minlength=3)
+        trait_totals += joint @ traits
+        total += joint.sum()
+    if total == 0:
+        raise ValueError("evidence is impossible")
+    # Rounding must not leave a share of people with the trait above 1
+    shares = np.minimum(trait_totals / total, 1)
+
+    return {
+        name: {
+            "gene": {gene: gene_totals[i, gene] / gene_totals[i].sum()
+                     for gene in (2, 1, 0)},
+            "trait": {True: shares[i], False: 1 - shares[i]},
+        }
+        for i, name in enumerate(people)
+    }
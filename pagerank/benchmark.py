@@ -0,0 +1,570 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import crawler
+import incremental
+import montecarlo
+import outofcore
+import pagerank
+import personalized
+import solvers
+import sparse
+import synthetic
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmarks for the PageRank engines."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    engines = commands.add_parser(
+        "sparse", help="time sparse power iteration on synthetic graphs"
+    )
+    engines.add_argument("sizes", nargs="*", type=int,
+                         default=[10_000, 100_000, 1_000_000])
+    engines.add_argument("--degree", type=float, default=8,
+                         help="average links per page")
+    engines.add_argument("--tolerance", type=float, default=sparse.TOLERANCE)
+    engines.add_argument("--reference-max", type=int, default=2000,
+                         help="largest size to also run iterate_pagerank on")
+    engines.add_argument("--seed", type=int, default=0)
+
+    sampler = commands.add_parser(
+        "montecarlo", help="time the vectorized sampler and its error"
+    )
+    sampler.add_argument("samples", nargs="*", type=int,
+                         default=[10_000, 100_000, 1_000_000, 10_000_000])
+    sampler.add_argument("--pages", type=int, default=10_000)
+    sampler.add_argument("--degree", type=float, default=8,
+                         help="average links per page")
+    sampler.add_argument("--surfers", type=int, default=montecarlo.SURFERS)
+    sampler.add_argument("--python-max", type=int, default=100_000,
+                         help="largest sample to also run sample_pagerank on")
+    sampler.add_argument("--seed", type=int, default=0)
+
+    crawl = commands.add_parser(
+        "crawl", help="time crawling a synthetic tree of HTML pages"
+    )
+    crawl.add_argument("pages", nargs="?", type=int, default=100_000)
+    crawl.add_argument("--degree", type=float, default=8,
+                       help="average links per page")
+    crawl.add_argument("--per-directory", type=int, default=1000,
+                       help="pages per subdirectory, or 0 for a flat corpus")
+    crawl.add_argument("--workers", type=int, nargs="+",
+                       default=[1, os.cpu_count()])
+    crawl.add_argument("--seed", type=int, default=0)
+
+    update = commands.add_parser(
+        "incremental", help="count iterations saved by warm starts"
+    )
+    update.add_argument("edits", nargs="*", type=int,
+                        default=[1, 10, 100, 1000, 10_000])
+    update.add_argument("--pages", type=int, default=100_000)
+    update.add_argument("--degree", type=float, default=8,
+                        help="average links per page")
+    update.add_argument("--tolerance", type=float, default=sparse.TOLERANCE)
+    update.add_argument("--seed", type=int, default=0)
+
+    solve = commands.add_parser(
+        "solvers", help="compare the solvers' iterations and residuals"
+    )
+    solve.add_argument("sizes", nargs="*", type=int,
+                       default=[10_000, 100_000, 1_000_000])
+    solve.add_argument("--generators", nargs="+",
+                       choices=list(synthetic.GENERATORS),
+                       default=["power-law", "clustered"])
+    solve.add_argument("--degree", type=float, default=8,
+                       help="average links per page")
+    solve.add_argument("--damping", type=float, default=pagerank.DAMPING)
+    solve.add_argument("--tolerance", type=float, default=sparse.TOLERANCE)
+    solve.add_argument("--history", metavar="FILE",
+                       help="write each solver's residuals to FILE as JSON")
+    solve.add_argument("--seed", type=int, default=0)
+
+    topics = commands.add_parser(
+        "personalized", help="time batched personalized PageRank"
+    )
+    topics.add_argument("topics", nargs="?", type=int, default=256)
+    topics.add_argument("--pages", type=int, default=100_000)
+    topics.add_argument("--degree", type=float, default=8,
+                        help="average links per page")
+    topics.add_argument("--seeds", type=int, default=10,
+                        help="seed pages per topic")
+    topics.add_argument("--batch-sizes", type=int, nargs="+",
+                        default=[1, 16, personalized.BATCH_SIZE])
+    topics.add_argument("--tolerance", type=float, default=sparse.TOLERANCE)
+    topics.add_argument("--seed", type=int, default=0)
+
+    disk = commands.add_parser(
+        "outofcore", help="compare peak memory of in-memory and edge-file "
+                          "power iteration"
+    )
+    disk.add_argument("sizes", nargs="*", type=int,
+                      default=[100_000, 1_000_000, 4_000_000])
+    disk.add_argument("--degree", type=float, default=8,
+                      help="average links per page")
+    disk.add_argument("--block-links", type=int,
+                      default=outofcore.BLOCK_LINKS)
+    disk.add_argument("--seed", type=int, default=0)
+
+    suite = commands.add_parser(
+        "suite", help="run every engine on synthetic graphs and record "
+                      "the results as JSON lines"
+    )
+    suite.add_argument("sizes", nargs="*", type=int,
+                       default=[1000, 10_000, 100_000])
+    suite.add_argument("--generators", nargs="+",
+                       choices=list(synthetic.GENERATORS),
+                       default=list(synthetic.GENERATORS))
+    suite.add_argument("--engines", nargs="+", choices=SUITE_ENGINES,
+                       default=SUITE_ENGINES)
+    suite.add_argument("--degree", type=float, default=8,
+                       help="average links per page")
+    suite.add_argument("--samples", type=int, default=pagerank.SAMPLES,
+                       help="pages visited by the sampling engines")
+    suite.add_argument("--tolerance", type=float, default=sparse.TOLERANCE)
+    suite.add_argument("--python-max", type=int, default=2000,
+                       help="largest size to run the dictionary engines on")
+    suite.add_argument("--output", metavar="FILE",
+                       help="append one JSON object per run to FILE")
+    suite.add_argument("--seed", type=int, default=0)
+
+    args = parser.parse_args()
+    if args.command == "sparse":
+        benchmark_sparse(args.sizes, args.degree, args.tolerance,
+                         args.reference_max, args.seed)
+    elif args.command == "montecarlo":
+        benchmark_montecarlo(args.samples, args.pages, args.degree,
+                             args.surfers, args.python_max, args.seed)
+    elif args.command == "crawl":
+        benchmark_crawl(args.pages, args.degree, args.per_directory,
+                        args.workers, args.seed)
+    elif args.command == "solvers":
+        benchmark_solvers(args.sizes, args.generators, args.degree,
+                          args.damping, args.tolerance, args.history,
+                          args.seed)
+    elif args.command == "personalized":
+        benchmark_personalized(args.topics, args.pages, args.degree,
+                               args.seeds, args.batch_sizes, args.tolerance,
+                               args.seed)
+    elif args.command == "outofcore":
+        benchmark_outofcore(args.sizes, args.degree, args.block_links,
+                            args.seed)
+    elif args.command == "suite":
+        benchmark_suite(args.sizes, args.generators, args.engines,
+                        args.degree, args.samples, args.tolerance,
+                        args.python_max, args.output, args.seed)
+    elif args.command == "incremental":
+        benchmark_incremental(args.edits, args.pages, args.degree,
+                              args.tolerance, args.seed)
+
+
+# Engines the suite can run, and those of them taking a corpus dictionary
+SUITE_ENGINES = ["sample", "iterate", "vectorized-sample", *solvers.SOLVERS,
+                 "outofcore"]
+DICTIONARY_ENGINES = ["sample", "iterate"]
+
+# Solvers that should beat power iteration on graphs where it is slow, and
+# the largest share of power iteration's iterations they may take there
+EXTRAPOLATING = ["aitken", "quadratic"]
+EXTRAPOLATED_SHARE = 0.6
+
+
+def benchmark_sparse(sizes, degree, tolerance, reference_max, seed):
+    """
+    Build power-law graphs of each size and time building the sparse
+    link matrix and iterating to convergence, comparing against the
+    dictionary implementation on graphs small enough for it.
+    """
+    if reference_max:
+        sizes = sorted(set(sizes) | {reference_max})
+    for n in sizes:
+        sources, targets = synthetic.power_law(n, degree, seed=seed)
+        print(f"{n} pages, {len(sources)} links:")
+
+        start = time.perf_counter()
+        graph = synthetic.link_graph(n, sources, targets)
+        build = time.perf_counter() - start
+        start = time.perf_counter()
+        ranks, iterations = sparse.power_iteration(
+            graph, pagerank.DAMPING, tolerance
+        )
+        elapsed = time.perf_counter() - start
+        print(f"  sparse: build {build:.3f}s, {iterations} iterations "
+              f"in {elapsed:.3f}s ({1000 * elapsed / iterations:.2f}ms each)")
+
+        if n <= reference_max:
+            corpus = synthetic.corpus(n, sources, targets)
+            start = time.perf_counter()
+            reference = pagerank.iterate_pagerank(corpus, pagerank.DAMPING)
+            elapsed = time.perf_counter() - start
+            error = np.abs(
+                ranks - np.array([reference[page] for page in graph.pages])
+            ).sum()
+            print(f"  iterate_pagerank: {elapsed:.3f}s, "
+                  f"L1 difference {error:.2e}")
+
+
+def benchmark_montecarlo(samples, pages, degree, surfers, python_max, seed):
+    """
+    Sample a power-law graph with increasing numbers of steps, reporting
+    steps per second and the L1 error against sparse power iteration.
+    """
+    sources, targets = synthetic.power_law(pages, degree, seed=seed)
+    graph = synthetic.link_graph(pages, sources, targets)
+    reference, _ = sparse.power_iteration(graph, pagerank.DAMPING, 1e-12)
+    print(f"{pages} pages, {len(sources)} links, {surfers} surfers:")
+
+    corpus = None
+    for n in samples:
+        start = time.perf_counter()
+        counts = montecarlo.simulate(graph, pagerank.DAMPING, n, surfers, seed)
+        elapsed = time.perf_counter() - start
+        error = np.abs(counts / n - reference).sum()
+        print(f"  {n:>11} samples: vectorized {elapsed:.3f}s "
+              f"({n / elapsed:,.0f} steps/s), L1 error {error:.2e}")
+
+        if n <= python_max:
+            if corpus is None:
+                corpus = synthetic.corpus(pages, sources, targets)
+            start = time.perf_counter()
+            ranks = pagerank.sample_pagerank(corpus, pagerank.DAMPING, n)
+            elapsed = time.perf_counter() - start
+            error = sum(abs(ranks[page] - reference[i])
+                        for i, page in enumerate(graph.pages))
+            print(f"  {'':>11}          python {elapsed:.3f}s "
+                  f"({n / elapsed:,.0f} steps/s), L1 error {error:.2e}")
+
+
+def benchmark_crawl(pages, degree, per_directory, workers, seed):
+    """
+    Write a power-law graph as HTML pages and time crawling it with each
+    number of workers, and with `crawl` too if the corpus is flat.
+    """
+    sources, targets = synthetic.power_law(pages, degree, seed=seed)
+    with tempfile.TemporaryDirectory() as directory:
+        synthetic.write_html(directory, pages, sources, targets, per_directory)
+        print(f"{pages} pages, {len(sources)} links:")
+
+        if not per_directory:
+            start = time.perf_counter()
+            corpus = pagerank.crawl(directory)
+            elapsed = time.perf_counter() - start
+            links = sum(len(found) for found in corpus.values())
+            status = ("ok" if len(corpus) == pages and links == len(sources)
+                      else "MISMATCH")
+            print(f"  crawl: {elapsed:.3f}s ({pages / elapsed:,.0f} pages/s), "
+                  f"{len(corpus)} pages, {links} links {status}")
+
+        for count in workers:
+            start = time.perf_counter()
+            names, found, _ = crawler.crawl_edges(directory, count)
+            elapsed = time.perf_counter() - start
+            status = "ok" if len(found) == len(sources) else "MISMATCH"
+            print(f"  crawler, {count} workers: {elapsed:.3f}s "
+                  f"({pages / elapsed:,.0f} pages/s), "
+                  f"{len(found)} links {status}")
+
+
+def benchmark_solvers(sizes, generators, degree, damping, tolerance, history,
+                      seed):
+    """
+    Solve graphs of each size from each generator with every solver,
+    reporting iterations, time and error against a tightly converged
+    solution.
+
+    Exits with an error if, on a clustered graph, where power iteration
+    is slow, an extrapolating solver does not save a good share of power
+    iteration's iterations.
+    """
+    residuals = {}
+    slower = []
+    for generator in generators:
+        residuals[generator] = {}
+        for n in sizes:
+            sources, targets = synthetic.GENERATORS[generator](n, degree,
+                                                               seed=seed)
+            graph = synthetic.link_graph(n, sources, targets)
+            reference = solvers.solve(graph, damping, "power",
+                                      tolerance=1e-14, max_iterations=10_000)
+            print(f"{generator}, {n} pages, {len(sources)} links:")
+
+            residuals[generator][n] = {}
+            iterations = {}
+            for method in solvers.SOLVERS:
+                start = time.perf_counter()
+                solution = solvers.solve(graph, damping, method, tolerance)
+                elapsed = time.perf_counter() - start
+                error = np.abs(solution.ranks - reference.ranks).sum()
+                print(f"  {method:>12}: {solution.iterations:>4} iterations "
+                      f"in {elapsed:.3f}s, L1 error {error:.2e}")
+                residuals[generator][n][method] = solution.residuals
+                iterations[method] = solution.iterations
+
+            if generator == "clustered":
+                slower += [
+                    f"{method} took {iterations[method]} iterations to "
+                    f"power's {iterations['power']} on {n} pages"
+                    for method in EXTRAPOLATING
+                    if iterations[method]
+                    > EXTRAPOLATED_SHARE * iterations["power"]
+                ]
+
+    if history:
+        with open(history, "w") as f:
+            json.dump(residuals, f, indent=1)
+    if slower:
+        sys.exit("Extrapolation did not save iterations: " + "; ".join(slower))
+
+
+def benchmark_personalized(topics, pages, degree, seeds, batch_sizes,
+                           tolerance, seed):
+    """
+    Time personalized PageRank for many random seed sets on a power-law
+    graph, solving different numbers of topics together.
+    """
+    sources, targets = synthetic.power_law(pages, degree, seed=seed)
+    graph = synthetic.link_graph(pages, sources, targets)
+    rng = np.random.default_rng(seed)
+    seed_sets = [[graph.pages[i] for i in rng.choice(pages, seeds)]
+                 for _ in range(topics)]
+    print(f"{pages} pages, {len(sources)} links, {topics} topics:")
+
+    for batch_size in batch_sizes:
+        start = time.perf_counter()
+        for ranks in personalized.personalized_pagerank(
+            graph, pagerank.DAMPING, seed_sets, tolerance, batch_size
+        ):
+            pass
+        elapsed = time.perf_counter() - start
+        print(f"  {batch_size:>4} at a time: {elapsed:.3f}s "
+              f"({topics / elapsed:.1f} topics/s)")
+
+
+def benchmark_incremental(edits, pages, degree, tolerance, seed):
+    """
+    Rank a power-law graph, then edit a few of its links and pages and
+    compare re-ranking it from scratch with warm-starting from the
+    previous ranks.
+    """
+    sources, targets = synthetic.power_law(pages, degree, seed=seed)
+    graph = synthetic.link_graph(pages, sources, targets)
+    ranks, iterations = sparse.power_iteration(graph, pagerank.DAMPING,
+                                               tolerance)
+    previous = (graph.pages, sources, targets, ranks)
+    print(f"{pages} pages, {len(sources)} links, "
+          f"{iterations} iterations from scratch:")
+
+    for count in edits:
+        edited = synthetic.edit_links(pages, sources, targets, count,
+                                      new_pages=count // 10, seed=seed + 1)
+        graph = synthetic.link_graph(*edited)
+
+        start = time.perf_counter()
+        cold, cold_iterations = sparse.power_iteration(
+            graph, pagerank.DAMPING, tolerance
+        )
+        cold_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        initial, changes = incremental.warm_start(previous, graph)
+        diff_time = time.perf_counter() - start
+        start = time.perf_counter()
+        warm, warm_iterations = sparse.power_iteration(
+            graph, pagerank.DAMPING, tolerance, ranks=initial
+        )
+        warm_time = time.perf_counter() - start
+
+        print(f"  {changes}: {cold_iterations} -> {warm_iterations} "
+              f"iterations, {cold_time:.3f}s -> {warm_time:.3f}s "
+              f"(+{diff_time:.3f}s diffing), "
+              f"L1 difference {np.abs(cold - warm).sum():.2e}")
+
+
+def benchmark_outofcore(sizes, degree, block_links, seed):
+    """
+    Write power-law graphs of each size to edge files, then rank each
+    both in memory and streamed from disk, each in a fresh process so
+    its peak resident set size is measured on its own.
+    """
+    # Processes inherit the peak RSS of whatever starts them, so they are
+    # forked from a server started before any graph is built
+    context = multiprocessing.get_context("forkserver")
+    with context.Pool(1, maxtasksperchild=1) as pool:
+        baseline = pool.apply(peak_rss)
+    print(f"interpreter: {baseline / 2**20:.1f} MiB peak RSS")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "graph.edges")
+        for n in sizes:
+            sources, targets = synthetic.power_law(n, degree, seed=seed)
+            outofcore.write_edges(path, synthetic.page_names(n),
+                                  sources, targets)
+            print(f"{n} pages, {len(sources)} links, "
+                  f"{os.path.getsize(path) / 2**20:.1f} MiB edge file:")
+            del sources, targets
+
+            for engine in ["memory", "outofcore"]:
+                with context.Pool(1, maxtasksperchild=1) as pool:
+                    elapsed, iterations, peak = pool.apply(
+                        measure_ranking, (path, engine, block_links)
+                    )
+                print(f"  {engine:>9}: {peak / 2**20:>9.1f} MiB peak RSS, "
+                      f"{iterations} iterations in {elapsed:.2f}s")
+
+
+def measure_ranking(path, engine, block_links):
+    """
+    Rank the edge file at `path` with `engine`, returning the time taken,
+    the iterations and the peak resident set size of this process.
+    """
+    edges = outofcore.EdgeFile(path)
+    start = time.perf_counter()
+    if engine == "memory":
+        graph = sparse.LinkGraph(range(len(edges)),
+                                 edges.section("sources"),
+                                 edges.section("targets"))
+        _, iterations = sparse.power_iteration(graph, pagerank.DAMPING)
+    else:
+        _, iterations = outofcore.outofcore_power_iteration(
+            edges, pagerank.DAMPING, block_links=block_links
+        )
+    return time.perf_counter() - start, iterations, peak_rss()
+
+
+def benchmark_suite(sizes, generators, engines, degree, samples, tolerance,
+                    python_max, output, seed):
+    """
+    Run each engine on a graph from each generator at each size, in a
+    fresh process per run, and record its time, peak memory, iterations
+    and error against a tightly converged solution.
+    """
+    context = multiprocessing.get_context("forkserver")
+    with context.Pool(1, maxtasksperchild=1) as pool:
+        baseline = pool.apply(peak_rss)
+    environment = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "baseline_rss": baseline,
+    }
+
+    for generator in generators:
+        for n in sizes:
+            graph = synthetic_graph(generator, n, degree, seed)
+            reference = solvers.solve(graph, pagerank.DAMPING, "power",
+                                      tolerance=1e-14, max_iterations=10_000)
+            print(f"{generator}, {n} pages, {len(graph.targets)} links:")
+
+            for engine in engines:
+                if engine in DICTIONARY_ENGINES and n > python_max:
+                    continue
+                options = {"samples": samples, "tolerance": tolerance}
+                with context.Pool(1, maxtasksperchild=1) as pool:
+                    elapsed, iterations, peak, ranks = pool.apply(
+                        run_engine, (engine, generator, n, degree, seed,
+                                     options)
+                    )
+                error = np.abs(ranks - reference.ranks)
+                record = {
+                    "generator": generator,
+                    "pages": n,
+                    "links": len(graph.targets),
+                    "degree": degree,
+                    "seed": seed,
+                    "engine": engine,
+                    **options,
+                    "seconds": elapsed,
+                    "peak_rss": peak,
+                    "iterations": iterations,
+                    "l1_error": float(error.sum()),
+                    "max_error": float(error.max(initial=0)),
+                    **environment,
+                }
+                counted = ""
+                if iterations is not None:
+                    counted = f", {iterations} iterations"
+                print(f"  {engine:>17}: {elapsed:.3f}s, "
+                      f"{peak / 2**20:.1f} MiB peak RSS{counted}, "
+                      f"L1 error {record['l1_error']:.2e}")
+                if output:
+                    with open(output, "a") as f:
+                        f.write(json.dumps(record) + "\n")
+
+
+def synthetic_graph(generator, n, degree, seed):
+    sources, targets = synthetic.GENERATORS[generator](n, degree, seed=seed)
+    return synthetic.link_graph(n, sources, targets)
+
+
+def run_engine(engine, generator, n, degree, seed, options):
+    """
+    Rank a synthetic graph with `engine`, returning the time taken, the
+    iterations (None if the engine does not say), the peak resident set
+    size of this process and the rank vector.
+    """
+    graph = synthetic_graph(generator, n, degree, seed)
+    iterations = None
+    if engine in DICTIONARY_ENGINES:
+        corpus = synthetic.corpus(n, np.repeat(np.arange(n), graph.out_degree),
+                                  graph.targets)
+        start = time.perf_counter()
+        if engine == "sample":
+            ranks = pagerank.sample_pagerank(corpus, pagerank.DAMPING,
+                                             options["samples"])
+            iterations = options["samples"]
+        else:
+            ranks = pagerank.iterate_pagerank(corpus, pagerank.DAMPING)
+        elapsed = time.perf_counter() - start
+        ranks = np.array([ranks[page] for page in graph.pages])
+    elif engine == "vectorized-sample":
+        start = time.perf_counter()
+        counts = montecarlo.simulate(graph, pagerank.DAMPING,
+                                     options["samples"], seed=seed)
+        elapsed = time.perf_counter() - start
+        ranks = counts / options["samples"]
+        iterations = options["samples"]
+    elif engine == "outofcore":
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "graph.edges")
+            outofcore.write_edges(path, graph.pages,
+                                  np.repeat(np.arange(n), graph.out_degree),
+                                  graph.targets)
+            del graph
+            edges = outofcore.EdgeFile(path)
+            start = time.perf_counter()
+            ranks, iterations = outofcore.outofcore_power_iteration(
+                edges, pagerank.DAMPING, options["tolerance"]
+            )
+            elapsed = time.perf_counter() - start
+    else:
+        start = time.perf_counter()
+        solution = solvers.solve(graph, pagerank.DAMPING, engine,
+                                 options["tolerance"])
+        elapsed = time.perf_counter() - start
+        ranks, iterations = solution.ranks, solution.iterations
+    return elapsed, iterations, peak_rss(), ranks
+
+
+def peak_rss():
+    """
+    Return the peak resident set size of this process in bytes.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+if __name__ == "__main__":
+    main()
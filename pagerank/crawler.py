@@ -0,0 +1,149 @@
+import multiprocessing
+import os
+import posixpath
+import re
+from urllib.parse import unquote
+
+import numpy as np
+
+from sparse import LinkGraph
+
+# Same pattern crawl uses, matched against raw bytes
+LINK = re.compile(rb"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+
+# Bytes read from an HTML file at a time
+CHUNK_SIZE = 1 << 16
+
+# Files handed to a worker at a time
+BATCH_SIZE = 256
+
+# Page names and numbers, shared with each worker as it starts
+worker_pages = []
+worker_index = {}
+
+
+def crawl_edges(directory, workers=None):
+    """
+    Parse every HTML page under `directory`, including its subdirectories,
+    in a pool of `workers` processes (one per CPU if None).
+
+    Pages are named by their path relative to `directory`, with "/" as
+    separator, so a flat corpus gives the same names as `crawl`. Links are
+    resolved relative to the page containing them.
+
+    Return (pages, sources, targets): the sorted page names and two arrays
+    of page numbers, one entry per distinct link between distinct pages.
+    """
+    pages = sorted(html_files(directory))
+    batches = [(directory, first, min(first + BATCH_SIZE, len(pages)))
+               for first in range(0, len(pages), BATCH_SIZE)]
+    if workers == 1:
+        # Not worth sending every page through a pipe to a single worker
+        share_pages(pages)
+        results = list(map(extract_batch, batches))
+    else:
+        with multiprocessing.Pool(workers, share_pages, (pages,)) as pool:
+            results = pool.map(extract_batch, batches, chunksize=1)
+
+    n = len(pages)
+    none = np.empty(0, dtype=np.int32)
+    sources = np.concatenate([none] + [sources for sources, _ in results])
+    targets = np.concatenate([none] + [targets for _, targets in results])
+    links = np.unique(sources.astype(np.int64) * n + targets)
+    return pages, links // max(n, 1), links % max(n, 1)
+
+
+def crawl_graph(directory, workers=None):
+    """
+    Return a LinkGraph of every HTML page under `directory`.
+    """
+    return LinkGraph(*crawl_edges(directory, workers))
+
+
+def crawl_corpus(directory, workers=None):
+    """
+    Return every HTML page under `directory` as a corpus dictionary, as
+    `crawl` would.
+    """
+    pages, sources, targets = crawl_edges(directory, workers)
+    corpus = {page: set() for page in pages}
+    for source, target in zip(sources.tolist(), targets.tolist()):
+        corpus[pages[source]].add(pages[target])
+    return corpus
+
+
+def html_files(directory):
+    """
+    Yield the path of each .html file under `directory`, relative to it.
+    """
+    for root, dirs, files in os.walk(directory):
+        relative = os.path.relpath(root, directory)
+        for filename in files:
+            if filename.endswith(".html"):
+                path = os.path.normpath(os.path.join(relative, filename))
+                yield path.replace(os.sep, "/")
+
+
+def share_pages(pages):
+    global worker_pages, worker_index
+    worker_pages = pages
+    worker_index = {page: i for i, page in enumerate(pages)}
+
+
+def extract_batch(job):
+    """
+    Return arrays of the source and target page numbers of every link
+    to another page in the corpus from pages `first` up to `last`.
+    """
+    directory, first, last = job
+    sources = []
+    targets = []
+    for source in range(first, last):
+        for link in page_links(directory, worker_pages[source]):
+            target = worker_index.get(link)
+            if target is not None and target != source:
+                sources.append(source)
+                targets.append(target)
+    return (np.array(sources, dtype=np.int32),
+            np.array(targets, dtype=np.int32))
+
+
+def page_links(directory, page):
+    """
+    Return the names of the pages `page` links to.
+    """
+    base = posixpath.dirname(page)
+    links = set()
+    for href in extract_links(os.path.join(directory, page)):
+        href = href.partition("#")[0]
+        if not href or "://" in href or href.startswith("/"):
+            continue
+        if "%" in href:
+            href = unquote(href)
+        if base:
+            href = f"{base}/{href}"
+        if "./" in href:
+            href = posixpath.normpath(href)
+        links.add(href)
+    return links
+
+
+def extract_links(path, chunk_size=CHUNK_SIZE):
+    """
+    Yield the href of each link in the file at `path`, reading it a chunk
+    at a time rather than all at once.
+    """
+    pending = b""
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            pending += chunk
+            end = 0
+            for match in LINK.finditer(pending):
+                yield match.group(1).decode("utf-8", "replace")
+                end = match.end()
+            # Only the text after the last complete tag can still hold
+            # the start of a link cut off by the end of this chunk
+            end = max(end, pending.rfind(b">") + 1)
+            pending = pending[end:]
+    for match in LINK.finditer(pending):
+        yield match.group(1).decode("utf-8", "replace")
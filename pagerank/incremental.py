@@ -0,0 +1,132 @@
+import os
+import zipfile
+
+import numpy as np
+
+from sparse import TOLERANCE, power_iteration
+
+# Name of the file the last ranks are kept in, next to the HTML pages
+FILENAME = "pagerank.state"
+
+
+class Changes():
+    """
+    How a corpus differs from the one its previous ranks were computed on.
+    """
+    def __init__(self, added_pages=0, removed_pages=0,
+                 added_links=0, removed_links=0):
+        self.added_pages = added_pages
+        self.removed_pages = removed_pages
+        self.added_links = added_links
+        self.removed_links = removed_links
+
+    def __bool__(self):
+        return any((self.added_pages, self.removed_pages,
+                    self.added_links, self.removed_links))
+
+    def __str__(self):
+        return (f"+{self.added_pages}/-{self.removed_pages} pages, "
+                f"+{self.added_links}/-{self.removed_links} links")
+
+
+def incremental_pagerank(directory, graph, damping_factor,
+                         tolerance=TOLERANCE):
+    """
+    Return PageRank values for the LinkGraph `graph` crawled from
+    `directory`, starting from the ranks stored there by the last run
+    rather than from 1 / N, and store the new ranks for next time.
+
+    Return the ranks as a dictionary, the Changes since the last run
+    (None if there was no usable previous run) and the number of
+    iterations taken.
+    """
+    path = os.path.join(directory, FILENAME)
+    previous = read_state(path)
+    ranks, changes = warm_start(previous, graph)
+    ranks, iterations = power_iteration(graph, damping_factor, tolerance,
+                                        ranks=ranks)
+    try:
+        write_state(path, graph, ranks)
+    except OSError:
+        # An unwritable corpus only costs us the head start next time
+        pass
+    return graph.as_dict(ranks), changes, iterations
+
+
+def warm_start(previous, graph):
+    """
+    Return a starting rank vector for `graph` made from the `previous`
+    (pages, sources, targets, ranks), and the Changes between the two.
+    Pages that are new get 1 / N, and the vector is rescaled to sum to 1.
+    Returns (None, None) if there is nothing to start from.
+    """
+    if previous is None:
+        return None, None
+    pages, sources, targets, ranks = previous
+    n = len(graph)
+    index = {page: i for i, page in enumerate(graph.pages)}
+    moved = np.array([index.get(page, -1) for page in pages], dtype=np.int64)
+    kept = moved >= 0
+    if n == 0 or not kept.any():
+        return None, None
+
+    start = np.full(n, 1 / n)
+    start[moved[kept]] = ranks[kept]
+    start /= start.sum()
+
+    # Compare links between pages present in both crawls by their numbers
+    # in the new graph, where each is still distinct
+    both = kept[sources] & kept[targets]
+    old_links = np.sort(moved[sources[both]] * n + moved[targets[both]])
+    new_links = np.repeat(np.arange(n), graph.out_degree) * n + graph.targets
+    common = np.intersect1d(old_links, new_links, assume_unique=True)
+    changes = Changes(
+        added_pages=n - int(kept.sum()),
+        removed_pages=len(pages) - int(kept.sum()),
+        added_links=len(new_links) - len(common),
+        removed_links=len(sources) - len(common),
+    )
+    return start, changes
+
+
+def read_state(path):
+    """
+    Return the (pages, sources, targets, ranks) stored at `path`, or None
+    if there is no readable state there or its arrays do not fit together.
+    """
+    try:
+        with np.load(path) as state:
+            pages, sources, targets, ranks = (
+                state["pages"], state["sources"], state["targets"],
+                state["ranks"]
+            )
+    except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+        return None
+
+    n = len(pages) if pages.ndim == 1 else -1
+    if (n < 0 or ranks.shape != (n,) or ranks.dtype.kind != "f" or
+            not np.isfinite(ranks).all() or
+            sources.ndim != 1 or sources.shape != targets.shape or
+            sources.dtype.kind not in "iu" or
+            targets.dtype.kind not in "iu"):
+        return None
+    if len(sources) and (min(sources.min(), targets.min()) < 0 or
+                         max(sources.max(), targets.max()) >= n):
+        return None
+    return pages.tolist(), sources, targets, ranks
+
+
+def write_state(path, graph, ranks):
+    """
+    Store the pages, links and `ranks` of `graph` at `path`.
+    """
+    sources = np.repeat(np.arange(len(graph)), graph.out_degree)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "wb") as f:
+            np.savez(f, pages=np.array(graph.pages, dtype=str),
+                     sources=sources, targets=graph.targets, ranks=ranks)
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
@@ -0,0 +1,83 @@
+import numpy as np
+
+from sparse import LinkGraph
+
+# Default number of random surfers walking the corpus side by side
+SURFERS = 10000
+
+# Uncounted steps each surfer takes before its visits are counted
+BURN_IN = 50
+
+# Page visits gathered before they are added to the visit counts
+BLOCK = 1 << 22
+
+
+def simulate(graph, damping_factor, n, surfers=SURFERS, seed=None,
+             burn_in=BURN_IN):
+    """
+    Return how many of `n` page visits landed on each page of a LinkGraph,
+    walking `surfers` independent random surfers in parallel from pages
+    chosen at random. Each surfer first takes `burn_in` uncounted steps so
+    the counts do not favour the uniformly chosen starting pages.
+
+    Each step a surfer follows a random link of its page with probability
+    `damping_factor`, and otherwise (or if the page has no links) jumps
+    to a page chosen at random from the whole corpus, as in
+    transition_model. Every step costs O(1) per surfer.
+    """
+    rng = np.random.default_rng(seed)
+    pages = len(graph)
+    surfers = max(1, min(surfers, n))
+    counts = np.zeros(pages, dtype=np.int64)
+    rounds_per_block = max(1, BLOCK // surfers)
+
+    position = rng.integers(pages, size=surfers)
+    for _ in range(burn_in):
+        position = step(graph, damping_factor, position, rng)
+
+    visited = 0
+    block = []
+    while True:
+        # The final round may only need some of the surfers' visits
+        take = min(surfers, n - visited)
+        block.append(position[:take])
+        visited += take
+        if len(block) == rounds_per_block or visited == n:
+            counts += np.bincount(np.concatenate(block), minlength=pages)
+            block = []
+        if visited == n:
+            return counts
+        position = step(graph, damping_factor, position, rng)
+
+
+def step(graph, damping_factor, position, rng):
+    """
+    Return where each surfer at `position` goes next.
+    """
+    # Everyone jumps at random except those following a link
+    degree = graph.out_degree[position]
+    follow = np.flatnonzero(
+        (rng.random(len(position)) < damping_factor) & (degree > 0)
+    )
+    link = graph.indptr[position[follow]] + (
+        rng.random(len(follow)) * degree[follow]
+    ).astype(np.int64)
+    position = rng.integers(len(graph), size=len(position))
+    position[follow] = graph.targets[link]
+    return position
+
+
+def vectorized_sample_pagerank(corpus, damping_factor, n, surfers=SURFERS,
+                               seed=None):
+    """
+    Return PageRank values for each page by sampling `n` pages with many
+    random surfers at once, as `sample_pagerank` does with one. Passing
+    the same `seed` reproduces the same result.
+
+    Return a dictionary where keys are page names, and values are
+    their estimated PageRank value (a value between 0 and 1). All
+    PageRank values should sum to 1.
+    """
+    graph = LinkGraph.from_corpus(corpus)
+    counts = simulate(graph, damping_factor, n, surfers, seed)
+    return graph.as_dict(counts / n)
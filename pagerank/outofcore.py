@@ -0,0 +1,238 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+
+import numpy as np
+
+from crawler import crawl_edges
+from pagerank import DAMPING
+from sparse import MAX_ITERATIONS, TOLERANCE
+
+# Bump whenever the layout of the edge file changes
+VERSION = 1
+
+MAGIC = b"PREDGES\0"
+
+# Links read from the edge file at a time
+BLOCK_LINKS = 1 << 22
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Rank pages from a memory-mapped edge file."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    convert = commands.add_parser(
+        "convert", help="crawl a corpus into an edge file"
+    )
+    convert.add_argument("corpus")
+    convert.add_argument("edges")
+    convert.add_argument("--workers", type=int,
+                         help="processes parsing pages")
+
+    rank = commands.add_parser("rank", help="rank the pages of an edge file")
+    rank.add_argument("edges")
+    rank.add_argument("-k", type=int, default=10,
+                      help="number of top pages to list, or 0 for all")
+    rank.add_argument("--tolerance", type=float, default=TOLERANCE)
+    rank.add_argument("--block-links", type=int, default=BLOCK_LINKS,
+                      help="links held in memory at a time")
+
+    args = parser.parse_args()
+    if args.command == "convert":
+        pages, sources, targets = crawl_edges(args.corpus, args.workers)
+        write_edges(args.edges, pages, sources, targets)
+        print(f"Wrote {len(pages)} pages and {len(sources)} links")
+    else:
+        try:
+            edges = EdgeFile(args.edges)
+        except (OSError, ValueError) as e:
+            sys.exit(f"Cannot read {args.edges}: {e}")
+        ranks, iterations = outofcore_power_iteration(
+            edges, DAMPING, args.tolerance, block_links=args.block_links
+        )
+        print(f"PageRank Results from Iteration ({iterations} iterations)")
+        k = args.k or len(ranks)
+        best = np.argsort(-ranks, kind="stable")[:k]
+        for i, page in zip(best, edges.page_names(best)):
+            print(f"  {page}: {ranks[i]:.4f}")
+
+
+class EdgeFile():
+    """
+    A link graph stored on disk as a header followed by the out-degree of
+    each page, the links sorted by target page, and the page names, all
+    memory-mapped so only the parts in use are read into memory.
+    """
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        fixed = len(MAGIC) + struct.calcsize("<IQ")
+        if self.mapped[:len(MAGIC)] != MAGIC:
+            raise ValueError("not an edge file")
+        version, length = struct.unpack("<IQ", self.mapped[len(MAGIC):fixed])
+        if version != VERSION:
+            raise ValueError(f"edge file version {version} is not {VERSION}")
+        header = json.loads(self.mapped[fixed:fixed + length])
+        if header["byteorder"] != sys.byteorder:
+            raise ValueError("edge file has a different byte order")
+
+        self.pages = header["pages"]
+        self.links = header["links"]
+        self.start = padded(fixed + length)
+        self.sections = header["sections"]
+        self.out_degree = self.section("out_degree")
+
+    def __len__(self):
+        return self.pages
+
+    def section(self, name, first=0, last=None):
+        """
+        Return items `first` up to `last` of a section, without copying.
+        """
+        offset, count, dtype = self.sections[name]
+        last = count if last is None else last
+        itemsize = np.dtype(dtype).itemsize
+        return np.frombuffer(self.mapped, dtype=dtype, count=last - first,
+                             offset=self.start + offset + first * itemsize)
+
+    def blocks(self, block_links=BLOCK_LINKS):
+        """
+        Yield (sources, targets) arrays of up to `block_links` links at a
+        time, in order of target page, letting go of each block's memory
+        before the next is read.
+        """
+        for first in range(0, self.links, block_links):
+            last = min(first + block_links, self.links)
+            yield (self.section("sources", first, last),
+                   self.section("targets", first, last))
+            self.release("sources", first, last)
+            self.release("targets", first, last)
+
+    def release(self, name, first, last):
+        """
+        Tell the operating system the pages of a section read so far are
+        not needed again soon, so they stop counting towards our memory.
+        """
+        if not hasattr(mmap, "MADV_DONTNEED"):
+            return
+        offset, _, dtype = self.sections[name]
+        itemsize = np.dtype(dtype).itemsize
+        begin = self.start + offset + first * itemsize
+        end = self.start + offset + last * itemsize
+        # madvise works on whole memory pages
+        begin = begin // mmap.PAGESIZE * mmap.PAGESIZE
+        self.mapped.madvise(mmap.MADV_DONTNEED, begin, end - begin)
+
+    def page_names(self, pages=None):
+        """
+        Return the names of the given page numbers, or of every page.
+        """
+        if pages is None:
+            pages = range(self.pages)
+        offsets = self.section("name_offsets")
+        base = self.start + self.sections["names"][0]
+        names = []
+        for page in pages:
+            start, end = base + offsets[page], base + offsets[page + 1]
+            names.append(self.mapped[start:end].decode("utf-8"))
+        return names
+
+
+def write_edges(path, pages, sources, targets):
+    """
+    Write the link graph of `pages` to `path` in the EdgeFile layout.
+    """
+    n = len(pages)
+    sources = np.asarray(sources, dtype=np.int32)
+    targets = np.asarray(targets, dtype=np.int32)
+    order = np.lexsort((sources, targets))
+    encoded = [page.encode("utf-8") for page in pages]
+    name_offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum([len(name) for name in encoded], out=name_offsets[1:])
+
+    buffers = [
+        ("out_degree", np.bincount(sources, minlength=n).astype(np.int32)),
+        ("sources", sources[order]),
+        ("targets", targets[order]),
+        ("name_offsets", name_offsets),
+        ("names", np.frombuffer(b"".join(encoded), dtype=np.uint8)),
+    ]
+    sections = {}
+    position = 0
+    for name, data in buffers:
+        sections[name] = [position, len(data), data.dtype.str]
+        position += padded(data.nbytes)
+
+    header = json.dumps({
+        "version": VERSION,
+        "byteorder": sys.byteorder,
+        "pages": n,
+        "links": len(sources),
+        "sections": sections,
+    }).encode("utf-8")
+    prefix = MAGIC + struct.pack("<IQ", VERSION, len(header)) + header
+    start = padded(len(prefix))
+
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "wb") as f:
+            f.write(prefix + bytes(start - len(prefix)))
+            for name, data in buffers:
+                f.write(data.tobytes())
+                f.write(bytes(padded(data.nbytes) - data.nbytes))
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def outofcore_power_iteration(edges, damping_factor, tolerance=TOLERANCE,
+                              max_iterations=MAX_ITERATIONS,
+                              block_links=BLOCK_LINKS):
+    """
+    Run PageRank power iteration over an EdgeFile, streaming its links a
+    block at a time so only a few vectors of N ranks stay in memory. A
+    page with no links is treated as linking to every page, as in
+    iterate_pagerank. Return the rank vector and the number of iterations.
+    """
+    n = len(edges)
+    if n == 0:
+        return np.zeros(0), 0
+    dangling = edges.out_degree == 0
+    ranks = np.full(n, 1 / n)
+    shares = np.empty(n)
+    iteration = 0
+    for iteration in range(1, max_iterations + 1):
+        np.divide(ranks, edges.out_degree, out=shares, where=~dangling)
+        shares[dangling] = 0
+        spread = ranks[dangling].sum() / n
+
+        new_ranks = np.zeros(n)
+        for sources, targets in edges.blocks(block_links):
+            # Links are sorted by target, so each block covers a range
+            first, last = targets[0], targets[-1] + 1
+            new_ranks[first:last] += np.bincount(
+                targets - first, weights=shares[sources], minlength=last - first
+            )
+        new_ranks *= damping_factor
+        new_ranks += (1 - damping_factor) / n + damping_factor * spread
+
+        change = np.abs(new_ranks - ranks).sum()
+        ranks = new_ranks
+        if change < tolerance:
+            break
+    return ranks, iteration
+
+
+def padded(size):
+    return (size + 7) // 8 * 8
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,13 @@
+import argparse
 import os
 import random
 import re
-import sys
+
+from crawler import crawl_corpus
+from incremental import incremental_pagerank
+from montecarlo import SURFERS, vectorized_sample_pagerank
+from solvers import SOLVERS, solve
+from sparse import TOLERANCE, LinkGraph
 
 
 DAMPING = 0.85
@@ -9,18 +15,64 @@ SAMPLES = 10000
 
 
 def main():
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
-    ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
-    print(f"PageRank Results from Sampling (n = {SAMPLES})")
-    for page in sorted(ranks):
-        print(f"  {page}: {ranks[page]:.4f}")
-
-    ranks = iterate_pagerank(corpus, DAMPING)
+    parser = argparse.ArgumentParser(description="Rank the pages of a corpus.")
+    parser.add_argument("corpus")
+    parser.add_argument("--engine", choices=["iterate", "sparse"],
+                        default="iterate",
+                        help="how to compute the iterative PageRank")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help="L1 convergence tolerance of the sparse engine")
+    parser.add_argument("--solver", choices=list(SOLVERS), default="power",
+                        help="how the sparse engine solves for the ranks")
+    parser.add_argument("--sampler", choices=["python", "vectorized"],
+                        default="python",
+                        help="how to sample random surfers")
+    parser.add_argument("--samples", type=int, default=SAMPLES,
+                        help="number of pages to sample")
+    parser.add_argument("--surfers", type=int, default=SURFERS,
+                        help="surfers walked at once by the vectorized sampler")
+    parser.add_argument("--seed", type=int,
+                        help="seed for a reproducible vectorized sample")
+    parser.add_argument("--tree", action="store_true",
+                        help="crawl subdirectories too, in parallel")
+    parser.add_argument("--workers", type=int,
+                        help="processes parsing pages with --tree")
+    parser.add_argument("--incremental", action="store_true",
+                        help="start from the ranks stored by the last run")
+    args = parser.parse_args()
+
+    if args.tree:
+        corpus = crawl_corpus(args.corpus, args.workers)
+    else:
+        corpus = crawl(args.corpus)
+    if args.sampler == "vectorized":
+        sampled = vectorized_sample_pagerank(corpus, DAMPING, args.samples,
+                                             args.surfers, args.seed)
+    else:
+        sampled = sample_pagerank(corpus, DAMPING, args.samples)
+    print(f"PageRank Results from Sampling (n = {args.samples})")
+    for page in sorted(sampled):
+        print(f"  {page}: {sampled[page]:.4f}")
+
+    if args.incremental:
+        ranks, changes, iterations = incremental_pagerank(
+            args.corpus, LinkGraph.from_corpus(corpus), DAMPING, args.tolerance
+        )
+        since = "no previous run" if changes is None else f"{changes} since last run"
+        print(f"Converged in {iterations} iterations ({since})")
+    elif args.engine == "sparse":
+        graph = LinkGraph.from_corpus(corpus)
+        solution = solve(graph, DAMPING, args.solver, args.tolerance)
+        ranks = graph.as_dict(solution.ranks)
+        print(f"Converged in {solution.iterations} iterations "
+              f"(residual {solution.residuals[-1]:.2e})")
+    else:
+        ranks = iterate_pagerank(corpus, DAMPING)
     print(f"PageRank Results from Iteration")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
+    error = sum(abs(sampled[page] - ranks[page]) for page in ranks)
+    print(f"L1 difference between sampling and iteration: {error:.4f}")
 
 
 def crawl(directory): 
@@ -129,67 +181,55 @@ def sample_pagerank(corpus, damping_factor, n):
     return pagerank
 
 
-def iterate_pagerank(corpus, damping_factor):
+def iterate_pagerank(corpus, damping_factor, tolerance=0.001):
     """
     Return PageRank values for each page by iteratively updating
-    PageRank values until convergence.
+    PageRank values until no value changes by more than `tolerance`
+    in a single iteration. `corpus` is left unchanged.
 
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
     """
-    pagerank = dict()
+    n = len(corpus)
 
     # Initialize PageRank values to 1 / N where N is number of pages in corpus
+    pagerank = dict()
     for page in corpus.keys():
-        pagerank[page] = 1 / len(corpus)
-        # Update corpus if a page has no outgoing links so that the page has links
-        # to every page
-        if len(corpus[page]) == 0:
-            update_dict = dict()
-            update_dict[page] = set(
-                key for key in corpus.keys() 
-            )
-            corpus.update(update_dict)
+        pagerank[page] = 1 / n
 
-    incoming_links = dict()
+    # A page with no outgoing links is treated as having links to every
+    # page, so its rank is spread evenly over the whole corpus
+    dangling = [page for page in corpus.keys() if len(corpus[page]) == 0]
 
     # Get incoming links for each page
-    for page in pagerank.keys():
-        incoming_links[page] = set(
-            key for key, val in corpus.items() if page in val 
-        )
-
-    flag = False
-
-    all_converge = set()
-
-    # Continously update PageRank values for each page until
-    # each page's PageRank value doesn't change by more than 0.001
-    while not flag:
+    incoming_links = dict()
+    for page in corpus.keys():
+        incoming_links[page] = set()
+    for page, links in corpus.items():
+        for link in links:
+            if link in incoming_links:
+                incoming_links[link].add(page)
+
+    # Continuously update PageRank values for every page until a whole
+    # iteration changes none of them by more than the tolerance
+    while True:
+        spread = sum(pagerank[page] for page in dangling) / n
         new_dict = dict()
+        change = 0
 
-        for page in pagerank.keys():
-            sum = 0
-            new_value = 0
-
+        for page in corpus.keys():
+            total = spread
             for link in incoming_links[page]:
-                if len(corpus[link]) > 0:
-                    sum += pagerank[link] / len(corpus[link])
+                total += pagerank[link] / len(corpus[link])
 
-            new_value = (1 - damping_factor) / len(corpus) + (damping_factor * sum)
+            new_dict[page] = (1 - damping_factor) / n + damping_factor * total
+            change = max(change, abs(new_dict[page] - pagerank[page]))
 
-            if abs(new_value - pagerank[page]) < 0.001 and page not in all_converge:
-                all_converge.add(page)
+        pagerank = new_dict
 
-            new_dict[page] = new_value
-            
-        pagerank.update(new_dict)
- 
-        if len(all_converge) == len(corpus):
-            flag = True
-
-    return pagerank
+        if change <= tolerance:
+            return pagerank
 
 if __name__ == "__main__":
     main()
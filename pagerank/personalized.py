@@ -0,0 +1,88 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from sparse import MAX_ITERATIONS, TOLERANCE
+
+# Topics solved together; each adds a column of ranks per page to memory
+BATCH_SIZE = 64
+
+
+def teleport_matrix(graph, seed_sets):
+    """
+    Return a matrix with one column per set of seed pages, spreading the
+    random jump of the PageRank surfer evenly over those pages only.
+    Raises ValueError for an unknown page or an empty set.
+    """
+    index = {page: i for i, page in enumerate(graph.pages)}
+    teleport = np.zeros((len(graph), len(seed_sets)))
+    for column, seeds in enumerate(seed_sets):
+        seeds = set(seeds)
+        if not seeds:
+            raise ValueError(f"seed set {column} is empty")
+        for page in seeds:
+            if page not in index:
+                raise ValueError(f"{page} is not in the corpus")
+            teleport[index[page], column] = 1 / len(seeds)
+    return teleport
+
+
+def personalized_power_iteration(graph, damping_factor, teleport,
+                                 tolerance=TOLERANCE,
+                                 max_iterations=MAX_ITERATIONS):
+    """
+    Run power iteration for every column of `teleport` at once, until no
+    column changes by `tolerance` or more in L1 norm. A page with no links
+    is treated as linking to every page, as in iterate_pagerank.
+
+    Return a matrix of ranks with one column per teleport vector, and the
+    number of iterations.
+    """
+    n = len(graph)
+    links = link_matrix(graph)
+    ranks = teleport.copy()
+    iteration = 0
+    for iteration in range(1, max_iterations + 1):
+        spread = ranks[graph.dangling].sum(axis=0) / n
+        linked = links @ ranks
+        new_ranks = ((1 - damping_factor) * teleport +
+                     damping_factor * (linked + spread))
+        change = np.abs(new_ranks - ranks).sum(axis=0).max(initial=0)
+        ranks = new_ranks
+        if change < tolerance:
+            break
+    return ranks, iteration
+
+
+def link_matrix(graph):
+    """
+    Return the N x N sparse matrix whose (i, j) entry is the probability
+    that a surfer on page j follows a link to page i, so all teleport
+    vectors can be multiplied by it together.
+    """
+    n = len(graph)
+    weights = graph.inverse_out_degree[graph.sources]
+    return csr_matrix((weights, graph.sources, graph.in_indptr), shape=(n, n))
+
+
+def personalized_pagerank(graph, damping_factor, seed_sets,
+                          tolerance=TOLERANCE, batch_size=BATCH_SIZE):
+    """
+    Yield the rank vector of a LinkGraph personalized to each set of seed
+    pages in turn, solving `batch_size` of them together.
+    """
+    seed_sets = list(seed_sets)
+    for first in range(0, len(seed_sets), batch_size):
+        teleport = teleport_matrix(graph, seed_sets[first:first + batch_size])
+        ranks, _ = personalized_power_iteration(graph, damping_factor,
+                                                teleport, tolerance)
+        yield from ranks.T
+
+
+def top_pages(graph, ranks, k):
+    """
+    Return the `k` highest ranked (page, rank) pairs, best first.
+    """
+    k = min(k, len(ranks))
+    best = np.argpartition(-ranks, k - 1)[:k] if k else []
+    best = sorted(best, key=lambda i: (-ranks[i], graph.pages[i]))
+    return [(graph.pages[i], float(ranks[i])) for i in best]
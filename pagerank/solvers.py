@@ -0,0 +1,187 @@
+import numpy as np
+
+from sparse import MAX_ITERATIONS, TOLERANCE
+
+# Pages updated together in each Gauss-Seidel sweep are split into this
+# many blocks, each seeing the ranks already updated by the blocks before
+BLOCKS = 32
+
+# Power iterations between extrapolation steps
+EXTRAPOLATE_EVERY = 10
+
+
+class Solution():
+    """
+    The result of solving for PageRank on a LinkGraph.
+
+    ranks: the rank vector, which sums to 1
+    iterations: number of iterations (sweeps, for Gauss-Seidel) taken
+    residuals: L1 change in the rank vector made by each iteration, the
+               last of which is below the tolerance if it converged
+    """
+    def __init__(self, ranks, iterations, residuals):
+        self.ranks = ranks
+        self.iterations = iterations
+        self.residuals = residuals
+
+
+def solve(graph, damping_factor, method="power", tolerance=TOLERANCE,
+          max_iterations=MAX_ITERATIONS, ranks=None):
+    """
+    Solve for the PageRank vector of a LinkGraph with one of the SOLVERS,
+    from `ranks` (uniform if not given), until an iteration changes the
+    rank vector by less than `tolerance` in L1 norm. Return a Solution.
+    """
+    n = len(graph)
+    if ranks is None:
+        ranks = np.full(n, 1 / n)
+    return SOLVERS[method](graph, damping_factor, tolerance, max_iterations,
+                           ranks.copy())
+
+
+def power(graph, damping_factor, tolerance, max_iterations, ranks):
+    """
+    Plain power iteration, as sparse.power_iteration.
+    """
+    residuals = []
+    iteration = 0
+    for iteration in range(1, max_iterations + 1):
+        new_ranks = graph.step(ranks, damping_factor)
+        residuals.append(float(np.abs(new_ranks - ranks).sum()))
+        ranks = new_ranks
+        if residuals[-1] < tolerance:
+            break
+    return Solution(ranks, iteration, residuals)
+
+
+def gauss_seidel(graph, damping_factor, tolerance, max_iterations, ranks):
+    """
+    Block Gauss-Seidel: each sweep updates the pages a block at a time,
+    so links from pages in earlier blocks already carry their new ranks.
+    Within a block the update is vectorized like a power step.
+    """
+    n = len(graph)
+    bounds = np.linspace(0, n, min(BLOCKS, n) + 1).astype(np.int64)
+    blocks = [block_links(graph, first, last)
+              for first, last in zip(bounds[:-1], bounds[1:])]
+    dangling = np.zeros(n, dtype=bool)
+    dangling[graph.dangling] = True
+
+    residuals = []
+    iteration = 0
+    for iteration in range(1, max_iterations + 1):
+        previous = ranks.copy()
+        shares = ranks * graph.inverse_out_degree
+        spread = ranks[dangling].sum()
+        for first, last, sources, starts, linked in blocks:
+            pulled = np.zeros(last - first)
+            if len(sources):
+                pulled[linked] = np.add.reduceat(shares[sources], starts)
+            new = (1 - damping_factor) / n + damping_factor * (
+                pulled + spread / n
+            )
+            spread += (new - ranks[first:last])[dangling[first:last]].sum()
+            ranks[first:last] = new
+            shares[first:last] = new * graph.inverse_out_degree[first:last]
+        # Sweeps do not preserve the total exactly, unlike power steps
+        ranks /= ranks.sum()
+        residuals.append(float(np.abs(ranks - previous).sum()))
+        if residuals[-1] < tolerance:
+            break
+    return Solution(ranks, iteration, residuals)
+
+
+def block_links(graph, first, last):
+    """
+    Return what gauss_seidel needs to sum incoming ranks for pages
+    `first` up to `last`: the linking pages, where each linked page's
+    links start among them, and which pages of the block are linked.
+    """
+    start, end = graph.in_indptr[first], graph.in_indptr[last]
+    counts = np.diff(graph.in_indptr[first:last + 1])
+    linked = np.flatnonzero(counts)
+    starts = graph.in_indptr[first:last][linked] - start
+    return first, last, graph.sources[start:end], starts, linked
+
+
+def aitken(graph, damping_factor, tolerance, max_iterations, ranks):
+    """
+    Power iteration with Aitken extrapolation every EXTRAPOLATE_EVERY
+    iterations, which removes the error along the slowest-decaying
+    direction using the last three iterates.
+    """
+    return extrapolated(graph, damping_factor, tolerance, max_iterations,
+                        ranks, 3, aitken_extrapolate)
+
+
+def quadratic(graph, damping_factor, tolerance, max_iterations, ranks):
+    """
+    Power iteration with quadratic extrapolation every EXTRAPOLATE_EVERY
+    iterations, which removes the error along the two slowest-decaying
+    directions using the last four iterates.
+    """
+    return extrapolated(graph, damping_factor, tolerance, max_iterations,
+                        ranks, 4, quadratic_extrapolate)
+
+
+def extrapolated(graph, damping_factor, tolerance, max_iterations, ranks,
+                 keep, extrapolate):
+    """
+    Run power iteration, replacing the latest iterate with
+    extrapolate(iterates) of the last `keep` iterates now and then. An
+    estimate whose next step changes the ranks more than the step before
+    it did is dropped, costing one iteration.
+    """
+    residuals = []
+    iterates = [ranks]
+    # The iterates an estimate replaced, until it has been tried
+    replaced = None
+    iteration = 0
+    for iteration in range(1, max_iterations + 1):
+        new_ranks = graph.step(iterates[-1], damping_factor)
+        residuals.append(float(np.abs(new_ranks - iterates[-1]).sum()))
+        if replaced is not None:
+            previous, replaced = replaced, None
+            # Go back if the estimate left us further from converging
+            if residuals[-1] > residuals[-2]:
+                iterates = previous
+                continue
+        iterates = iterates[-(keep - 1):] + [new_ranks]
+        if residuals[-1] < tolerance:
+            break
+        if iteration % EXTRAPOLATE_EVERY == 0 and len(iterates) == keep:
+            estimate = extrapolate(iterates)
+            # Give up on an estimate that is no longer a distribution
+            if np.isfinite(estimate).all() and (estimate >= 0).all():
+                replaced = iterates
+                iterates = [estimate / estimate.sum()]
+    return Solution(iterates[-1], iteration, residuals)
+
+
+def aitken_extrapolate(iterates):
+    x0, x1, x2 = iterates
+    g = (x2 - x1) ** 2
+    h = x2 - 2 * x1 + x0
+    estimate = x2.copy()
+    # Pages whose ranks are no longer changing stay as they are
+    usable = np.abs(h) > 1e-15
+    estimate[usable] = x2[usable] - g[usable] / h[usable]
+    return estimate
+
+
+def quadratic_extrapolate(iterates):
+    x0, x1, x2, x3 = iterates
+    y = np.column_stack([x1 - x0, x2 - x0])
+    gamma, *_ = np.linalg.lstsq(y, -(x3 - x0), rcond=None)
+    gamma1, gamma2 = gamma
+    gamma3 = 1
+    return ((gamma1 + gamma2 + gamma3) * x1 + (gamma2 + gamma3) * x2 +
+            gamma3 * x3)
+
+
+SOLVERS = {
+    "power": power,
+    "gauss-seidel": gauss_seidel,
+    "aitken": aitken,
+    "quadratic": quadratic,
+}
@@ -0,0 +1,121 @@
+import numpy as np
+
+# Default L1 change in the rank vector below which iteration stops
+TOLERANCE = 1e-8
+
+# Upper bound on iterations, in case the tolerance is never reached
+MAX_ITERATIONS = 1000
+
+
+class LinkGraph():
+    """
+    The link structure of a corpus with its pages numbered 0..N-1.
+
+    Links are held twice in compressed sparse row form: page i links to
+    targets[indptr[i]:indptr[i + 1]], and page i is linked to by
+    sources[in_indptr[i]:in_indptr[i + 1]].
+    """
+    def __init__(self, pages, link_sources, link_targets):
+        n = len(pages)
+        link_sources = np.asarray(link_sources, dtype=np.int64)
+        link_targets = np.asarray(link_targets, dtype=np.int64)
+        self.pages = list(pages)
+
+        self.out_degree = np.bincount(link_sources, minlength=n)
+        self.indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(self.out_degree, out=self.indptr[1:])
+        order = np.lexsort((link_targets, link_sources))
+        self.targets = link_targets[order]
+
+        in_degree = np.bincount(link_targets, minlength=n)
+        self.in_indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(in_degree, out=self.in_indptr[1:])
+        order = np.argsort(link_targets, kind="stable")
+        self.sources = link_sources[order]
+        # Pages with incoming links, which are the only ones pull() sums
+        self.linked = np.flatnonzero(in_degree)
+
+        self.dangling = np.flatnonzero(self.out_degree == 0)
+        self.inverse_out_degree = np.zeros(n)
+        linking = self.out_degree > 0
+        self.inverse_out_degree[linking] = 1 / self.out_degree[linking]
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        """
+        Build a LinkGraph from a corpus as returned by `crawl`.
+        """
+        pages = sorted(corpus)
+        index = {page: i for i, page in enumerate(pages)}
+        link_sources = []
+        link_targets = []
+        for page in pages:
+            for link in corpus[page]:
+                link_sources.append(index[page])
+                link_targets.append(index[link])
+        return cls(pages, link_sources, link_targets)
+
+    def __len__(self):
+        return len(self.pages)
+
+    def pull(self, values):
+        """
+        Return, for every page, the sum of `values` over the pages that
+        link to it. `values` may be a vector or have one row per page.
+        """
+        result = np.zeros_like(values, dtype=float)
+        if len(self.sources):
+            sums = np.add.reduceat(values[self.sources],
+                                   self.in_indptr[self.linked], axis=0)
+            result[self.linked] = sums
+        return result
+
+    def step(self, ranks, damping_factor):
+        """
+        Return one PageRank update of `ranks`, treating a page with no
+        links as linking to every page, as iterate_pagerank does.
+        """
+        n = len(self)
+        spread = ranks[self.dangling].sum() / n
+        linked = self.pull(ranks * self.inverse_out_degree)
+        return (1 - damping_factor) / n + damping_factor * (linked + spread)
+
+    def as_dict(self, ranks):
+        """
+        Return a vector of per-page values as a dictionary keyed by page.
+        """
+        return {page: float(rank) for page, rank in zip(self.pages, ranks)}
+
+
+def power_iteration(graph, damping_factor, tolerance=TOLERANCE,
+                    max_iterations=MAX_ITERATIONS, ranks=None):
+    """
+    Run PageRank power iteration on a LinkGraph from `ranks` (uniform if
+    not given) until the L1 change between iterations is below
+    `tolerance`. Return the rank vector and the number of iterations.
+    """
+    n = len(graph)
+    if ranks is None:
+        ranks = np.full(n, 1 / n)
+    iteration = 0
+    for iteration in range(1, max_iterations + 1):
+        new_ranks = graph.step(ranks, damping_factor)
+        change = np.abs(new_ranks - ranks).sum()
+        ranks = new_ranks
+        if change < tolerance:
+            break
+    return ranks, iteration
+
+
+def sparse_pagerank(corpus, damping_factor, tolerance=TOLERANCE):
+    """
+    Return PageRank values for each page of `corpus` computed by power
+    iteration over a sparse link matrix, to within an L1 `tolerance`.
+
+    Return a dictionary where keys are page names, and values are
+    their estimated PageRank value (a value between 0 and 1). All
+    PageRank values should sum to 1.
+    """
+    graph = LinkGraph.from_corpus(corpus)
+    ranks, _ = power_iteration(graph, damping_factor, tolerance)
+    return graph.as_dict(ranks)
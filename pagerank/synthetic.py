@@ -0,0 +1,156 @@
+import os
+import posixpath
+
+import numpy as np
+
+from sparse import LinkGraph
+
+
+def power_law(n, average_degree=8, exponent=2.1, seed=0):
+    """
+    Return (sources, targets) arrays of links among `n` pages whose out-
+    and in-degrees both follow a power law with the given `exponent`, as
+    in real web graphs. Self-links and duplicate links are dropped.
+    """
+    rng = np.random.default_rng(seed)
+    # Zipf draws are at least 1; shift so some pages have no links
+    degrees = np.minimum(rng.zipf(exponent, n) - 1, n - 1)
+    degrees = np.rint(degrees * average_degree / max(degrees.mean(), 1e-9))
+    sources = np.repeat(np.arange(n), degrees.astype(np.int64))
+
+    # Popularity of each page as a target falls off with a random rank
+    popularity = 1 / np.arange(1, n + 1) ** (1 / (exponent - 1))
+    popularity = popularity[rng.permutation(n)]
+    targets = rng.choice(n, size=len(sources), p=popularity / popularity.sum())
+    return unique_links(n, sources, targets)
+
+
+def erdos_renyi(n, average_degree=8, seed=0):
+    """
+    Return (sources, targets) arrays of links among `n` pages where each
+    possible link is equally likely, so degrees are nearly uniform.
+    """
+    rng = np.random.default_rng(seed)
+    m = int(n * average_degree)
+    return unique_links(n, rng.integers(n, size=m), rng.integers(n, size=m))
+
+
+def dangling_heavy(n, average_degree=8, dangling=0.8, seed=0):
+    """
+    Return (sources, targets) arrays of links among `n` pages where only
+    a `1 - dangling` share of the pages have any links at all.
+    """
+    rng = np.random.default_rng(seed)
+    linking = rng.choice(n, size=max(1, round(n * (1 - dangling))),
+                         replace=False)
+    m = int(n * average_degree)
+    return unique_links(n, rng.choice(linking, size=m),
+                        rng.integers(n, size=m))
+
+
+def clustered(n, average_degree=8, clusters=2, cross=0.001, seed=0):
+    """
+    Return (sources, targets) arrays of links among `n` pages split into
+    `clusters` communities, with only a `cross` share of the links going
+    outside a page's own community. Rank flows between the communities
+    slowly, so power iteration converges slowly on these graphs.
+    """
+    rng = np.random.default_rng(seed)
+    m = int(n * average_degree)
+    size = n // clusters
+    sources = rng.integers(n, size=m)
+    community = np.minimum(sources // size, clusters - 1)
+    targets = community * size + rng.integers(size, size=m)
+    outside = rng.random(m) < cross
+    targets[outside] = rng.integers(n, size=outside.sum())
+    return unique_links(n, sources, targets)
+
+
+# Graph generators by name, each called as generator(n, average_degree, seed=)
+GENERATORS = {
+    "power-law": power_law,
+    "erdos-renyi": erdos_renyi,
+    "dangling": dangling_heavy,
+    "clustered": clustered,
+}
+
+
+def unique_links(n, sources, targets):
+    """
+    Return `sources` and `targets` without self-links or duplicate links.
+    """
+    keep = sources != targets
+    links = np.unique(sources[keep].astype(np.int64) * n + targets[keep])
+    return links // n, links % n
+
+
+def edit_links(n, sources, targets, edits, new_pages=0, seed=0):
+    """
+    Return (n, sources, targets) after removing `edits` random links,
+    adding `edits` random links and adding `new_pages` pages, each with
+    a link to and from a random existing page.
+    """
+    rng = np.random.default_rng(seed)
+    keep = np.ones(len(sources), dtype=bool)
+    keep[rng.choice(len(sources), size=min(edits, len(sources)),
+                    replace=False)] = False
+    new = np.arange(n, n + new_pages)
+    old = rng.integers(n, size=(2, new_pages))
+    sources = np.concatenate([sources[keep], rng.integers(n, size=edits),
+                              new, old[0]])
+    targets = np.concatenate([targets[keep], rng.integers(n, size=edits),
+                              old[1], new])
+    n += new_pages
+    return (n, *unique_links(n, sources, targets))
+
+
+def link_graph(n, sources, targets):
+    """
+    Return a LinkGraph with pages named 0.html..(n - 1).html.
+    """
+    return LinkGraph(page_names(n), sources, targets)
+
+
+def corpus(n, sources, targets):
+    """
+    Return the links as a corpus dictionary, as `crawl` would.
+    """
+    pages = page_names(n)
+    corpus = {page: set() for page in pages}
+    for source, target in zip(sources.tolist(), targets.tolist()):
+        corpus[pages[source]].add(pages[target])
+    return corpus
+
+
+def page_names(n):
+    return [f"{i}.html" for i in range(n)]
+
+
+def write_html(directory, n, sources, targets, per_directory=0):
+    """
+    Write the links as HTML pages under `directory`, `per_directory` pages
+    to a subdirectory (or all in `directory` itself if 0), with relative
+    links as a crawler would find them. Return the page names.
+    """
+    if per_directory:
+        pages = [f"{i // per_directory}/{i}.html" for i in range(n)]
+    else:
+        pages = page_names(n)
+    links = [[] for _ in range(n)]
+    for source, target in zip(sources.tolist(), targets.tolist()):
+        links[source].append(target)
+
+    for i, page in enumerate(pages):
+        path = os.path.join(directory, *page.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        base = posixpath.dirname(page) or "."
+        items = "".join(
+            f'            <li><a href="{posixpath.relpath(pages[j], base)}">'
+            f"{j}</a></li>\n"
+            for j in links[i]
+        )
+        with open(path, "w") as f:
+            f.write(f"<!DOCTYPE html>\n<html lang=\"en\">\n"
+                    f"    <body>\n        <h1>{i}</h1>\n        <ul>\n"
+                    f"{items}        </ul>\n    </body>\n</html>\n")
+    return pages
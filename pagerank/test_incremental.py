@@ -0,0 +1,67 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import incremental
+import synthetic
+
+
+class ReadStateTest(unittest.TestCase):
+    """
+    read_state returns None, for a cold start, whenever the stored arrays
+    cannot belong to the same graph.
+    """
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, incremental.FILENAME)
+        n = 100
+        sources, targets = synthetic.erdos_renyi(n, seed=0)
+        self.graph = synthetic.link_graph(n, sources, targets)
+        incremental.write_state(self.path, self.graph, np.full(n, 1 / n))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def rewrite(self, **arrays):
+        with np.load(self.path) as state:
+            stored = dict(state)
+        stored.update(arrays)
+        with open(self.path, "wb") as f:
+            np.savez(f, **stored)
+
+    def test_valid_state(self):
+        self.assertIsNotNone(incremental.read_state(self.path))
+
+    def test_truncated_ranks(self):
+        with np.load(self.path) as state:
+            ranks = state["ranks"]
+        self.rewrite(ranks=ranks[:-1])
+        self.assertIsNone(incremental.read_state(self.path))
+
+    def test_link_past_last_page(self):
+        with np.load(self.path) as state:
+            targets = state["targets"].copy()
+        targets[0] = len(self.graph)
+        self.rewrite(targets=targets)
+        self.assertIsNone(incremental.read_state(self.path))
+
+    def test_non_finite_ranks(self):
+        ranks = np.full(len(self.graph), np.nan)
+        self.rewrite(ranks=ranks)
+        self.assertIsNone(incremental.read_state(self.path))
+
+    def test_corrupt_state_starts_cold(self):
+        with np.load(self.path) as state:
+            ranks = state["ranks"]
+        self.rewrite(ranks=ranks[:-1])
+        ranks, changes, _ = incremental.incremental_pagerank(
+            self.directory.name, self.graph, 0.85
+        )
+        self.assertIsNone(changes)
+        self.assertAlmostEqual(sum(ranks.values()), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
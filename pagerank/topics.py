@@ -0,0 +1,54 @@
+import argparse
+import json
+import sys
+
+from crawler import crawl_graph
+from pagerank import DAMPING, crawl
+from personalized import BATCH_SIZE, personalized_pagerank, top_pages
+from sparse import TOLERANCE, LinkGraph
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Rank the pages of a corpus for each of many topics."
+    )
+    parser.add_argument("corpus")
+    parser.add_argument("topics",
+                        help="JSON file mapping each topic to its seed pages")
+    parser.add_argument("-k", type=int, default=10,
+                        help="number of pages to list per topic")
+    parser.add_argument("--json", action="store_true",
+                        help="print one JSON object per topic")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help="topics solved together")
+    parser.add_argument("--tree", action="store_true",
+                        help="crawl subdirectories too, in parallel")
+    parser.add_argument("--workers", type=int,
+                        help="processes parsing pages with --tree")
+    args = parser.parse_args()
+
+    with open(args.topics) as f:
+        topics = json.load(f)
+    if args.tree:
+        graph = crawl_graph(args.corpus, args.workers)
+    else:
+        graph = LinkGraph.from_corpus(crawl(args.corpus))
+
+    rankings = personalized_pagerank(graph, DAMPING, topics.values(),
+                                     args.tolerance, args.batch_size)
+    try:
+        for topic, ranks in zip(topics, rankings):
+            best = top_pages(graph, ranks, args.k)
+            if args.json:
+                print(json.dumps({"topic": topic, "pages": best}))
+            else:
+                print(f"{topic}:")
+                for page, rank in best:
+                    print(f"  {page}: {rank:.4f}")
+    except ValueError as e:
+        sys.exit(f"Invalid topics: {e}")
+
+
+if __name__ == "__main__":
+    main()